@@ -0,0 +1,307 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lanes import get_lane_table
+
+# Series scored for alerts: label -> column identifying a series
+SERIES_KINDS = {"Customer": "Customer Name", "Lane": "Lane ID"}
+
+# Weeks of history giving a series' current level (trailing median)
+BASELINE_WEEKS = 8
+# Weeks of past residuals giving its robust spread (median absolute residual)
+SCALE_WEEKS = 26
+# Weeks in a year, so "last year" falls on the same ISO week
+YEAR_WEEKS = 52
+# Weeks either side of the same week last year averaged for the seasonal factor
+SEASONAL_SPAN = 2
+# Typical size of a real seasonal swing (standard deviation of the log factor);
+# factors are shrunk towards 1 by how noisy last year's counts are relative to it
+SEASONAL_PRIOR = 0.2
+# Bounds of the yearly seasonal factor applied to the level
+SEASONAL_RANGE = (0.5, 2.0)
+# Consistency constant: 1.4826 × MAD estimates the standard deviation of normal data
+MAD_SCALE = 1.4826
+# Weekly orders a series needs at its baseline to be scored
+MIN_BASELINE = 2.0
+# Robust z-score from which a week is an alert
+Z_THRESHOLD = 3.5
+# A week counts as complete once it has an order on Friday or later
+COMPLETE_DOW = 4
+# Total orders below which a series can never reach MIN_BASELINE (it is not scored)
+MIN_TOTAL = MIN_BASELINE * (BASELINE_WEEKS // 2 + 1)
+# Series scored per block, bounding the memory of the window medians
+BLOCK_SERIES = 1024
+
+
+@dataclass(frozen=True)
+class WeeklyScores:
+    """Robust z-scores of every series of one kind, week by week.
+
+    ``actual``, ``expected`` and ``z`` are (series × week) matrices over the
+    ISO weeks starting on ``weeks``; ``keys`` holds the series ids (rows),
+    ``labels`` their display names and ``customers`` their customer. ``z``
+    is NaN where a series was not scored (not enough history or too small
+    a baseline). ``complete`` is the number of leading weeks that are
+    complete.
+    """
+
+    kind: str
+    keys: pd.Index
+    labels: np.ndarray
+    customers: np.ndarray
+    weeks: pd.DatetimeIndex
+    actual: np.ndarray
+    expected: np.ndarray
+    z: np.ndarray
+    complete: int
+
+
+def weekly_matrix(df: pd.DataFrame, col: str, date_col: str = "Order Placed Date") -> tuple:
+    """Dense (series × ISO week) matrix of weighted orders per value of ``col``.
+
+    Returns ``(keys, weeks, Y, complete)``: the sorted series ids, the
+    Monday of every week from the first to the last order, the matrix
+    (one ``bincount`` over ``series * n_weeks + week``) and the number of
+    complete weeks. Series with fewer than ``MIN_TOTAL`` orders in all
+    are left out: most lanes are too sparse to ever be scored.
+    """
+    rows = df.dropna(subset=[date_col, col])
+    day = rows[date_col].dt.normalize()
+    first = day.min() - pd.Timedelta(days=int(day.min().dayofweek))
+    week = ((day - first).dt.days // 7).to_numpy()
+    n_weeks = int(week.max()) + 1
+    codes, keys = pd.factorize(rows[col], sort=True)
+    weights = rows["Shipment Weight"].to_numpy(dtype=float)
+
+    # Renumber the series that are kept, -1 for the rest
+    kept = np.bincount(codes, weights=weights, minlength=len(keys)) >= MIN_TOTAL
+    remap = np.full(len(keys), -1, dtype=np.int64)
+    remap[kept] = np.arange(kept.sum())
+    codes, keys = remap[codes], keys[kept]
+    keep = codes >= 0
+    flat = codes[keep] * n_weeks + week[keep]
+    weights = weights[keep]
+    Y = np.bincount(flat, weights=weights, minlength=len(keys) * n_weeks).reshape(len(keys), n_weeks)
+    complete = n_weeks if day.max().dayofweek >= COMPLETE_DOW else n_weeks - 1
+    return pd.Index(keys), pd.date_range(first, periods=n_weeks, freq="7D"), Y, complete
+
+
+def _window_median(windows: np.ndarray) -> np.ndarray:
+    """Median along the last axis; sorting is faster than partitioning for short windows."""
+    width = windows.shape[-1]
+    ordered = np.sort(windows, axis=-1)
+    return ordered[..., (width - 1) // 2:width // 2 + 1].mean(axis=-1)
+
+
+def _trailing_median(Y: np.ndarray, width: int, cols: np.ndarray) -> np.ndarray:
+    """Median of the ``width`` weeks before each week in ``cols`` (NaN with less history)."""
+    out = np.full((Y.shape[0], len(cols)), np.nan)
+    valid = cols >= width
+    if valid.any():
+        # Window k covers weeks k .. k + width - 1
+        windows = sliding_window_view(Y, width, axis=1)
+        out[:, valid] = _window_median(windows[:, cols[valid] - width])
+    return out
+
+
+def _score_block(Y: np.ndarray, start: int) -> tuple:
+    """Expected value and robust z-score of every series for weeks ``start`` onwards.
+
+    The expected value is the median of the previous ``BASELINE_WEEKS``
+    weeks, scaled by how the ``SEASONAL_SPAN`` weeks either side of the
+    same week last year compared with their own baseline. The factor is
+    shrunk towards 1 by the Poisson noise of last year's counts (a series
+    of 20 orders a week keeps about 70% of its log seasonal swing, a
+    large one nearly all of it) and clipped to ``SEASONAL_RANGE``. The
+    spread is ``MAD_SCALE`` times the median absolute residual of the
+    previous ``SCALE_WEEKS`` weeks, at least the square root of the
+    expected value (the Poisson noise of a count); a week is only scored
+    once it has ``BASELINE_WEEKS`` // 2 past residuals. A week's score
+    only depends on earlier weeks and itself, so appending weeks leaves
+    earlier scores unchanged.
+
+    Every series of the block is scored at once; the result covers weeks
+    ``start`` through the last one, as two (series × weeks) arrays.
+    """
+    n, W = Y.shape
+    # Residuals are needed for the spread window before the first scored week
+    lead = max(start - SCALE_WEEKS, 0)
+    t = np.arange(lead, W)
+    level = _trailing_median(Y, BASELINE_WEEKS, t)
+
+    # Last year's weeks around the same week against last year's level before them
+    factor = np.ones_like(level)
+    past = t - YEAR_WEEKS
+    seasonal = past - SEASONAL_SPAN >= BASELINE_WEEKS
+    if seasonal.any():
+        cols = past[seasonal] - SEASONAL_SPAN
+        width = 2 * SEASONAL_SPAN + 1
+        # Window k covers weeks k .. k + width - 1; last year never runs past the end
+        around = sliding_window_view(Y, width, axis=1)[:, cols].mean(axis=-1)
+        before = _trailing_median(Y, BASELINE_WEEKS, cols)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Variance of the log ratio of two Poisson means at last year's level
+            noise = 1 / (before * width) + 1 / (before * BASELINE_WEEKS)
+            shrink = SEASONAL_PRIOR ** 2 / (SEASONAL_PRIOR ** 2 + noise)
+            ratio = np.where(before >= MIN_BASELINE, np.exp(shrink * np.log(around / before)), 1.0)
+        factor[:, seasonal] = np.clip(ratio, *SEASONAL_RANGE)
+    expected = level * factor
+
+    resid = Y[:, lead:] - expected
+    absolute = np.abs(resid)
+    offset = start - lead
+    # Residuals exist from week BASELINE_WEEKS on, so a week's spread window
+    # runs from max(week - SCALE_WEEKS, BASELINE_WEEKS) to the week before
+    weeks = np.arange(lead + offset, W)
+    low = np.maximum(weeks - SCALE_WEEKS, BASELINE_WEEKS)
+    history = np.maximum(weeks - low, 0)
+    spread = np.full((n, len(weeks)), np.nan)
+    full = weeks - SCALE_WEEKS >= BASELINE_WEEKS
+    if full.any():
+        windows = sliding_window_view(absolute, SCALE_WEEKS, axis=1)
+        spread[:, full] = _window_median(windows[:, weeks[full] - SCALE_WEEKS - lead])
+    for j in np.flatnonzero(~full & (history > 0)):
+        spread[:, j] = _window_median(absolute[:, low[j] - lead:weeks[j] - lead])
+    spread = np.fmax(MAD_SCALE * spread, np.sqrt(np.maximum(expected[:, offset:], 1.0)))
+
+    scored = (expected[:, offset:] >= MIN_BASELINE) & (history >= BASELINE_WEEKS // 2)
+    with np.errstate(invalid="ignore"):
+        z = np.where(scored, resid[:, offset:] / spread, np.nan)
+    return expected[:, offset:], z
+
+
+def score_weeks(Y: np.ndarray, start: int = 0) -> tuple:
+    """Expected values and z-scores of all rows of ``Y`` (see ``_score_block``), in blocks of series."""
+    expected = np.empty((Y.shape[0], Y.shape[1] - start))
+    z = np.empty_like(expected)
+    for lo in range(0, Y.shape[0], BLOCK_SERIES):
+        block = slice(lo, lo + BLOCK_SERIES)
+        expected[block], z[block] = _score_block(Y[block], start)
+    return expected, z
+
+
+def _first_change(previous: WeeklyScores, keys: pd.Index, weeks: pd.DatetimeIndex, Y: np.ndarray) -> int:
+    """First week of ``Y`` whose values differ from ``previous`` (its length if none)."""
+    shift = (previous.weeks[0] - weeks[0]).days // 7
+    if shift != 0:
+        # Earlier weeks were added: everything after them has a new history
+        return 0
+    rows = previous.keys.get_indexer(keys)
+    old = np.zeros_like(Y)
+    shared = min(Y.shape[1], previous.actual.shape[1])
+    matched = rows >= 0
+    old[matched, :shared] = previous.actual[rows[matched], :shared]
+    # The last previous week may have been partial: rescore it too
+    changed = np.flatnonzero((old != Y).any(axis=0))
+    first = int(changed[0]) if len(changed) else Y.shape[1]
+    return min(first, shared, previous.complete)
+
+
+def update_scores(previous: WeeklyScores, kind: str, keys: pd.Index, labels: np.ndarray, customers: np.ndarray,
+                  weeks: pd.DatetimeIndex, Y: np.ndarray, complete: int) -> WeeklyScores:
+    """Scores of ``Y``, reusing the weeks of ``previous`` that did not change.
+
+    When data is appended to a dataset, only the new (and changed) weeks
+    are rescored; the scores of earlier weeks are copied over, aligned by
+    series id.
+    """
+    start = 0 if previous is None else _first_change(previous, keys, weeks, Y)
+    expected = np.full(Y.shape, np.nan)
+    z = np.full(Y.shape, np.nan)
+    if start > 0:
+        rows = previous.keys.get_indexer(keys)
+        matched = rows >= 0
+        expected[matched, :start] = previous.expected[rows[matched], :start]
+        z[matched, :start] = previous.z[rows[matched], :start]
+        # New series have no history before their first order: score them fully
+        if not matched.all():
+            new_expected, new_z = score_weeks(Y[~matched], 0)
+            expected[~matched, :start] = new_expected[:, :start]
+            z[~matched, :start] = new_z[:, :start]
+    if start < Y.shape[1]:
+        expected[:, start:], z[:, start:] = score_weeks(Y, start)
+    return WeeklyScores(kind, keys, labels, customers, weeks, Y, expected, z, complete)
+
+
+def _labels(df: pd.DataFrame, kind: str, keys: pd.Index, dataset_key: str) -> tuple:
+    """Display label and customer of every series."""
+    if kind == "Lane":
+        lanes = get_lane_table(dataset_key, df).reindex(keys)
+        return lanes["Lane"].to_numpy(dtype=object), lanes["Customer Name"].to_numpy(dtype=object)
+    labels = np.asarray(keys, dtype=object)
+    return labels, labels
+
+
+@st.cache_resource(show_spinner=False)
+def _latest() -> tuple:
+    """Most recent scores per (source, kind), for incremental updates across loads."""
+    return {}, threading.Lock()
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_scores(dataset_key: str, kind: str, _df: pd.DataFrame) -> WeeklyScores:
+    """Weekly scores of every ``kind`` series of a loaded dataset.
+
+    Scored once per ``dataset_key``. When the same source file (see
+    ``load_data``) was scored before, e.g. before rows were appended to
+    it, only the weeks that changed since are rescored.
+    """
+    col = SERIES_KINDS[kind]
+    if col not in _df.columns or "Order Placed Date" not in _df.columns or _df["Order Placed Date"].isna().all():
+        return None
+    keys, weeks, Y, complete = weekly_matrix(_df, col)
+    source = _df.attrs.get("source", dataset_key)
+    latest, lock = _latest()
+    with lock:
+        previous = latest.get((source, kind))
+    scores = update_scores(previous, kind, keys, *_labels(_df, kind, keys, dataset_key), weeks, Y, complete)
+    with lock:
+        latest[(source, kind)] = scores
+    return scores
+
+
+def alerts(scores: WeeklyScores, weeks: int = 1, threshold: float = Z_THRESHOLD) -> pd.DataFrame:
+    """Series whose score in one of the last ``weeks`` complete weeks exceeds ``threshold``.
+
+    One row per series (its largest deviation), ranked by ``|z|``. Columns:
+    ``Key``, the series label, ``Customer``, ``Week``, ``Orders``,
+    ``Expected``, ``Change %`` and ``Z``.
+    """
+    last = scores.complete
+    if last == 0:
+        return pd.DataFrame(columns=list(dict.fromkeys(["Key", scores.kind, "Customer", "Week", "Orders", "Expected", "Change %", "Z"])))
+    window = slice(max(last - weeks, 0), last)
+    z = scores.z[:, window]
+    magnitude = np.where(np.isnan(z), -np.inf, np.abs(z))
+    col = magnitude.argmax(axis=1)
+    rows = np.flatnonzero(magnitude[np.arange(len(col)), col] >= threshold)
+    week = window.start + col[rows]
+    actual = scores.actual[rows, week]
+    expected = scores.expected[rows, week]
+    table = pd.DataFrame({
+        "Key": scores.keys[rows],
+        scores.kind: scores.labels[rows],
+        "Customer": scores.customers[rows],
+        "Week": scores.weeks[week],
+        "Orders": actual.round(1),
+        "Expected": expected.round(1),
+        "Change %": ((actual / expected - 1) * 100).round(1),
+        "Z": scores.z[rows, week].round(2),
+    })
+    return table.iloc[np.argsort(-np.abs(table["Z"].to_numpy()), kind="stable")].reset_index(drop=True)
+
+
+def series_history(scores: WeeklyScores, key) -> pd.DataFrame:
+    """Weekly ``Orders``, ``Expected`` and ``Z`` of one series."""
+    row = scores.keys.get_loc(key)
+    return pd.DataFrame({
+        "Week": scores.weeks,
+        "Orders": scores.actual[row],
+        "Expected": scores.expected[row],
+        "Z": scores.z[row],
+    })
@@ -1,14 +1,25 @@
 import sys
 import os
+import hashlib
+import time
+from functools import partial
 
 # Ensure the project root is on the path so page imports work
 sys.path.insert(0, os.path.dirname(__file__))
 
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.express as px
-from data_loader import load_data
-from views import overview, order_intake, customers, geography, operations, new_business, new_business_week, heatmap_comparison
+from dimensions import get_catalog, filter_mask, date_mask
+from facets import facet_counts, reachable_options
+import exports
+import fingerprints
+import loading
+import quality
+import runstats
+import warmup
+import watcher
+from views import overview, order_intake, customers, geography, operations, pricing, new_business, new_business_week, lost_business, heatmap_comparison
 
 # ── Page config ──────────────────────────────────────────────
 st.set_page_config(
@@ -79,6 +90,9 @@ if not st.session_state.authenticated:
 
 st.title("🚛 Transport Data Analyzer")
 
+# Background warm-up pauses while this run is in progress
+warmup.touch()
+
 # ── File upload ────────────────────────────────────────────────
 with st.sidebar:
     # Move Navigation ABOVE filters per request
@@ -90,45 +104,73 @@ with st.sidebar:
         "👥 Customers": customers,
         "🆕 New Business - Month": new_business,
         "🆕 New Business - Week": new_business_week,
+        "📉 Lost Business": lost_business,
         "🔥 Heatmap Comparison": heatmap_comparison,
         "🌍 Geography": geography,
         "⚙️ Operations": operations,
+        "💶 Pricing": pricing,
     }
-    page = st.radio("Go to", list(PAGES.keys()), label_visibility="collapsed")
+    page = st.radio("Go to", list(PAGES.keys()), label_visibility="collapsed", key="page")
 
     st.header("Data Source")
     uploaded = st.file_uploader("Upload Excel file", type=["xlsx", "xls"])
 
-    # Auto-detect Excel files in the app folder
+    # Excel files in the app folder, watched and parsed ahead of time in
+    # the background (✅ = ready to open instantly)
     app_dir = os.path.dirname(__file__)
-    local_files = sorted(
-        f for f in os.listdir(app_dir)
-        if f.lower().endswith((".xlsx", ".xls")) and not f.startswith("~$")
-    )
+    folder = watcher.get_watcher(app_dir)
+    local_files = folder.names()
     selected_local = None
     if local_files and uploaded is None:
         selected_local = st.selectbox(
             "Or pick a file from the folder",
             ["(none)"] + local_files,
             index=1 if len(local_files) == 1 else 0,
+            format_func=lambda f: f if f == "(none)" else folder.label(f),
+            # Keyed, so the choice survives a file turning ✅
+            key="local_file",
         )
         if selected_local == "(none)":
             selected_local = None
 
-if uploaded is not None:
-    df_raw = load_data(uploaded)
-elif selected_local:
-    df_raw = load_data(os.path.join(app_dir, selected_local))
-else:
+try:
+    # Every per-dataset cache is keyed on the content fingerprint, so an
+    # overwritten file is never served from a stale cache
+    if uploaded is not None:
+        dataset_key = fingerprints.of_upload(uploaded)
+        df_raw = loading.load_dataset(uploaded, uploaded.name, dataset_key)
+    elif selected_local:
+        path = os.path.join(app_dir, selected_local)
+        dataset_key = fingerprints.of_path(path)
+        df_raw = loading.load_dataset(path, selected_local, dataset_key)
+    else:
+        df_raw = None
+except loading.LoadQueueFull:
+    warmup.cancel()
+    st.warning("⏳ The server is busy loading other files. Please try again in a minute.")
+    st.button("Retry")
+    st.stop()
+
+if df_raw is None:
+    warmup.cancel()
     st.info("👈 Upload an Excel file or pick one from the folder to get started.")
     st.stop()
 
 # Store full unfiltered data in session state for new_business page
 st.session_state.df_raw = df_raw
 
-st.sidebar.success(f"Loaded **{len(df_raw):,}** rows, **{len(df_raw.columns)}** columns")
+# Distinct values / codes per filter column, built once per dataset
+catalog = get_catalog(dataset_key, df_raw)
+
+memory = df_raw.attrs.get("memory")
+memory_note = (
+    f" — {memory['after'] / 1e6:,.1f} MB in memory (was {memory['before'] / 1e6:,.1f} MB before dtype optimization)"
+    if memory else ""
+)
+st.sidebar.success(f"Loaded **{len(df_raw):,}** rows, **{len(df_raw.columns)}** columns{memory_note}")
 
 # ── Sidebar filters ──────────────────────────────────────────
+filters_started = time.perf_counter()
 with st.sidebar:
     st.header("Filters")
 
@@ -151,109 +193,61 @@ with st.sidebar:
     else:
         date_range = None
 
-    # Customer
-    if "Customer Name" in df_raw.columns:
-        all_customers = sorted(df_raw["Customer Name"].dropna().unique())
-        sel_customers = st.multiselect("Customer Name", all_customers)
-    else:
-        sel_customers = []
-
-    # Load Country
-    if "Load Country" in df_raw.columns:
-        all_load_countries = sorted(df_raw["Load Country"].dropna().unique())
-        sel_load_countries = st.multiselect("Load Country", all_load_countries)
-    else:
-        sel_load_countries = []
-
-    # Unload Country
-    if "Unload Country" in df_raw.columns:
-        all_unload_countries = sorted(df_raw["Unload Country"].dropna().unique())
-        sel_unload_countries = st.multiselect("Unload Country", all_unload_countries)
-    else:
-        sel_unload_countries = []
-
-    # Market
-    if "Market" in df_raw.columns:
-        all_markets = sorted(df_raw["Market"].dropna().unique())
-        sel_markets = st.multiselect("Market", all_markets)
-    else:
-        sel_markets = []
-
-    # Shipment Status
-    if "Shipment Status" in df_raw.columns:
-        all_statuses = sorted(df_raw["Shipment Status"].dropna().unique())
-        sel_statuses = st.multiselect("Shipment Status", all_statuses)
-    else:
-        sel_statuses = []
-
-    # Modality
-    if "Modality" in df_raw.columns:
-        all_modalities = sorted(df_raw["Modality"].dropna().unique())
-        sel_modalities = st.multiselect("Modality", all_modalities)
-    else:
-        sel_modalities = []
-
-    # Business Line
-    if "Business Line" in df_raw.columns:
-        all_blines = sorted(df_raw["Business Line"].dropna().unique())
-        sel_blines = st.multiselect("Business Line", all_blines)
-    else:
-        sel_blines = []
-
-    # Order Allocation
-    if "Order Allocation" in df_raw.columns:
-        all_allocs = sorted(df_raw["Order Allocation"].dropna().unique())
-        sel_allocs = st.multiselect("Order Allocation", all_allocs)
-    else:
-        sel_allocs = []
-
-    # Spot / Dedicated
-    if "Spot / Dedicated" in df_raw.columns:
-        all_spotded = sorted(df_raw["Spot / Dedicated"].dropna().unique())
-        sel_spotded = st.multiselect("Spot / Dedicated", all_spotded)
-    else:
-        sel_spotded = []
-
-    # Order Placed Day
-    if "Order Placed Day" in df_raw.columns:
-        all_opdays = sorted(df_raw["Order Placed Day"].dropna().astype(str).unique())
-        sel_opdays = st.multiselect("Order Placed Day", all_opdays)
-    else:
-        sel_opdays = []
+    # Date filter applies to every facet count below
+    base_mask = np.ones(len(df_raw), dtype=bool)
+    if date_range and len(date_range) == 2 and "Order Placed Date" in df_raw.columns:
+        base_mask = date_mask(df_raw["Order Placed Date"], date_range)
+
+    # Faceted multiselects: each one lists only the values still reachable
+    # under the other active filters, with weighted shipment counts
+    current = {col: st.session_state.get(f"filter_{col}", []) for col in catalog}
+    weights = df_raw["Shipment Weight"].to_numpy(dtype=float)
+    counts = facet_counts(catalog, current, weights, base_mask)
+
+    selections = {}
+    for col, dim in catalog.items():
+        selections[col] = st.multiselect(
+            col,
+            reachable_options(dim, counts[col], current[col]),
+            key=f"filter_{col}",
+            format_func=lambda v, d=dim, c=counts[col]: f"{v} ({c[d.index[v]]:,.1f})",
+        )
 
 # ── Apply filters ────────────────────────────────────────────
-df = df_raw.copy()
+mask = base_mask & filter_mask(catalog, selections, len(df_raw))
 
-if date_range and len(date_range) == 2 and "Order Placed Date" in df.columns:
-    start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
-    df = df[df["Order Placed Date"].between(start, end) | df["Order Placed Date"].isna()]
+df = df_raw[mask]
+runstats.record("app: filters", time.perf_counter() - filters_started)
 
-if sel_customers:
-    df = df[df["Customer Name"].isin(sel_customers)]
-if sel_load_countries:
-    df = df[df["Load Country"].isin(sel_load_countries)]
-if sel_unload_countries:
-    df = df[df["Unload Country"].isin(sel_unload_countries)]
-if sel_markets:
-    df = df[df["Market"].isin(sel_markets)]
-if sel_statuses:
-    df = df[df["Shipment Status"].isin(sel_statuses)]
-if sel_modalities:
-    df = df[df["Modality"].isin(sel_modalities)]
-if sel_blines:
-    df = df[df["Business Line"].isin(sel_blines)]
-if sel_allocs:
-    df = df[df["Order Allocation"].isin(sel_allocs)]
-if sel_spotded:
-    df = df[df["Spot / Dedicated"].isin(sel_spotded)]
-if sel_opdays:
-    df = df[df["Order Placed Day"].astype(str).isin(sel_opdays)]
+# Cache scopes: dataset_key identifies the loaded file, view_key the
+# filtered view of it (pages pass these to their cached compute functions)
+filter_state = repr((date_range, sorted((col, sorted(map(str, sel))) for col, sel in selections.items())))
+view_key = f"{dataset_key}|{hashlib.sha1(filter_state.encode()).hexdigest()[:16]}"
+st.session_state.dataset_key = dataset_key
+st.session_state.view_key = view_key
+st.session_state.view_filters = (date_range, selections)
 
 if len(df) == 0:
+    warmup.cancel()
     st.warning("No data matches the current filters. Adjust the sidebar filters.")
     st.stop()
 
 st.caption(f"Showing **{len(df):,}** of {len(df_raw):,} shipments after filters")
+quality.render_report(df_raw)
+with st.sidebar:
+    exports.export_menu(df, "shipments", key="export_shipments", label="⬇️ Export filtered shipments")
 
 # ── Render page ─────────────────────────────────────────────
-PAGES[page].render(df)
+with runstats.timed(f"page: {page}"):
+    PAGES[page].render(df)
+
+# ── Warm the other pages in the background ──────────────────
+jobs = [
+    (name, partial(module.precompute, df, view_key, df_raw, dataset_key))
+    for name, module in PAGES.items()
+    if name != page
+]
+warmup.schedule(view_key, jobs)
+with st.sidebar:
+    warmup.render_progress()
+    runstats.render_stats()
@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from lanes import intern_columns, route_labels
+
+# Largest legal payload of a tank container (kg); a dense product reaches
+# it before the tank is full
+MAX_PAYLOAD_KG = 26000.0
+
+# Fill ratios added at load time (percent of capacity)
+FILL_COLUMNS = ["Volume Fill %", "Weight Fill %", "Fill %"]
+
+# Fixed bin grid of the fill histograms: 0.5 % bins up to 150 % (higher
+# values, i.e. data errors, are left out)
+FILL_RANGE = (0.0, 150.0)
+FILL_BINS = 300
+FILL_EDGES = np.linspace(FILL_RANGE[0], FILL_RANGE[1], FILL_BINS + 1)
+
+# Containers filled below this share of capacity count as underfilled
+UNDERFILL_PCT = 80.0
+UNDERFILL_BIN = int(round((UNDERFILL_PCT - FILL_RANGE[0]) / (FILL_EDGES[1] - FILL_EDGES[0])))
+
+# Dimensions the fill ratios are rolled up by: label -> column(s)
+GROUPINGS = {
+    "Carrier": ["Carrier"],
+    "Modality": ["Modality"],
+    "Lane": ["Load City", "Unload City"],
+    "Product": ["Product"],
+}
+
+QUANTILES = {"P10": 0.1, "P50": 0.5, "P90": 0.9}
+
+
+def add_fill_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the volumetric, weight and binding fill ratio of every shipment.
+
+    ``Volume Fill %`` is the loaded ``TC Volume`` (or ``Weight`` over the
+    product's specific gravity) against ``TC Total Capacity``.
+    ``Weight Fill %`` is ``Weight`` against the most the tank can carry of
+    this product: its capacity times the specific gravity, capped at
+    ``MAX_PAYLOAD_KG``. ``Fill %`` is the larger of the two, the limit the
+    shipment is closest to.
+    """
+    capacity = df["TC Total Capacity"].astype("float64").where(lambda c: c > 0)
+    gravity = (
+        df["Product Specific Gravity"].astype("float64").where(lambda g: g > 0)
+        if "Product Specific Gravity" in df.columns else pd.Series(np.nan, index=df.index)
+    )
+    weight = df["Weight"].astype("float64") if "Weight" in df.columns else pd.Series(np.nan, index=df.index)
+
+    volume = df["TC Volume"].astype("float64").where(lambda v: v > 0) if "TC Volume" in df.columns else None
+    volume = (weight / gravity) if volume is None else volume.fillna(weight / gravity)
+    df["Volume Fill %"] = volume / capacity * 100
+
+    payload = np.fmin(capacity * gravity, MAX_PAYLOAD_KG)
+    df["Weight Fill %"] = weight / payload * 100
+    df["Fill %"] = np.fmax(df["Volume Fill %"], df["Weight Fill %"])
+    return df
+
+
+def _bins(values: pd.Series) -> np.ndarray:
+    """Bin of every value on ``FILL_EDGES`` (-1 when missing or out of range)."""
+    values = values.to_numpy(dtype=float, na_value=np.nan)
+    inside = (values >= FILL_RANGE[0]) & (values <= FILL_RANGE[1])
+    bins = np.full(len(values), -1, dtype=np.int64)
+    bins[inside] = np.minimum(((values[inside] - FILL_RANGE[0]) / (FILL_EDGES[1] - FILL_EDGES[0])).astype(np.int64), FILL_BINS - 1)
+    return bins
+
+
+def _quantiles(counts: np.ndarray, q: float) -> np.ndarray:
+    """``q``-quantile of every row of a (group × bin) count matrix, as ``Histogram.quantile``."""
+    totals = counts.sum(axis=1)
+    cum = np.cumsum(counts, axis=1)
+    width = FILL_EDGES[1] - FILL_EDGES[0]
+
+    def value_at(rank):
+        b = np.minimum((cum <= rank[:, None]).sum(axis=1), FILL_BINS - 1)
+        rows = np.arange(len(b))
+        before = cum[rows, b] - counts[rows, b]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return FILL_EDGES[b] + (rank - before + 0.5) / counts[rows, b] * width
+
+    pos = q * (totals - 1)
+    lo = np.floor(pos)
+    value = value_at(lo)
+    upper = value_at(np.minimum(lo + 1, np.maximum(totals - 1, 0)))
+    value = value + (pos - lo) * (upper - value)
+    return np.where(totals > 0, value, np.nan)
+
+
+@dataclass(frozen=True)
+class FillIndex:
+    """Per-row codes of a loaded dataset for rolling up the fill ratios.
+
+    ``groups`` maps every ``GROUPINGS`` label to the group code of each row
+    (-1 when missing) and the group labels; ``bins`` maps every fill column
+    to the row's bin on ``FILL_EDGES`` (-1 when missing or out of range),
+    and ``values`` to its float64 values. Built once per dataset, so a
+    filtered view only needs a ``bincount`` over its rows.
+    """
+
+    groups: dict
+    bins: dict
+    values: dict
+
+
+def build_fill_index(df: pd.DataFrame) -> FillIndex:
+    """Group codes and fill bins of every row of ``df``."""
+    groups = {}
+    for grouping, cols in GROUPINGS.items():
+        if not all(col in df.columns for col in cols):
+            continue
+        if len(cols) == 1:
+            codes, keys = pd.factorize(df[cols[0]], sort=True)
+            labels = np.asarray(keys, dtype=object)
+        else:
+            codes, uniques = intern_columns(df, cols)
+            labels = route_labels(uniques[cols[0]], uniques[cols[1]]).to_numpy(dtype=object)
+        groups[grouping] = (codes.astype(np.int32), labels)
+    columns = [col for col in FILL_COLUMNS if col in df.columns]
+    return FillIndex(
+        groups=groups,
+        bins={col: _bins(df[col]) for col in columns},
+        values={col: df[col].to_numpy(dtype=float, na_value=np.nan) for col in columns},
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_fill_index(dataset_key: str, _df: pd.DataFrame) -> FillIndex:
+    """Fill index of a loaded dataset, built once per ``dataset_key``."""
+    return build_fill_index(_df)
+
+
+def fill_bands(index: FillIndex, rows: np.ndarray, grouping: str, column: str = "Fill %") -> pd.DataFrame:
+    """Percentile bands of ``column`` per group of ``grouping`` over the dataset ``rows`` (positions).
+
+    Every group's histogram comes from one ``bincount`` over
+    ``group * FILL_BINS + bin``, and the percentiles of all groups are read
+    from the cumulative counts at once (to the 0.5 % bin resolution), so no
+    group is sorted. Returns the group, ``Shipments`` (with a fill ratio),
+    ``Mean``, ``P10`` / ``P50`` / ``P90`` and ``Underfilled %`` (share below
+    ``UNDERFILL_PCT``), ranked by shipments.
+    """
+    codes, labels = index.groups[grouping]
+    codes, bins = codes[rows], index.bins[column][rows]
+    keep = (codes >= 0) & (bins >= 0)
+    codes, bins = codes[keep].astype(np.int64), bins[keep]
+    counts = np.bincount(codes * FILL_BINS + bins, minlength=len(labels) * FILL_BINS).reshape(len(labels), FILL_BINS)
+    sums = np.bincount(codes, weights=index.values[column][rows][keep], minlength=len(labels))
+    totals = counts.sum(axis=1)
+    under = counts[:, :UNDERFILL_BIN].sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table = pd.DataFrame({
+            grouping: labels,
+            "Shipments": totals,
+            "Mean": sums / totals,
+            **{name: _quantiles(counts, q) for name, q in QUANTILES.items()},
+            "Underfilled %": under / totals * 100,
+        })
+    table = table[table["Shipments"] > 0]
+    table = table.round({col: 1 for col in ["Mean", *QUANTILES, "Underfilled %"]})
+    return table.sort_values("Shipments", ascending=False, ignore_index=True)
+
+
+def fill_summary(index: FillIndex, rows: np.ndarray) -> dict:
+    """Shipments, median and underfilled share of every fill ratio over the dataset ``rows``."""
+    summary = {}
+    for column, bins in index.bins.items():
+        counts = np.bincount(bins[rows][bins[rows] >= 0], minlength=FILL_BINS)[None, :]
+        total = int(counts.sum())
+        under = counts[0, :UNDERFILL_BIN].sum()
+        summary[column] = {
+            "rows": total,
+            "median": float(_quantiles(counts, 0.5)[0]),
+            "underfilled": float(under / total * 100) if total else float("nan"),
+        }
+    return summary
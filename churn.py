@@ -0,0 +1,88 @@
+"""Lost business: customers and lanes silent for longer than their own order cadence."""
+import numpy as np
+import pandas as pd
+
+from pricing import grouped_quantiles
+
+DATE_COL = "Order Placed Date"
+# Silence, as a multiple of the typical gap between order days, that flags an entity
+DEFAULT_FACTOR = 2.0
+# Order days needed before a cadence is trusted (3 gaps)
+MIN_ORDER_DAYS = 4
+# Silence always shorter than this is never flagged (weekends, holidays)
+MIN_SILENCE_DAYS = 14
+
+
+def entity_cadence(codes: np.ndarray, dates: np.ndarray, weights: np.ndarray, n_entities: int) -> pd.DataFrame:
+    """Order history of every entity, from one pass over its rows sorted by (entity, day).
+
+    ``codes`` holds each row's entity (-1 to skip the row), ``dates`` its
+    order date and ``weights`` its weighted shipments. After one ``lexsort``
+    the rows of an entity form a run in time order: repeated days within a
+    run are dropped, and the differences of consecutive days within a run
+    are the entity's gaps between order days.
+
+    Returns one row per entity code (index) with ``First Order``, ``Last
+    Order``, ``Order Days``, ``Shipments``, ``Volume`` (weighted shipments),
+    ``Cadence (days)`` (the median gap) and ``Mean Gap (days)``; entities
+    with a single order day have no cadence (NaN).
+    """
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    keep = (codes >= 0) & ~np.isnat(dates)
+    codes, days, weights = codes[keep].astype(np.int64), days[keep], weights[keep].astype(np.float64)
+    order = np.lexsort((days, codes))
+    codes, days = codes[order], days[order]
+
+    shipments = np.bincount(codes, minlength=n_entities)
+    volume = np.bincount(codes, weights=weights[order], minlength=n_entities)
+
+    # Distinct order days of each entity, still in (entity, day) order
+    new_day = np.ones(len(codes), dtype=bool)
+    new_day[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+    codes, days = codes[new_day], days[new_day]
+    starts = np.ones(len(codes), dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    ends = np.append(starts[1:], True)
+
+    first = np.full(n_entities, np.iinfo(np.int64).min)
+    last = np.full(n_entities, np.iinfo(np.int64).min)
+    first[codes[starts]] = days[starts]
+    last[codes[ends]] = days[ends]
+
+    # A gap is the step from one order day to the next within the same entity
+    within = ~starts[1:]
+    gaps = grouped_quantiles(codes[1:][within], np.diff(days)[within].astype(np.float64), n_entities, {"P50": 0.5})
+
+    return pd.DataFrame({
+        "First Order": first.astype("datetime64[D]").astype("datetime64[ns]"),
+        "Last Order": last.astype("datetime64[D]").astype("datetime64[ns]"),
+        "Order Days": np.bincount(codes, minlength=n_entities),
+        "Shipments": shipments,
+        "Volume": volume,
+        "Cadence (days)": gaps["P50"],
+        "Mean Gap (days)": gaps["mean"],
+    })
+
+
+def add_silence(table: pd.DataFrame, as_of) -> pd.DataFrame:
+    """``table`` with ``Days Silent`` since the last order and ``Overdue ×`` (silence / cadence) as of ``as_of``."""
+    table = table.copy()
+    table["Days Silent"] = (pd.Timestamp(as_of).normalize() - table["Last Order"]).dt.days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["Overdue ×"] = table["Days Silent"] / table["Cadence (days)"]
+    return table
+
+
+def lost_mask(table: pd.DataFrame, factor: float = DEFAULT_FACTOR, min_order_days: int = MIN_ORDER_DAYS,
+              min_silence: int = MIN_SILENCE_DAYS) -> np.ndarray:
+    """Entities of an ``add_silence`` table silent for more than ``factor`` times their cadence.
+
+    Only entities with at least ``min_order_days`` order days (so the
+    cadence means something) and at least ``min_silence`` days of silence
+    are flagged.
+    """
+    return (
+        (table["Order Days"] >= min_order_days)
+        & (table["Days Silent"] >= min_silence)
+        & (table["Overdue ×"] > factor)
+    ).to_numpy()
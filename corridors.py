@@ -0,0 +1,92 @@
+import pandas as pd
+
+from lanes import route_labels
+
+# Geographic levels, coarsest first: (origin column, destination column)
+OD_LEVELS = {
+    "Region": ("Load Region", "Unload Region"),
+    "Country": ("Load Country", "Unload Country"),
+    "City": ("Load City", "Unload City"),
+}
+
+# Measures held by the cube
+OD_MEASURES = ["Shipments", "Total KM", "Count"]
+
+
+def build_od_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Sparse origin–destination cube of ``df``.
+
+    One row per observed combination of load and unload region, country
+    and city and Order Placed Date month (``Month``, "YYYY-MM"), with the
+    weighted ``Shipments``, the sum of ``Total KM`` and the row ``Count``.
+    Missing keys are kept as their own group, so every roll-up of the
+    cube matches the same groupby on the rows.
+    """
+    keys = [col for pair in OD_LEVELS.values() for col in pair if col in df.columns]
+    frame = df[keys].copy()
+    frame["Month"] = df["Order Month Name"] if "Order Month Name" in df.columns else pd.NA
+    # Sum in float64: float32 totals drift on large views
+    frame["Shipments"] = df["Shipment Weight"].astype("float64")
+    frame["Total KM"] = df["Total KM"].astype("float64") if "Total KM" in df.columns else 0.0
+    grouped = frame.groupby(keys + ["Month"], observed=True, dropna=False, sort=False)
+    cube = grouped.agg(Shipments=("Shipments", "sum"), **{"Total KM": ("Total KM", "sum")}, Count=("Shipments", "size"))
+    cube = cube.reset_index()
+    # Plain strings so months compare in calendar order
+    cube["Month"] = cube["Month"].astype("string")
+    return cube
+
+
+def slice_cube(cube: pd.DataFrame, path: dict = None, months: tuple = None) -> pd.DataFrame:
+    """Cube rows on the drill ``path`` ({column: value}) within ``months`` (first, last)."""
+    keep = pd.Series(True, index=cube.index)
+    for col, value in (path or {}).items():
+        keep &= cube[col] == value
+    if months is not None:
+        keep &= cube["Month"].between(*months).fillna(False)
+    return cube[keep.to_numpy()]
+
+
+def rollup(cube: pd.DataFrame, by, measure: str = "Shipments") -> pd.Series:
+    """Total ``measure`` per value of ``by`` (a column or list of columns), missing keys dropped."""
+    return cube.groupby(by, observed=True)[measure].sum()
+
+
+def top(cube: pd.DataFrame, col: str, n: int, label: str, measure: str = "Shipments") -> pd.DataFrame:
+    """The ``n`` largest values of ``col`` by ``measure`` as a ``[label, measure]`` frame."""
+    result = rollup(cube, col, measure).nlargest(n).reset_index()
+    result.columns = [label, measure]
+    return result
+
+
+def top_corridors(cube: pd.DataFrame, origin_level: str, destination_level: str, n: int,
+                  measure: str = "Shipments") -> pd.DataFrame:
+    """The ``n`` largest origin → destination pairs by ``measure``.
+
+    Origins are taken at ``origin_level`` and destinations at
+    ``destination_level``. Returns ``Corridor``, ``Origin``,
+    ``Destination`` and the three measures, ranked by ``measure``.
+    """
+    origin = OD_LEVELS[origin_level][0]
+    destination = OD_LEVELS[destination_level][1]
+    pairs = cube.groupby([origin, destination], observed=True)[OD_MEASURES].sum()
+    pairs = pairs.nlargest(n, measure).reset_index()
+    pairs = pairs.rename(columns={origin: "Origin", destination: "Destination"})
+    pairs.insert(0, "Corridor", route_labels(pairs["Origin"], pairs["Destination"]))
+    return pairs
+
+
+def od_matrix(cube: pd.DataFrame, origin_level: str, destination_level: str,
+              measure: str = "Shipments", limit: int = None) -> pd.DataFrame:
+    """Origin × destination matrix of ``measure`` (origins as rows).
+
+    With ``limit``, only the largest origins and destinations (by their
+    total) are kept. Rows and columns are ordered by total, largest first.
+    """
+    origin = OD_LEVELS[origin_level][0]
+    destination = OD_LEVELS[destination_level][1]
+    matrix = rollup(cube, [origin, destination], measure).unstack(fill_value=0)
+    rows = matrix.sum(axis=1).sort_values(ascending=False).index
+    cols = matrix.sum(axis=0).sort_values(ascending=False).index
+    if limit is not None:
+        rows, cols = rows[:limit], cols[:limit]
+    return matrix.loc[rows, cols]
@@ -1,5 +1,13 @@
+import os
+
+import numpy as np
 import pandas as pd
 import streamlit as st
+from capacity import add_fill_ratios
+from fingerprints import fingerprint
+from lanes import LANE_COLS, intern_columns, route_labels
+from pricing import add_rates
+from quality import PLACEHOLDERS, validate
 
 # Excel serial date columns that need conversion
 SERIAL_DATE_COLS = [
@@ -27,11 +35,52 @@ NUMERIC_COLS = [
     "# of Compartments",
 ]
 
+# Measures that are stored as float32 after loading (float64 precision is
+# not needed for distances, weights or tank capacities)
+FLOAT32_COLS = [
+    "Weight",
+    "Total KM",
+    "Full KM",
+    "Empty KM",
+    "Product Specific Gravity",
+    "TC Total Capacity",
+    "TC Volume",
+    "TC Length",
+    "Shipment Weight",
+    "Lead Time Days",
+    "KM Utilization %",
+    "Volume Fill %",
+    "Weight Fill %",
+    "Fill %",
+    "Rate / KM",
+    "Rate / Ton-KM",
+]
+
+# Whole-number columns that are stored as the smallest nullable integer type
+SMALL_INT_COLS = ["# of Compartments", "Load Week", "Order Week"]
+
+# Derived day-of-week columns get a fixed Monday → Sunday category order
+DOW_COLS = ["Load DOW", "Order DOW"]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
 
-def _convert_serial_dates(df: pd.DataFrame) -> pd.DataFrame:
+def _present(s: pd.Series) -> pd.Series:
+    """Cells holding a value in the file (not empty and not a placeholder)."""
+    # Text may be read as object or as a pandas string dtype ("str" by default in pandas 3)
+    if pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+        return s.notna() & ~s.isin(PLACEHOLDERS)
+    return s.notna()
+
+
+def _convert_serial_dates(df: pd.DataFrame, unparsed: dict = None) -> pd.DataFrame:
     """Convert Excel serial number columns to proper datetime.
     
-    Handles both Excel serial numbers and proper datetime objects.
+    Handles both Excel serial numbers and proper datetime objects. Values
+    that end up missing although the file held one are recorded per column
+    in ``unparsed`` (for the validation stage).
     """
     # pandas Timedelta maxes out at ~106,752 days (nanosecond precision),
     # so we must discard anything beyond a reasonable range BEFORE converting.
@@ -41,6 +90,7 @@ def _convert_serial_dates(df: pd.DataFrame) -> pd.DataFrame:
 
     for col in SERIAL_DATE_COLS:
         if col in df.columns:
+            present = _present(df[col])
             # First, try to convert to datetime directly (in case it's already a datetime)
             df[col] = pd.to_datetime(df[col], errors="coerce")
             
@@ -53,14 +103,22 @@ def _convert_serial_dates(df: pd.DataFrame) -> pd.DataFrame:
                 df[col] = pd.to_datetime(
                     numeric, unit="D", origin="1899-12-30", errors="coerce"
                 )
+            if unparsed is not None:
+                unparsed[col] = (present & df[col].isna()).to_numpy()
     return df
 
 
-def _clean_numeric(df: pd.DataFrame) -> pd.DataFrame:
-    """Coerce numeric columns, replacing '-' and blanks with NaN."""
+def _clean_numeric(df: pd.DataFrame, unparsed: dict = None) -> pd.DataFrame:
+    """Coerce numeric columns, replacing '-' and blanks with NaN.
+
+    Other text that is not a number is recorded per column in ``unparsed``.
+    """
     for col in NUMERIC_COLS:
         if col in df.columns:
+            present = _present(df[col])
             df[col] = pd.to_numeric(df[col], errors="coerce")
+            if unparsed is not None:
+                unparsed[col] = (present & df[col].isna()).to_numpy()
     return df
 
 
@@ -106,9 +164,77 @@ def _derive_columns(df: pd.DataFrame) -> pd.DataFrame:
             df["Full KM"] / df["Total KM"].replace(0, pd.NA) * 100
         )
 
+    if "TC Total Capacity" in df.columns:
+        # Tank-container fill ratios; see capacity.py
+        df = add_fill_ratios(df)
+
+    if "Quote" in df.columns and "Full KM" in df.columns:
+        # Quote per full km and per ton-km; see pricing.py
+        df = add_rates(df)
+
     if "Load Country" in df.columns and "Unload Country" in df.columns:
-        df["Route"] = df["Load Country"] + " → " + df["Unload Country"]
+        # Interned country pairs: labels are formatted once per distinct route
+        route_ids, routes = intern_columns(df, ["Load Country", "Unload Country"])
+        labels = route_labels(routes["Load Country"], routes["Unload Country"])
+        df["Route"] = pd.Categorical.from_codes(route_ids, categories=labels).reorder_categories(
+            labels.sort_values()
+        )
+
+    if all(c in df.columns for c in LANE_COLS):
+        # Integer lane id per (customer, load city, unload city); see lanes.py
+        df["Lane ID"], _ = intern_columns(df[LANE_COLS].fillna(""), LANE_COLS)
+
+    return df
+
+
+def _smallest_int_dtype(s: pd.Series):
+    """Smallest nullable integer dtype that holds ``s``, or None if not whole."""
+    values = s.dropna()
+    if len(values) == 0 or not (values == values.round()).all():
+        return None
+    lo, hi = values.min(), values.max()
+    for dtype, info in (("Int8", np.iinfo(np.int8)), ("Int16", np.iinfo(np.int16)), ("Int32", np.iinfo(np.int32))):
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return None
+
 
+def _optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Store every column in the narrowest dtype that keeps its values.
+
+    Records the deep memory usage before and after in
+    ``df.attrs["memory"]`` (bytes) for the sidebar summary.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+
+    for col in FLOAT32_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+
+    for col in SMALL_INT_COLS:
+        if col in df.columns:
+            dtype = _smallest_int_dtype(pd.to_numeric(df[col], errors="coerce"))
+            if dtype is not None:
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+
+    for col in DOW_COLS:
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col], categories=WEEKDAYS)
+
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or col in SERIAL_DATE_COLS:
+            continue
+        if pd.api.types.infer_dtype(s, skipna=True) != "string":
+            continue
+        n_valid = s.notna().sum()
+        if n_valid and s.nunique() <= n_valid * CATEGORY_MAX_UNIQUE_RATIO:
+            df[col] = s.astype("category")
+
+    df.attrs["memory"] = {
+        "before": before,
+        "after": int(df.memory_usage(deep=True).sum()),
+    }
     return df
 
 
@@ -121,15 +247,66 @@ def count_weighted_shipments(df: pd.DataFrame, by_column=None):
     if by_column is None:
         return df["Shipment Weight"].sum()
     else:
-        return df.groupby(by_column)["Shipment Weight"].sum()
+        return df.groupby(by_column, observed=True)["Shipment Weight"].sum()
 
 
-@st.cache_data(show_spinner="Loading Excel data…")
-def load_data(file) -> pd.DataFrame:
-    """Load and clean an Excel file, returning a processed DataFrame."""
+# Steps of a load with the share of the load time done before each
+# (reading the workbook takes most of it)
+LOAD_STEPS = [
+    ("Reading the workbook", 0.0),
+    ("Converting dates and numbers", 0.8),
+    ("Deriving columns", 0.85),
+    ("Checking data quality", 0.93),
+    ("Optimizing memory", 0.95),
+]
+
+
+def parse_excel(file, progress=None) -> pd.DataFrame:
+    """Load and clean an Excel file, returning a processed DataFrame.
+
+    ``progress(fraction, text)`` is called at the start of every step of
+    ``LOAD_STEPS``.
+    """
+    steps = iter(LOAD_STEPS)
+
+    def step():
+        text, fraction = next(steps)
+        if progress is not None:
+            progress(fraction, text)
+
+    step()
     df = pd.read_excel(file, sheet_name=0, engine="openpyxl")
-    df = _convert_serial_dates(df)
-    df = _clean_numeric(df)
+    step()
+    unparsed = {"unparsed_date": {}, "unparsed_number": {}}
+    df = _convert_serial_dates(df, unparsed["unparsed_date"])
+    df = _clean_numeric(df, unparsed["unparsed_number"])
+    step()
     df = _add_shipment_weight(df)
     df = _derive_columns(df)
+    step()
+    # Data-quality rules in one pass: per-row issue bitmask; see quality.py
+    df = validate(df, unparsed)
+    step()
+    df = _optimize_dtypes(df)
+    # File name: the same dataset across re-uploads and rewrites of the file
+    df.attrs["source"] = os.path.basename(getattr(file, "name", file))
     return df
+
+
+# Parsed datasets kept in the result cache
+MAX_DATASETS = 4
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_DATASETS)
+def load_parsed(fingerprint: str, _file, _progress=None) -> pd.DataFrame:
+    """Parsed dataset of ``_file``, cached per content ``fingerprint`` (see fingerprints.py)."""
+    return parse_excel(_file, _progress)
+
+
+def load_data(file) -> pd.DataFrame:
+    """Load and clean an Excel file, returning a processed DataFrame.
+
+    Cached per content fingerprint, so a file overwritten in place is
+    parsed again.
+    """
+    return load_parsed(fingerprint(file), file)
@@ -0,0 +1,113 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Columns offered as multiselect filters in the sidebar (in display order)
+FILTER_COLS = [
+    "Customer Name",
+    "Load Country",
+    "Unload Country",
+    "Market",
+    "Shipment Status",
+    "Modality",
+    "Business Line",
+    "Order Allocation",
+    "Spot / Dedicated",
+    "Order Placed Day",
+]
+
+# Columns whose values are compared as strings (mixed types in the source)
+STRING_KEYED_COLS = {"Order Placed Day"}
+
+
+@dataclass(frozen=True)
+class Dimension:
+    """Dictionary encoding of one column of the loaded frame.
+
+    ``values`` holds the sorted distinct values, ``counts`` the number of
+    rows per value and ``codes`` the per-row position into ``values``
+    (-1 for missing).
+    """
+
+    name: str
+    values: np.ndarray
+    counts: np.ndarray
+    codes: np.ndarray
+    index: dict = field(repr=False)
+
+    @property
+    def options(self) -> list:
+        """Sorted distinct values as a plain list, for widgets."""
+        return self.values.tolist()
+
+    def lookup(self, selected) -> np.ndarray:
+        """Translate selected values into their integer codes."""
+        return np.array(
+            [self.index[v] for v in selected if v in self.index], dtype=np.int32
+        )
+
+    def mask(self, selected) -> np.ndarray:
+        """Row mask for ``column.isin(selected)`` computed from the codes."""
+        # One extra slot at the end so that code -1 (missing) maps to False
+        lut = np.zeros(len(self.values) + 1, dtype=bool)
+        lut[self.lookup(selected)] = True
+        return lut[self.codes]
+
+    def categorical(self) -> pd.Categorical:
+        """The column as a pandas Categorical sharing the same codes."""
+        return pd.Categorical.from_codes(self.codes, categories=self.values)
+
+
+def _encode(name: str, s: pd.Series) -> Dimension:
+    """Factorize a column into sorted values, counts and row codes."""
+    if name in STRING_KEYED_COLS:
+        s = s.astype(str).where(s.notna())
+    codes, uniques = pd.factorize(s, sort=True)
+    codes = codes.astype(np.int32)
+    values = np.asarray(uniques, dtype=object)
+    counts = np.bincount(codes[codes >= 0], minlength=len(values))
+    index = {v: i for i, v in enumerate(values.tolist())}
+    return Dimension(name=name, values=values, counts=counts, codes=codes, index=index)
+
+
+def build_catalog(df: pd.DataFrame, columns=None) -> dict:
+    """Build a Dimension for every filterable column present in ``df``."""
+    columns = FILTER_COLS if columns is None else columns
+    return {col: _encode(col, df[col]) for col in columns if col in df.columns}
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_catalog(dataset_key: str, _df: pd.DataFrame) -> dict:
+    """Dimension catalog for a loaded dataset, built once per ``dataset_key``.
+
+    The frame itself is not hashed; ``dataset_key`` must identify the same
+    input that was passed to ``load_data``.
+    """
+    return build_catalog(_df)
+
+
+def filter_mask(catalog: dict, selections: dict, n_rows: int) -> np.ndarray:
+    """Combine the per-column selections into one row mask (AND across columns)."""
+    mask = np.ones(n_rows, dtype=bool)
+    for col, selected in selections.items():
+        if selected and col in catalog:
+            mask &= catalog[col].mask(selected)
+    return mask
+
+
+def date_bounds(date_range) -> tuple:
+    """``(start, stop)`` of a sidebar date range: its first day and the day after its last.
+
+    The range covers whole days, so a timestamp ``t`` is inside it when
+    ``start <= t < stop``, whatever its time of day.
+    """
+    start, end = pd.Timestamp(date_range[0]).normalize(), pd.Timestamp(date_range[1]).normalize()
+    return start, end + pd.Timedelta(days=1)
+
+
+def date_mask(dates: pd.Series, date_range) -> np.ndarray:
+    """Rows whose date lies in the whole days of ``date_range`` (missing dates are kept)."""
+    start, stop = date_bounds(date_range)
+    return ((dates >= start) & (dates < stop) | dates.isna()).to_numpy()
@@ -0,0 +1,117 @@
+import tempfile
+
+import pandas as pd
+import streamlit as st
+
+# Rows encoded per chunk; bounds the working memory of every writer
+CHUNK_ROWS = 50_000
+# Smaller chunks for XLSX, whose rows are converted to Python objects
+XLSX_CHUNK_ROWS = 5_000
+# Data rows per worksheet (Excel allows 1,048,576 rows including the header)
+XLSX_MAX_ROWS = 1_048_575
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    """Consecutive row slices of ``df`` (views, not copies)."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df: pd.DataFrame, fh, index: bool = False):
+    """Write ``df`` to the binary file ``fh`` as UTF-8 CSV, one chunk at a time."""
+    for i, chunk in enumerate(iter_chunks(df)):
+        fh.write(chunk.to_csv(index=index, header=(i == 0)).encode("utf-8"))
+    if len(df) == 0:
+        fh.write(df.to_csv(index=index).encode("utf-8"))
+
+
+def _arrow_ready(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Give mixed object columns a single string type so every chunk shares one schema."""
+    object_cols = chunk.columns[chunk.dtypes == object]
+    if len(object_cols) == 0:
+        return chunk
+    return chunk.astype({col: "string" for col in object_cols})
+
+
+def write_parquet(df: pd.DataFrame, fh, index: bool = False):
+    """Write ``df`` to ``fh`` as Parquet, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(_arrow_ready(df.iloc[:0]), preserve_index=index)
+    with pq.ParquetWriter(fh, schema) as writer:
+        for chunk in iter_chunks(df):
+            table = pa.Table.from_pandas(_arrow_ready(chunk), schema=schema, preserve_index=index)
+            writer.write_table(table)
+
+
+def write_xlsx(df: pd.DataFrame, fh, index: bool = False, sheet_name: str = "Data"):
+    """Write ``df`` to ``fh`` as XLSX with openpyxl's streaming (write-only) mode.
+
+    Frames longer than one worksheet continue on ``<sheet_name> 2``, ``3``, ...
+    """
+    from openpyxl import Workbook
+
+    if index:
+        df = df.reset_index()
+    header = [str(col) for col in df.columns]
+
+    wb = Workbook(write_only=True)
+    ws = None
+    rows_in_sheet = XLSX_MAX_ROWS
+    for chunk in iter_chunks(df, XLSX_CHUNK_ROWS):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if rows_in_sheet == XLSX_MAX_ROWS:
+                title = sheet_name if ws is None else f"{sheet_name} {len(wb.worksheets) + 1}"
+                ws = wb.create_sheet(title)
+                ws.append(header)
+                rows_in_sheet = 0
+            ws.append(row)
+            rows_in_sheet += 1
+    if ws is None:
+        wb.create_sheet(sheet_name).append(header)
+    wb.save(fh)
+
+
+WRITERS = {"CSV": write_csv, "Parquet": write_parquet, "XLSX": write_xlsx}
+
+
+def export_file(df: pd.DataFrame, fmt: str, index: bool = False) -> bytes:
+    """``df`` encoded as ``fmt``.
+
+    The writers encode one chunk at a time into a temporary file, so only
+    the finished file is held in memory; Streamlit keeps the whole payload
+    in memory while serving the download.
+    """
+    with tempfile.TemporaryFile() as fh:
+        WRITERS[fmt](df, fh, index=index)
+        fh.seek(0)
+        return fh.read()
+
+
+@st.fragment
+def export_menu(df: pd.DataFrame, name: str, key: str, index: bool = False, label: str = "⬇️ Export"):
+    """Popover with a format choice and a download button for ``df``.
+
+    Runs as a fragment, so picking a format does not rerun the page. The
+    file is only generated when the button is clicked, on a separate
+    thread, so the page script is not blocked.
+    """
+    with st.popover(label):
+        fmt = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key=f"{key}_format")
+        ext, mime = EXPORT_FORMATS[fmt]
+        st.download_button(
+            f"Download {len(df):,} rows",
+            data=lambda: export_file(df, fmt, index=index),
+            file_name=f"{name}.{ext}",
+            mime=mime,
+            on_click="ignore",
+            key=f"{key}_download",
+        )
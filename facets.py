@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def facet_counts(catalog: dict, selections: dict, weights: np.ndarray, base_mask=None) -> dict:
+    """Weighted row counts per value of every facet under the *other* filters.
+
+    For each column in ``catalog`` the result holds an array aligned with
+    ``catalog[col].values``: the summed ``weights`` of rows that pass every
+    active filter except the one on ``col`` itself (and ``base_mask``, which
+    always applies). This is what a faceted sidebar shows next to each
+    option.
+
+    All facets are counted in one pass: a row that passes every filter
+    contributes to all facets, a row that fails exactly one filter
+    contributes only to that facet, and rows failing two or more are
+    irrelevant to every facet.
+    """
+    n_rows = len(weights)
+    fails = np.zeros(n_rows, dtype=np.int8)
+    facet_masks = {}
+    for col, selected in selections.items():
+        if selected and col in catalog:
+            m = catalog[col].mask(selected)
+            facet_masks[col] = m
+            fails += ~m
+    if base_mask is not None:
+        # Rows outside the base filter never count, whatever the facet
+        fails[~base_mask] = 2
+
+    passing = fails == 0
+    near_miss = fails == 1
+
+    counts = {}
+    for col, dim in catalog.items():
+        n_values = len(dim.values)
+        rows = passing
+        if col in facet_masks:
+            rows = passing | (near_miss & ~facet_masks[col])
+        codes = dim.codes[rows]
+        valid = codes >= 0
+        counts[col] = np.bincount(
+            codes[valid], weights=weights[rows][valid], minlength=n_values
+        )
+    return counts
+
+
+def reachable_options(dim, counts: np.ndarray, selected) -> list:
+    """Values with a non-zero count, plus anything already selected."""
+    keep = counts > 0
+    if selected:
+        keep[dim.lookup(selected)] = True
+    return dim.values[keep].tolist()
@@ -0,0 +1,82 @@
+"""Content fingerprints of datasets: the key of every per-dataset cache."""
+import hashlib
+import os
+import threading
+import time
+
+import streamlit as st
+
+# Bytes hashed per read
+CHUNK_BYTES = 1 << 20
+# A file modified this recently may still be written within the same mtime
+# tick, so its stat signature is not trusted yet
+RACY_SECONDS = 2.0
+
+
+def hash_stream(stream) -> str:
+    """BLAKE2b digest of a binary stream, read in ``CHUNK_BYTES`` chunks from the start."""
+    digest = hashlib.blake2b(digest_size=16)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(CHUNK_BYTES), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return f"blake2b:{digest.hexdigest()}"
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _upload_fingerprint(file_id: str, _upload) -> str:
+    """Fingerprint of an upload, hashed once per ``file_id`` (a new id per upload)."""
+    return hash_stream(_upload)
+
+
+def of_upload(upload) -> str:
+    """Fingerprint of a Streamlit ``UploadedFile``."""
+    return _upload_fingerprint(upload.file_id, upload)
+
+
+@st.cache_resource(show_spinner=False)
+def _known_files() -> dict:
+    """Process-wide memo: absolute path -> (stat signature, fingerprint, time hashed), with its lock."""
+    return {"lock": threading.Lock(), "files": {}}
+
+
+def stat_signature(stat: os.stat_result) -> tuple:
+    """(size, mtime, inode) of a file: changes whenever it is rewritten or replaced."""
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def of_path(path) -> str:
+    """Fingerprint of a file on disk.
+
+    The contents are hashed only when the file's (size, mtime, inode)
+    differ from the last time it was fingerprinted, or when it was modified
+    within ``RACY_SECONDS`` of that (a rewrite in the same mtime tick would
+    not change the signature). An overwritten or replaced file therefore
+    gets a new fingerprint, while a touched or copied file with the same
+    contents keeps its old one.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = stat_signature(stat)
+    known = _known_files()
+    with known["lock"]:
+        entry = known["files"].get(path)
+    if entry is not None and entry[0] == signature and stat.st_mtime_ns / 1e9 < entry[2] - RACY_SECONDS:
+        return entry[1]
+
+    hashed = time.time()
+    with open(path, "rb") as fh:
+        fingerprint = hash_stream(fh)
+    # The file may have changed while it was read: only a signature from
+    # before the read that still holds afterwards is remembered
+    if stat_signature(os.stat(path)) == signature:
+        with known["lock"]:
+            known["files"][path] = (signature, fingerprint, hashed)
+    return fingerprint
+
+
+def fingerprint(file) -> str:
+    """Fingerprint of a path or an uploaded file."""
+    if isinstance(file, (str, os.PathLike)):
+        return of_path(file)
+    return of_upload(file)
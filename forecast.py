@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+# Days of history used for fitting: two years, so the yearly models have a
+# full season to look back on
+HISTORY_DAYS = 2 * 364 + 28
+# Most recent days held out to pick a model per series
+HOLDOUT_DAYS = 28
+# Days of one-step errors used for the prediction bands
+RESIDUAL_DAYS = 182
+# Shortest forecast horizon (the horizon otherwise runs to the end of the year)
+MIN_HORIZON_DAYS = 56
+
+WEEK = 7
+# 52 weeks, so a "year ago" falls on the same weekday
+YEAR = 364
+
+# Smoothing constants tried for the level; weekly seasonal smoothing constant
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.4])
+SEASON_GAMMA = 0.1
+# Bounds of the yearly seasonal factor
+YEARLY_FACTOR_RANGE = (0.5, 2.0)
+# z for the central 80 % prediction band
+BAND_Z = 1.2816
+
+MODEL_NAMES = (
+    ["Seasonal naive (week)", "Seasonal naive (year)"]
+    + [f"Exponential smoothing (α={a:g})" for a in ALPHAS]
+)
+
+
+def series_matrix(dates: pd.Series, codes: np.ndarray, weights: np.ndarray, n_series: int,
+                  end: pd.Timestamp, days: int) -> np.ndarray:
+    """Dense (series × day) matrix of summed ``weights`` for the ``days`` days up to ``end``.
+
+    ``codes`` gives the series of every row (-1 to skip it). Built with one
+    ``bincount`` over ``series * days + day``.
+    """
+    day = (dates.dt.normalize() - (end - pd.Timedelta(days=days - 1))).dt.days.to_numpy()
+    keep = (codes >= 0) & (day >= 0) & (day < days)
+    flat = codes[keep].astype(np.int64) * days + day[keep]
+    counts = np.bincount(flat, weights=weights[keep], minlength=n_series * days)
+    return counts.reshape(n_series, days)
+
+
+def _seasonal_naive(Y: np.ndarray, period: int, horizon: int) -> np.ndarray:
+    """Repeat the last ``period`` days of every row."""
+    T = Y.shape[1]
+    return Y[:, T - period + np.arange(horizon) % period]
+
+
+def _trailing_mean(Y: np.ndarray, width: int) -> np.ndarray:
+    """Mean of the ``width`` days ending at each day (shorter at the start)."""
+    cumulative = np.concatenate([np.zeros((Y.shape[0], 1)), np.cumsum(Y, axis=1)], axis=1)
+    end = np.arange(1, Y.shape[1] + 1)
+    start = np.maximum(end - width, 0)
+    return (cumulative[:, end] - cumulative[:, start]) / (end - start)
+
+
+def _yearly_factor(Y: np.ndarray, horizon: int) -> np.ndarray:
+    """How last year's 4-week volume moved from the forecast origin to each horizon day.
+
+    1 where there is less than a year of history or no volume a year ago.
+    """
+    T = Y.shape[1]
+    factor = np.ones((Y.shape[0], horizon))
+    if T < YEAR + 4 * WEEK:
+        return factor
+    smooth = _trailing_mean(Y, 4 * WEEK)
+    origin = smooth[:, T - 1 - YEAR]
+    target = smooth[:, np.minimum(T - 1 - YEAR + 1 + np.arange(horizon), T - 1)]
+    ok = origin > 0
+    factor[ok] = np.clip(target[ok] / origin[ok, None], *YEARLY_FACTOR_RANGE)
+    return factor
+
+
+def _exp_smoothing(Y: np.ndarray, alpha: np.ndarray, horizon: int) -> tuple:
+    """Additive level + weekly seasonal exponential smoothing of every row of ``Y``.
+
+    ``alpha`` holds one level smoothing constant per row. The recursion
+    runs once over the days with every series (and constant) as a vector
+    element. Returns the forecast (rows × horizon) and the one-step-ahead
+    errors (rows × days).
+    """
+    n, T = Y.shape
+    warmup = min(4 * WEEK, T)
+    level = Y[:, :warmup].mean(axis=1)
+    season = np.zeros((n, WEEK))
+    for d in range(WEEK):
+        days = Y[:, d:warmup:WEEK]
+        if days.shape[1]:
+            season[:, d] = days.mean(axis=1) - level
+
+    errors = np.empty((n, T))
+    gamma = SEASON_GAMMA * (1 - alpha)
+    for t in range(T):
+        d = t % WEEK
+        err = Y[:, t] - (level + season[:, d])
+        errors[:, t] = err
+        level = level + alpha * err
+        season[:, d] += gamma * err
+    forecast = level[:, None] + season[:, (T + np.arange(horizon)) % WEEK]
+    return forecast, errors
+
+
+def _candidates(Y: np.ndarray, horizon: int) -> tuple:
+    """Forecasts of every model in ``MODEL_NAMES`` (models × series × horizon)
+    and the matching one-step error spread (models × series)."""
+    n, T = Y.shape
+    recent = slice(max(T - RESIDUAL_DAYS, 0), T)
+    forecasts, spreads = [], []
+
+    forecasts.append(_seasonal_naive(Y, WEEK, horizon))
+    spreads.append((Y[:, WEEK:] - Y[:, :-WEEK])[:, recent].std(axis=1) if T > WEEK else np.zeros(n))
+    if T >= YEAR + WEEK:
+        forecasts.append(_seasonal_naive(Y, YEAR, horizon))
+        spreads.append((Y[:, YEAR:] - Y[:, :-YEAR])[:, -min(RESIDUAL_DAYS, T - YEAR):].std(axis=1))
+    else:
+        forecasts.append(np.full((n, horizon), np.nan))
+        spreads.append(np.full(n, np.nan))
+
+    # All smoothing constants in one pass: rows are (constant, series) pairs
+    stacked = np.tile(Y, (len(ALPHAS), 1))
+    smoothed, errors = _exp_smoothing(stacked, np.repeat(ALPHAS, n), horizon)
+    factor = np.tile(_yearly_factor(Y, horizon), (len(ALPHAS), 1))
+    smoothed = np.maximum(smoothed, 0) * factor
+    forecasts.extend(smoothed.reshape(len(ALPHAS), n, horizon))
+    spreads.extend(errors[:, recent].std(axis=1).reshape(len(ALPHAS), n))
+    return np.stack(forecasts), np.stack(spreads)
+
+
+def _band_scale(model: np.ndarray, horizon: int) -> np.ndarray:
+    """Standard deviation of the cumulative forecast error, in units of the one-step spread.
+
+    For exponential smoothing with constant α, the error of the sum of the
+    next H days has variance σ² Σ_{k<H} (1 + αk)²; the seasonal naive
+    models are treated as independent days (H σ²).
+    """
+    k = np.arange(horizon)
+    alpha = np.zeros(len(model))
+    smoothing = model >= 2
+    alpha[smoothing] = ALPHAS[model[smoothing] - 2]
+    return np.sqrt(np.cumsum((1 + alpha[:, None] * k) ** 2, axis=1))
+
+
+def fit_forecasts(Y: np.ndarray, horizon: int) -> dict:
+    """Forecast every row of the (series × day) matrix ``Y``.
+
+    Each series gets the model with the smallest error of its weekly
+    totals over the last ``HOLDOUT_DAYS`` when fitted without them; the
+    chosen models are then refitted on the full history. Returns
+    ``forecast`` (series × horizon, per day), ``cum_sd`` (standard
+    deviation of the cumulative forecast from day 1 to each day) and
+    ``model`` (index into ``MODEL_NAMES`` per series).
+    """
+    n, T = Y.shape
+    held, _ = _candidates(Y[:, :T - HOLDOUT_DAYS], HOLDOUT_DAYS)
+    actual = Y[:, T - HOLDOUT_DAYS:].reshape(n, -1, WEEK).sum(axis=2)
+    weekly = held.reshape(held.shape[0], n, -1, WEEK).sum(axis=3)
+    error = np.abs(weekly - actual).mean(axis=2)
+    model = np.nanargmin(np.where(np.isnan(error), np.inf, error), axis=0)
+
+    forecasts, spreads = _candidates(Y, horizon)
+    rows = np.arange(n)
+    forecast = forecasts[model, rows]
+    spread = np.nan_to_num(spreads[model, rows])
+    return {
+        "forecast": forecast,
+        "cum_sd": spread[:, None] * _band_scale(model, horizon),
+        "model": model,
+    }
+
+
+def forecast_horizon(end: pd.Timestamp) -> int:
+    """Days from the day after ``end`` to the end of its year, at least ``MIN_HORIZON_DAYS``."""
+    year_end = pd.Timestamp(year=end.year, month=12, day=31)
+    return max(MIN_HORIZON_DAYS, (year_end - end.normalize()).days)
+
+
+def forecast_orders(df: pd.DataFrame, by: str = None, date_col: str = "Order Placed Date") -> dict:
+    """Daily weighted order forecasts for the total or for every value of ``by``.
+
+    The history runs up to the last order day in ``df``. Returns None when
+    there are fewer than ``HOLDOUT_DAYS`` + 2 weeks of history, else
+    ``keys`` (series labels, "Total" without ``by``), ``history`` (index of
+    the fitted days), ``dates`` (forecast days), ``recent`` (the last
+    ``RESIDUAL_DAYS`` days of actuals, series × day) and the results of
+    ``fit_forecasts``.
+    """
+    rows = df.dropna(subset=[date_col])
+    if len(rows) == 0:
+        return None
+    end = rows[date_col].max().normalize()
+    days = min(HISTORY_DAYS, (end - rows[date_col].min().normalize()).days + 1)
+    # Whole weeks, so the holdout splits into weeks
+    days -= days % WEEK
+    if days < HOLDOUT_DAYS + 2 * WEEK:
+        return None
+
+    if by is None:
+        codes, keys = np.zeros(len(rows), dtype=np.int64), np.array(["Total"], dtype=object)
+    else:
+        codes, keys = pd.factorize(rows[by], sort=True)
+        keys = np.asarray(keys, dtype=object)
+    weights = rows["Shipment Weight"].to_numpy(dtype=float)
+    Y = series_matrix(rows[date_col], codes, weights, len(keys), end, days)
+
+    horizon = forecast_horizon(end)
+    result = fit_forecasts(Y, horizon)
+    result.update(
+        keys=keys,
+        history=pd.date_range(end=end, periods=days, freq="D"),
+        dates=pd.date_range(end + pd.Timedelta(days=1), periods=horizon, freq="D"),
+        recent=Y[:, -RESIDUAL_DAYS:],
+    )
+    return result
+
+
+def weekly_forecast(result: dict, series: int, weeks: int = None) -> pd.DataFrame:
+    """Forecast of one series in whole weeks from the forecast start.
+
+    Returns ``Week`` (first day), ``Forecast`` and the ``Lower`` / ``Upper``
+    bounds of the 80 % band. A week's error variance is the growth of the
+    cumulative variance over its days.
+    """
+    n_weeks = len(result["dates"]) // WEEK if weeks is None else weeks
+    ends = np.arange(1, n_weeks + 1) * WEEK
+    forecast = result["forecast"][series, :n_weeks * WEEK].reshape(n_weeks, WEEK).sum(axis=1)
+    variance = result["cum_sd"][series, ends - 1] ** 2
+    sd = np.sqrt(np.diff(variance, prepend=0.0))
+    return pd.DataFrame({
+        "Week": result["dates"][ends - WEEK],
+        "Forecast": forecast,
+        "Lower": np.maximum(forecast - BAND_Z * sd, 0),
+        "Upper": forecast + BAND_Z * sd,
+    })
+
+
+def weekly_actuals(result: dict, series: int) -> pd.DataFrame:
+    """The recent actuals of one series in whole weeks up to the forecast start (``Week``, ``Orders``)."""
+    recent = result["recent"][series]
+    n_weeks = len(recent) // WEEK
+    orders = recent[len(recent) - n_weeks * WEEK:].reshape(n_weeks, WEEK).sum(axis=1)
+    starts = result["dates"][0] - pd.to_timedelta(np.arange(n_weeks, 0, -1) * WEEK, unit="D")
+    return pd.DataFrame({"Week": starts, "Orders": orders})
+
+
+def forecast_table(result: dict, weeks: int = 4) -> pd.DataFrame:
+    """Per series: the last and next ``weeks`` weeks, the band and the chosen model.
+
+    Sorted by the next weeks' forecast, largest first.
+    """
+    days = weeks * WEEK
+    recent = result["recent"][:, -days:].sum(axis=1)
+    upcoming = result["forecast"][:, :days].sum(axis=1)
+    sd = result["cum_sd"][:, days - 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(recent > 0, (upcoming / recent - 1) * 100, np.nan)
+    table = pd.DataFrame({
+        "Series": result["keys"],
+        f"Last {weeks} Weeks": recent,
+        f"Next {weeks} Weeks": upcoming,
+        "Lower (80%)": np.maximum(upcoming - BAND_Z * sd, 0),
+        "Upper (80%)": upcoming + BAND_Z * sd,
+        "Change %": change,
+        "Model": np.array(MODEL_NAMES, dtype=object)[result["model"]],
+    })
+    table = table.round({col: 1 for col in table.columns[1:6]})
+    return table.sort_values(f"Next {weeks} Weeks", ascending=False, ignore_index=True)
+
+
+def period_forecast(result: dict, series: int, agg: str) -> pd.DataFrame:
+    """Forecast of one series per ISO week or month of the forecast's first year.
+
+    Matches the periods of ``rollups.year_period_pivot`` (``ISOWeek`` or
+    ``Month`` of the calendar year). Returns the period as index, the
+    ``Forecast`` total and ``CumSD``, the standard deviation of the
+    cumulative forecast at the period's last day.
+    """
+    dates = result["dates"]
+    in_year = dates.year == dates[0].year
+    period = dates.isocalendar().week.to_numpy(dtype=int) if agg == "Week" else dates.month.to_numpy()
+    # Late-December days in ISO week 1 belong to next year's running total
+    in_year &= period >= period[0]
+    frame = pd.DataFrame({
+        "Period": period[in_year],
+        "Forecast": result["forecast"][series, in_year],
+        "CumSD": result["cum_sd"][series, in_year],
+    })
+    return frame.groupby("Period").agg(Forecast=("Forecast", "sum"), CumSD=("CumSD", "last"))
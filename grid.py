@@ -0,0 +1,97 @@
+"""Paged tables: a fixed number of widgets per table, however many rows or columns it has."""
+import math
+
+import pandas as pd
+import streamlit as st
+
+# Rows (groups) shown per page
+PAGE_ROWS = 25
+# Columns shown per page of a wide pivot (e.g. weeks)
+PAGE_COLUMNS = 12
+
+
+def page_count(n: int, size: int) -> int:
+    """Pages needed for ``n`` items, at least one."""
+    return max(1, math.ceil(n / size))
+
+
+def sorted_page(frame: pd.DataFrame, by: str, descending: bool, page: int, size: int = PAGE_ROWS) -> pd.DataFrame:
+    """Rows ``page * size`` to ``(page + 1) * size`` of ``frame`` sorted on ``by``.
+
+    Only the sort order is computed over the whole frame (one stable
+    argsort of a single column, missing values last); the page itself is
+    one positional take, so the cost of building the page does not grow
+    with the number of columns.
+    """
+    values = frame[by].reset_index(drop=True)
+    order = values.sort_values(ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+    return frame.iloc[order[page * size:(page + 1) * size]]
+
+
+def _pager(n: int, size: int, key: str, noun: str) -> int:
+    """Page selector for ``n`` items; returns the zero-based page."""
+    pages = page_count(n, size)
+    if pages == 1:
+        return 0
+    c1, c2 = st.columns([1, 4])
+    with c1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                               # Keyed on the page count, so a shorter result starts on page 1
+                               key=f"{key}_page_{pages}")
+    start = (page - 1) * size
+    with c2:
+        st.caption(f"{noun.capitalize()} {start + 1:,}–{min(start + size, n):,} of {n:,}")
+    return page - 1
+
+
+@st.fragment
+def grouped_grid(groups: pd.DataFrame, key: str, details: pd.DataFrame = None, group_col: str = None,
+                 sort_by: str = None, noun: str = "rows", detail_noun: str = "rows", column_config: dict = None):
+    """One paged table of ``groups``, sorted and sliced on the server.
+
+    Only the current page of ``PAGE_ROWS`` rows is sent to the browser.
+    With ``details``, selecting a row expands the ``details`` rows whose
+    ``group_col`` matches it below the table, so a group's rows are only
+    sliced and shipped when asked for. The controls rerun only this
+    fragment.
+    """
+    column_config = column_config or {}
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        columns = list(groups.columns)
+        by = st.selectbox("Sort by", columns, index=columns.index(sort_by) if sort_by in columns else 0, key=f"{key}_sort")
+    with c2:
+        descending = st.toggle("Descending", value=True, key=f"{key}_descending")
+    page = _pager(len(groups), PAGE_ROWS, key, noun)
+    rows = sorted_page(groups, by, descending, page)
+
+    if details is None:
+        st.dataframe(rows, width='stretch', hide_index=True, column_config=column_config)
+        return
+    # The table is keyed on the groups it shows: a new sort, page or result
+    # is a new table, so a stale selection never expands the wrong group
+    shown = hash(tuple(rows[group_col].tolist()))
+    event = st.dataframe(
+        rows, width='stretch', hide_index=True, column_config=column_config,
+        on_select="rerun", selection_mode="single-row", key=f"{key}_rows_{shown}",
+    )
+    selected = event.selection.rows
+    if not selected or selected[0] >= len(rows):
+        st.caption(f"Select a row to expand its {detail_noun}.")
+        return
+    group = rows.iloc[selected[0]][group_col]
+    st.markdown(f"**{group}** — {detail_noun}")
+    expanded = details[details[group_col] == group].drop(columns=group_col)
+    st.dataframe(expanded, width='stretch', hide_index=True, column_config=column_config)
+
+
+@st.fragment
+def paged_columns(frame: pd.DataFrame, key: str, noun: str = "columns", column_config: dict = None):
+    """A wide table shown ``PAGE_COLUMNS`` columns at a time (index kept on every page).
+
+    Opens on the first page: order the columns so the ones looked at first
+    lead (the lead-time pivots list the most recent week first).
+    """
+    page = _pager(frame.shape[1], PAGE_COLUMNS, key, noun)
+    start = page * PAGE_COLUMNS
+    st.dataframe(frame.iloc[:, start:start + PAGE_COLUMNS], width='stretch', column_config=column_config)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Components of a business lane (customer on a city-to-city route)
+LANE_COLS = ["Customer Name", "Load City", "Unload City"]
+
+
+def intern_columns(df: pd.DataFrame, columns) -> tuple:
+    """Assign one integer id per distinct combination of ``columns``.
+
+    Each column is factorized on its own and the per-column codes are
+    combined into a single mixed-radix key, which is factorized again, so
+    no per-row strings are built. Returns ``(ids, uniques)``: an int32
+    array aligned with ``df`` (-1 where any component is missing) and a
+    frame holding the component values of every id.
+    """
+    factorized = [pd.factorize(df[col]) for col in columns]
+    key = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    for codes, values in factorized:
+        key = key * max(len(values), 1) + codes
+        missing |= codes < 0
+
+    ids = np.full(len(df), -1, dtype=np.int32)
+    present = ~missing
+    ids[present], keys = pd.factorize(key[present])
+
+    # Decode each distinct key back into its component values
+    uniques = {}
+    for col, (codes, values) in reversed(list(zip(columns, factorized))):
+        size = max(len(values), 1)
+        uniques[col] = np.asarray(values, dtype=object)[keys % size]
+        keys = keys // size
+    return ids, pd.DataFrame({col: uniques[col] for col in columns})
+
+
+def route_labels(load: pd.Series, unload: pd.Series) -> pd.Series:
+    """Display label for a ``load → unload`` pair."""
+    return load.astype(str) + " → " + unload.astype(str)
+
+
+def build_lane_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Lane dimension table indexed by ``Lane ID``.
+
+    Holds the customer, load city and unload city of every lane with their
+    integer ids, plus the ``Route`` (city → city) and ``Lane`` display
+    labels. Built from the first row of each lane, so the labels are only
+    formatted once per lane rather than once per shipment.
+    """
+    ids = df["Lane ID"].to_numpy()
+    lane_ids, first = np.unique(ids, return_index=True)
+    table = df.iloc[first][LANE_COLS].astype(object).fillna("").set_axis(
+        pd.Index(lane_ids, name="Lane ID")
+    )
+    table["Customer ID"] = pd.factorize(table["Customer Name"], sort=True)[0]
+    table["Load City ID"] = pd.factorize(table["Load City"], sort=True)[0]
+    table["Unload City ID"] = pd.factorize(table["Unload City"], sort=True)[0]
+    table["Route"] = route_labels(table["Load City"], table["Unload City"])
+    table["Lane"] = table["Customer Name"] + " | " + table["Route"]
+    return table
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_lane_table(dataset_key: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Lane dimension table for a loaded dataset, built once per ``dataset_key``."""
+    return build_lane_table(_df)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from data_loader import MAX_DATASETS, parse_excel
+
+# Workbooks parsed at once, across all sessions (each parse holds the whole
+# sheet in memory several times over)
+MAX_CONCURRENT_LOADS = 2
+# Distinct loads running or waiting for a slot; further files are refused
+# until one finishes
+MAX_PENDING_LOADS = 6
+# Seconds between progress updates of a waiting session
+PROGRESS_SECONDS = 0.5
+
+
+class LoadQueueFull(RuntimeError):
+    """Raised when ``MAX_PENDING_LOADS`` distinct files are already loading."""
+
+
+@dataclass
+class Load:
+    """One in-flight parse of a file, shared by every session asking for it.
+
+    ``fraction`` and ``text`` report its progress; ``waiting`` counts the
+    sessions waiting for it. ``done`` is set when the parse has finished,
+    with the parsed ``frame`` (or ``error`` if it failed).
+    """
+
+    fingerprint: str
+    name: str
+    fraction: float = 0.0
+    text: str = "Waiting for a free load slot"
+    waiting: int = 0
+    started: float = field(default_factory=time.monotonic)
+    done: threading.Event = field(default_factory=threading.Event)
+    frame: pd.DataFrame = None
+    error: Exception = None
+
+
+@st.cache_resource(show_spinner=False)
+def _registry() -> dict:
+    """Process-wide state: in-flight loads and parsed frames by fingerprint, and the load slots.
+
+    ``parsed`` holds the last ``MAX_DATASETS`` datasets used, least
+    recently used first, so whether a dataset is parsed and whether its
+    frame is still held are the same question.
+    """
+    return {
+        "lock": threading.Lock(),
+        "loads": {},
+        "parsed": OrderedDict(),
+        "slots": threading.BoundedSemaphore(MAX_CONCURRENT_LOADS),
+    }
+
+
+def _parsed(key: str) -> pd.DataFrame:
+    """The parsed frame of ``key`` (marked as just used), or None."""
+    registry = _registry()
+    with registry["lock"]:
+        frame = registry["parsed"].get(key)
+        if frame is not None:
+            registry["parsed"].move_to_end(key)
+    return frame
+
+
+def _run(load: Load, file):
+    """Parse ``file`` for ``load`` once a load slot is free (in a background thread)."""
+    registry = _registry()
+    try:
+        with registry["slots"]:
+            load.started = time.monotonic()
+
+            def progress(fraction, text):
+                load.fraction, load.text = fraction, text
+
+            load.frame = parse_excel(file, progress)
+        with registry["lock"]:
+            registry["parsed"][load.fingerprint] = load.frame
+            while len(registry["parsed"]) > MAX_DATASETS:
+                registry["parsed"].popitem(last=False)
+    except Exception as exc:
+        load.error = exc
+    finally:
+        with registry["lock"]:
+            registry["loads"].pop(load.fingerprint, None)
+        load.done.set()
+
+
+def _join(file, key: str, name: str, wait: bool = True) -> Load:
+    """The in-flight load of ``key``, started in the background if none is running.
+
+    With ``wait`` the caller counts as a session waiting for it. A key
+    parsed in the meantime gets a finished load holding its frame.
+    """
+    registry = _registry()
+    with registry["lock"]:
+        load = registry["loads"].get(key)
+        if load is None and key in registry["parsed"]:
+            registry["parsed"].move_to_end(key)
+            load = Load(fingerprint=key, name=name, fraction=1.0, frame=registry["parsed"][key])
+            load.done.set()
+        elif load is None:
+            if len(registry["loads"]) >= MAX_PENDING_LOADS:
+                raise LoadQueueFull(f"{len(registry['loads'])} files are already loading")
+            load = Load(fingerprint=key, name=name)
+            registry["loads"][key] = load
+            thread = threading.Thread(target=_run, args=(load, file), name=f"load {name}", daemon=True)
+            add_script_run_ctx(thread, get_script_run_ctx())
+            thread.start()
+        if wait:
+            load.waiting += 1
+    return load
+
+
+def _leave(load: Load):
+    with _registry()["lock"]:
+        load.waiting -= 1
+
+
+def status(key: str) -> str:
+    """``"ready"`` when the fingerprint ``key`` is parsed, ``"loading"`` while it is, else None."""
+    registry = _registry()
+    with registry["lock"]:
+        if key in registry["parsed"]:
+            return "ready"
+        if key in registry["loads"]:
+            return "loading"
+    return None
+
+
+def preload(file, name: str, key: str) -> Load:
+    """Start parsing ``file`` in the background without waiting for it.
+
+    Returns the in-flight load (None when it is parsed already). Raises
+    ``LoadQueueFull`` like ``load_dataset``.
+    """
+    if status(key) == "ready":
+        return None
+    return _join(file, key, name, wait=False)
+
+
+def load_dataset(file, name: str, key: str) -> pd.DataFrame:
+    """The parsed dataset of ``file``, loading it at most once across sessions.
+
+    ``key`` is the file's content fingerprint (see fingerprints.py).
+    Sessions asking for the same contents while a parse is running wait
+    for that parse and share its progress bar, and at most
+    ``MAX_CONCURRENT_LOADS`` distinct files are parsed at once. Raises
+    ``LoadQueueFull`` when ``MAX_PENDING_LOADS`` files are already
+    loading.
+    """
+    frame = _parsed(key)
+    if frame is not None:
+        # Every session gets its own copy
+        return frame.copy()
+
+    load = _join(file, key, name)
+    try:
+        bar = st.progress(0.0, text=f"Loading {name}…")
+        while not load.done.wait(PROGRESS_SECONDS):
+            others = load.waiting - 1
+            shared = f" — shared with {others} other session{'s' * (others > 1)}" if others > 0 else ""
+            bar.progress(
+                min(load.fraction, 1.0),
+                text=f"Loading {name}: {load.text} ({time.monotonic() - load.started:.0f} s){shared}",
+            )
+        bar.empty()
+    finally:
+        _leave(load)
+    if load.error is not None:
+        raise load.error
+    return load.frame.copy()
@@ -0,0 +1,257 @@
+"""Period-over-period comparisons: top movers and contributions per member of a dimension."""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import exports
+import grid
+from lanes import intern_columns, route_labels
+
+# Dimensions a comparison can break the change down by: label -> columns
+DIMENSIONS = {
+    "Customer": ["Customer Name"],
+    "Business Line": ["Business Line"],
+    "Market": ["Market"],
+    "Load Country": ["Load Country"],
+    "Unload Country": ["Unload Country"],
+    "Carrier": ["Carrier"],
+    "Route": ["Load City", "Unload City"],
+    "Lane": ["Customer Name", "Load City", "Unload City"],
+}
+DATE_COL = "Order Placed Date"
+# Rows with a missing dimension value are kept as a member of their own,
+# so the members' deltas always add up to the total delta
+MISSING_LABEL = "(not set)"
+# Gainers and losers shown on the chart
+TOP_MOVERS = 10
+# Status of a member: in both periods, only the current one, only the previous one
+STATUSES = ["", "🆕 New", "⛔ Lost"]
+GAIN_COLOR = "#2ca02c"
+LOSS_COLOR = "#d62728"
+
+
+@dataclass(frozen=True)
+class PeriodRollup:
+    """Daily totals per member of one dimension.
+
+    ``labels`` holds the members. Every (day, member) pair with orders is
+    one entry, sorted by day: ``days`` is its day (days since ``start``),
+    ``members`` its member code, ``orders`` and ``shipments`` its weighted
+    orders and shipment count. A date range is therefore one contiguous
+    slice of the entries, found by binary search, and a comparison only
+    touches the entries of its two ranges, however many shipments the
+    view has.
+    """
+
+    labels: pd.api.extensions.ExtensionArray
+    start: np.datetime64
+    days: np.ndarray
+    members: np.ndarray
+    orders: np.ndarray
+    shipments: np.ndarray
+
+
+def available(df: pd.DataFrame) -> list:
+    """Dimensions whose columns are all loaded."""
+    return [label for label, cols in DIMENSIONS.items() if all(col in df.columns for col in cols)]
+
+
+def _members(df: pd.DataFrame, cols: list) -> tuple:
+    """Per-row member codes and member labels of the dimension ``cols``."""
+    if len(cols) == 1:
+        codes, keys = pd.factorize(df[cols[0]], sort=True)
+        labels = np.asarray(keys, dtype=object)
+    else:
+        codes, uniques = intern_columns(df, cols)
+        labels = route_labels(uniques[cols[-2]], uniques[cols[-1]])
+        if len(cols) == 3:
+            labels = uniques[cols[0]].astype(str) + " | " + labels
+        labels = labels.to_numpy(dtype=object)
+    # Missing values become the last member
+    codes = np.where(codes < 0, len(labels), codes).astype(np.int64)
+    return codes, np.append(labels, MISSING_LABEL)
+
+
+def build_rollup(df: pd.DataFrame, dimension: str) -> PeriodRollup:
+    """Daily rollup of ``df`` per member of ``dimension`` (rows without an order date left out)."""
+    codes, labels = _members(df, DIMENSIONS[dimension])
+    # Converted to strings once here rather than on every comparison
+    labels = pd.array(labels.astype(str), dtype="string")
+    day = df[DATE_COL].to_numpy(dtype="datetime64[D]")
+    dated = ~np.isnat(day)
+    start = day[dated].min() if dated.any() else np.datetime64("1970-01-01")
+    offsets = (day[dated] - start).astype(np.int64)
+    # One key per (day, member), so sorting the keys sorts the entries by day
+    keys, inverse = np.unique(offsets * len(labels) + codes[dated], return_inverse=True)
+    # Sum in float64: float32 totals drift on large views
+    weights = df["Shipment Weight"].to_numpy(dtype=np.float64)[dated]
+    return PeriodRollup(
+        labels=labels, start=start, days=keys // len(labels), members=keys % len(labels),
+        orders=np.bincount(inverse, weights=weights, minlength=len(keys)),
+        shipments=np.bincount(inverse, minlength=len(keys)),
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_rollup(scope: str, dimension: str, _df: pd.DataFrame) -> PeriodRollup:
+    """Period rollup of ``_df`` per member of ``dimension``, built once per ``scope``."""
+    return build_rollup(_df, dimension)
+
+
+def period_totals(rollup: PeriodRollup, first, last) -> tuple:
+    """Weighted orders and shipments of every member from ``first`` to ``last`` (days, inclusive)."""
+    def offset(when):
+        return int((pd.Timestamp(when).to_datetime64().astype("datetime64[D]") - rollup.start).astype(np.int64))
+
+    lo = np.searchsorted(rollup.days, offset(first), side="left")
+    hi = max(np.searchsorted(rollup.days, offset(last), side="right"), lo)
+    members, size = rollup.members[lo:hi], len(rollup.labels)
+    return (
+        np.bincount(members, weights=rollup.orders[lo:hi], minlength=size),
+        np.bincount(members, weights=rollup.shipments[lo:hi], minlength=size),
+    )
+
+
+def compare(rollup: PeriodRollup, current: tuple, previous: tuple, member: str = "Member") -> pd.DataFrame:
+    """Change of every member between two date ranges ``(first, last)``, largest gain first.
+
+    One row per member with shipments in either range: ``Current``,
+    ``Previous``, ``Delta``, ``Change %`` (NaN without previous orders),
+    ``Contribution (pp)`` (the member's delta in percentage points of the
+    previous total, so the members add up to the total change %),
+    ``Share of Delta %`` (its part of the net delta) and ``Status``
+    (🆕 only in the current range, ⛔ only in the previous one).
+    """
+    cur, cur_shipments = period_totals(rollup, *current)
+    prev, prev_shipments = period_totals(rollup, *previous)
+    present = (cur_shipments > 0) | (prev_shipments > 0)
+    delta = cur - prev
+    total_prev, total_delta = prev.sum(), delta.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(prev > 0, delta / prev * 100, np.nan)
+        contribution = delta / total_prev * 100 if total_prev > 0 else np.full(len(delta), np.nan)
+        share = delta / total_delta * 100 if total_delta != 0 else np.full(len(delta), np.nan)
+    status = pd.Categorical.from_codes(
+        np.select([prev_shipments == 0, cur_shipments == 0], [1, 2], default=0), categories=STATUSES,
+    )
+    frame = pd.DataFrame({
+        member: rollup.labels[present],
+        "Current": cur[present],
+        "Previous": prev[present],
+        "Delta": delta[present],
+        "Change %": change[present],
+        "Contribution (pp)": contribution[present],
+        "Share of Delta %": share[present],
+        "Status": status[present],
+    })
+    return frame.sort_values("Delta", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def top_movers(comparison: pd.DataFrame, n: int = TOP_MOVERS) -> tuple:
+    """The ``n`` largest gainers and the ``n`` largest losers of a ``compare`` result."""
+    gainers = comparison[comparison["Delta"] > 0].nlargest(n, "Delta")
+    losers = comparison[comparison["Delta"] < 0].nsmallest(n, "Delta")
+    return gainers, losers
+
+
+def period_presets(last) -> dict:
+    """Usual comparisons up to the day ``last``: label -> (current range, previous range).
+
+    Every current range runs to ``last`` and is compared with a range of the
+    same length (week to date vs the week before or 52 weeks before, month
+    to date vs the previous month or last year's month, year to date vs
+    last year to date).
+    """
+    last = pd.Timestamp(last).normalize()
+    week = last - pd.Timedelta(days=last.dayofweek)
+    month = last.replace(day=1)
+    year = last.replace(month=1, day=1)
+    prev_month = month - pd.DateOffset(months=1)
+    month_days = last - month
+    return {
+        "Week to date vs previous week": ((week, last), (week - pd.Timedelta(days=7), last - pd.Timedelta(days=7))),
+        "Week to date vs same week last year": (
+            (week, last), (week - pd.Timedelta(weeks=52), last - pd.Timedelta(weeks=52)),
+        ),
+        "Month to date vs previous month": (
+            (month, last), (prev_month, min(prev_month + month_days, month - pd.Timedelta(days=1))),
+        ),
+        "Month to date vs same month last year": (
+            (month, last), (month - pd.DateOffset(years=1), last - pd.DateOffset(years=1)),
+        ),
+        "Year to date vs last year to date": (
+            (year, last), (year - pd.DateOffset(years=1), last - pd.DateOffset(years=1)),
+        ),
+    }
+
+
+def year_to_period(year: int, agg: str, period: int) -> tuple:
+    """1 January of ``year`` to the end of its ISO week or month ``period`` (``agg`` "Week" or "Month")."""
+    first = pd.Timestamp(year=year, month=1, day=1)
+    if agg == "Week":
+        # Week 53 only exists in some years; the range never runs into the next year
+        sunday = pd.Timestamp.fromisocalendar(year, min(period, 52), 7) + pd.Timedelta(weeks=max(period - 52, 0))
+        return first, min(sunday, pd.Timestamp(year=year, month=12, day=31))
+    return first, (first + pd.DateOffset(months=period)) - pd.Timedelta(days=1)
+
+
+def range_label(period: tuple) -> str:
+    """``dd-Mon-yyyy – dd-Mon-yyyy`` label of a date range."""
+    first, last = (pd.Timestamp(when) for when in period)
+    return f"{first:%d-%b-%Y} – {last:%d-%b-%Y}"
+
+
+def _movers_figure(gainers: pd.DataFrame, losers: pd.DataFrame, member: str):
+    """Horizontal bars of the top gainers (green) and losers (red), largest on top."""
+    movers = pd.concat([gainers, losers.iloc[::-1]]).iloc[::-1]
+    fig = go.Figure(go.Bar(
+        x=movers["Delta"], y=movers[member].astype(str), orientation="h",
+        marker_color=np.where(movers["Delta"] > 0, GAIN_COLOR, LOSS_COLOR),
+        customdata=movers[["Current", "Previous", "Contribution (pp)"]].to_numpy(),
+        hovertemplate=(
+            "<b>%{y}</b><br>Delta: %{x:+,.1f}<br>Current: %{customdata[0]:,.1f}<br>"
+            "Previous: %{customdata[1]:,.1f}<br>Contribution: %{customdata[2]:+.2f} pp<extra></extra>"
+        ),
+    ))
+    fig.update_layout(
+        xaxis_title="Change in weighted orders", yaxis=dict(type="category"),
+        height=max(300, 24 * len(movers) + 80), margin=dict(t=20, b=20), showlegend=False,
+    )
+    return fig
+
+
+def render_comparison(comparison: pd.DataFrame, member: str, current: tuple, previous: tuple, key: str):
+    """Totals, top movers chart and the paged member table of a ``compare`` result."""
+    cur_total, prev_total = comparison["Current"].sum(), comparison["Previous"].sum()
+    delta = cur_total - prev_total
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric(f"Current ({range_label(current)})", f"{cur_total:,.1f}")
+    c2.metric(f"Previous ({range_label(previous)})", f"{prev_total:,.1f}")
+    c3.metric("Delta", f"{delta:+,.1f}", f"{delta / prev_total * 100:+.1f}%" if prev_total > 0 else None)
+    c4.metric("New / Lost", f"{(comparison['Status'] == '🆕 New').sum():,} / {(comparison['Status'] == '⛔ Lost').sum():,}")
+
+    gainers, losers = top_movers(comparison)
+    if gainers.empty and losers.empty:
+        st.info("No change between the two periods.")
+        return
+    st.plotly_chart(_movers_figure(gainers, losers, member), width='stretch')
+    st.caption(
+        "Contribution is a member's delta in percentage points of the previous total, so the "
+        "contributions add up to the total change; 🆕 members only ordered in the current period, "
+        "⛔ members only in the previous one."
+    )
+    percent = st.column_config.NumberColumn(format="%+.1f%%")
+    number = st.column_config.NumberColumn(format="%.1f")
+    grid.grouped_grid(
+        comparison, key, sort_by="Delta", noun="members",
+        column_config={
+            "Current": number, "Previous": number,
+            "Delta": st.column_config.NumberColumn(format="%+.1f"),
+            "Change %": percent, "Share of Delta %": percent,
+            "Contribution (pp)": st.column_config.NumberColumn(format="%+.2f"),
+        },
+    )
+    exports.export_menu(comparison, f"movers_{member.lower().replace(' ', '_')}", key=f"export_{key}")
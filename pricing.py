@@ -0,0 +1,230 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from lanes import intern_columns, route_labels
+
+# Rates derived from the Quote at load time: per loaded kilometre and per
+# tonne-kilometre (Weight in kg)
+RATE_COLUMNS = ["Rate / KM", "Rate / Ton-KM"]
+
+# Price segment and month of the pricing cube
+SEGMENT_COL = "Spot / Dedicated"
+MONTH_COL = "Order Month Name"
+
+# What a lane is priced on: label -> column(s)
+LANE_LEVELS = {
+    "Route": ["Load City", "Unload City"],
+    "Customer lane": ["Customer Name", "Load City", "Unload City"],
+}
+
+QUANTILES = {"P10": 0.1, "P50": 0.5, "P90": 0.9}
+
+# Outlier quotes lie more than OUTLIER_FENCE interquartile ranges outside
+# the P25–P75 range of their lane and segment; lanes with fewer quotes are
+# not judged
+OUTLIER_FENCE = 1.5
+MIN_LANE_QUOTES = 8
+
+
+def add_rates(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the Quote per full km and per ton-km of every shipment.
+
+    Shipments without a positive Full KM (or Weight, for the ton-km rate)
+    get no rate.
+    """
+    quote = df["Quote"].astype("float64")
+    full_km = df["Full KM"].astype("float64").where(lambda km: km > 0)
+    df["Rate / KM"] = quote / full_km
+    if "Weight" in df.columns:
+        tonnes = df["Weight"].astype("float64").where(lambda w: w > 0) / 1000
+        df["Rate / Ton-KM"] = quote / (tonnes * full_km)
+    return df
+
+
+def grouped_quantiles(codes: np.ndarray, values: np.ndarray, n_groups: int, quantiles: dict) -> dict:
+    """Count, mean and ``quantiles`` (name -> q) of ``values`` per group code, exactly.
+
+    One ``lexsort`` by (code, value) puts every group's values in a sorted
+    run; the quantiles of all groups are then read at computed offsets into
+    the runs (linear interpolation, as ``Series.quantile``). Rows with a
+    negative code or a missing value are ignored; empty groups get NaN.
+    """
+    keep = (codes >= 0) & np.isfinite(values)
+    codes, values = codes[keep].astype(np.int64), values[keep]
+    values = values[np.lexsort((values, codes))]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    last = np.maximum(counts - 1, 0)
+
+    result = {"count": counts}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["mean"] = np.bincount(codes, weights=values, minlength=n_groups) / counts
+    if len(values) == 0:
+        result.update({name: np.full(n_groups, np.nan) for name in quantiles})
+        return result
+    for name, q in quantiles.items():
+        pos = q * last
+        lo = np.floor(pos).astype(np.int64)
+        below = values[np.minimum(starts + lo, len(values) - 1)]
+        above = values[np.minimum(starts + np.minimum(lo + 1, last), len(values) - 1)]
+        result[name] = np.where(counts > 0, below + (pos - lo) * (above - below), np.nan)
+    return result
+
+
+@dataclass(frozen=True)
+class PriceIndex:
+    """Per-row codes of a loaded dataset for the pricing cube.
+
+    ``lanes`` maps every ``LANE_LEVELS`` label to the lane code of each row
+    (-1 when missing) and the lane labels; ``months`` and ``segments`` hold
+    the month and segment codes and labels; ``rates`` maps every rate
+    column to its float64 values. Built once per dataset, so a filtered
+    view only sorts its own rows.
+    """
+
+    lanes: dict
+    months: tuple
+    segments: tuple
+    rates: dict
+
+
+def _codes(df: pd.DataFrame, col: str) -> tuple:
+    """Sorted codes (-1 when missing) and labels of ``col``, or a single unlabelled group."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.int32), np.array(["All"], dtype=object)
+    codes, keys = pd.factorize(df[col], sort=True)
+    return codes.astype(np.int32), np.asarray(keys, dtype=object)
+
+
+def build_price_index(df: pd.DataFrame) -> PriceIndex:
+    """Lane, month and segment codes and the rates of every row of ``df``."""
+    lanes = {}
+    for level, cols in LANE_LEVELS.items():
+        if not all(col in df.columns for col in cols):
+            continue
+        codes, uniques = intern_columns(df, cols)
+        labels = route_labels(uniques["Load City"], uniques["Unload City"])
+        if "Customer Name" in cols:
+            labels = uniques["Customer Name"].astype(str) + " | " + labels
+        lanes[level] = (codes, labels.to_numpy(dtype=object))
+    return PriceIndex(
+        lanes=lanes,
+        months=_codes(df, MONTH_COL),
+        segments=_codes(df, SEGMENT_COL),
+        rates={col: df[col].to_numpy(dtype=float, na_value=np.nan) for col in RATE_COLUMNS if col in df.columns},
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_price_index(dataset_key: str, _df: pd.DataFrame) -> PriceIndex:
+    """Price index of a loaded dataset, built once per ``dataset_key``."""
+    return build_price_index(_df)
+
+
+def _compact(codes: np.ndarray) -> tuple:
+    """Distinct non-negative ``codes`` and every row's position among them (-1 when negative)."""
+    present = codes >= 0
+    cells, inverse = np.unique(codes[present], return_inverse=True)
+    compact = np.full(len(codes), -1, dtype=np.int64)
+    compact[present] = inverse
+    return cells, compact
+
+
+def _bands(codes: np.ndarray, values: np.ndarray, keys: dict) -> pd.DataFrame:
+    """Quotes, mean and percentile bands per distinct code, labelled by ``keys`` (column -> per-code labels)."""
+    cells, compact = _compact(codes)
+    stats = grouped_quantiles(compact, values, len(cells), QUANTILES)
+    table = pd.DataFrame({
+        **{col: labels(cells) for col, labels in keys.items()},
+        "Quotes": stats["count"],
+        "Mean": stats["mean"],
+        **{name: stats[name] for name in QUANTILES},
+    })
+    return table[table["Quotes"] > 0].reset_index(drop=True)
+
+
+def price_cube(index: PriceIndex, rows: np.ndarray, level: str, rate: str) -> pd.DataFrame:
+    """Lane × month × segment cube of ``rate`` over the dataset ``rows`` (positions).
+
+    Only the cells holding quotes are kept: every (lane, month, segment)
+    gets ``Quotes``, ``Mean`` and the ``QUANTILES`` bands.
+    """
+    lane, lane_labels = index.lanes[level]
+    month, month_labels = index.months
+    segment, segment_labels = index.segments
+    lane, month, segment = lane[rows].astype(np.int64), month[rows].astype(np.int64), segment[rows].astype(np.int64)
+    n_months, n_segments = len(month_labels), len(segment_labels)
+    codes = (lane * n_months + month) * n_segments + segment
+    codes[(lane < 0) | (month < 0) | (segment < 0)] = -1
+    return _bands(codes, index.rates[rate][rows], {
+        "Lane": lambda c: lane_labels[c // (n_months * n_segments)],
+        "Month": lambda c: month_labels[c // n_segments % n_months],
+        SEGMENT_COL: lambda c: segment_labels[c % n_segments],
+    })
+
+
+def trend_bands(index: PriceIndex, rows: np.ndarray, rate: str) -> pd.DataFrame:
+    """Month × segment bands of ``rate`` across all lanes of the dataset ``rows``."""
+    month, month_labels = index.months
+    segment, segment_labels = index.segments
+    month, segment = month[rows].astype(np.int64), segment[rows].astype(np.int64)
+    codes = month * len(segment_labels) + segment
+    codes[(month < 0) | (segment < 0)] = -1
+    return _bands(codes, index.rates[rate][rows], {
+        "Month": lambda c: month_labels[c // len(segment_labels)],
+        SEGMENT_COL: lambda c: segment_labels[c % len(segment_labels)],
+    })
+
+
+def lane_pricing(index: PriceIndex, rows: np.ndarray, level: str, rate: str) -> dict:
+    """Lane × segment price bands and outlier quotes over the dataset ``rows`` (positions).
+
+    A quote is an outlier when its rate lies more than ``OUTLIER_FENCE``
+    interquartile ranges below P25 or above P75 of its lane and segment
+    (lanes with at least ``MIN_LANE_QUOTES`` quotes). All percentiles come
+    from a single grouped sort.
+
+    Returns ``lanes`` (``Lane``, segment, ``Quotes``, ``Mean``, bands,
+    ``Outliers``; most quoted first) and ``outliers``: positions into
+    ``rows`` of the outlier quotes with their lane's ``P50``, ``Low`` and
+    ``High`` fence.
+    """
+    lane, lane_labels = index.lanes[level]
+    segment, segment_labels = index.segments
+    lane, segment = lane[rows].astype(np.int64), segment[rows].astype(np.int64)
+    n_segments = len(segment_labels)
+    codes = lane * n_segments + segment
+    codes[(lane < 0) | (segment < 0)] = -1
+    values = index.rates[rate][rows]
+
+    cells, compact = _compact(codes)
+    stats = grouped_quantiles(compact, values, len(cells), {**QUANTILES, "P25": 0.25, "P75": 0.75})
+
+    iqr = stats["P75"] - stats["P25"]
+    low, high = stats["P25"] - OUTLIER_FENCE * iqr, stats["P75"] + OUTLIER_FENCE * iqr
+    judged = stats["count"] >= MIN_LANE_QUOTES
+    present = compact >= 0
+    cell = np.where(present, compact, 0)
+    flagged = present & judged[cell] & ((values < low[cell]) | (values > high[cell]))
+    positions = np.flatnonzero(flagged)
+
+    lanes = pd.DataFrame({
+        "Lane": lane_labels[cells // n_segments],
+        SEGMENT_COL: segment_labels[cells % n_segments],
+        "Quotes": stats["count"],
+        "Mean": stats["mean"],
+        **{name: stats[name] for name in QUANTILES},
+        "Outliers": np.bincount(compact[positions], minlength=len(cells)),
+    })
+    lanes = lanes[lanes["Quotes"] > 0].sort_values(["Quotes", "Lane"], ascending=[False, True], ignore_index=True)
+    outliers = pd.DataFrame({
+        "position": positions,
+        "Lane": lane_labels[lane[positions]],
+        "P50": stats["P50"][compact[positions]],
+        "Low": low[compact[positions]],
+        "High": high[compact[positions]],
+    })
+    return {"lanes": lanes, "outliers": outliers}
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Per-row bitmask of the rules a shipment breaks (0 = no issues)
+ISSUES_COL = "Issues"
+
+# Values standing in for "unknown" in the source's text columns
+PLACEHOLDERS = ["-", ""]
+
+# Columns identifying a shipment in the report's sample rows
+SAMPLE_ID_COLS = ["Shipment No", "Customer Name", "Order Placed Date"]
+SAMPLE_ROWS = 20
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One data-quality check, evaluated over whole columns.
+
+    ``test`` is one of:
+
+    - ``"unparsed"``: a value was present in the file but could not be read
+      (recorded by the loader while converting ``columns``);
+    - ``"before"``: ``columns[0]`` falls on an earlier day than ``columns[1]``;
+    - ``"outside"``: ``columns[0]`` lies outside ``bounds`` (low, high);
+    - ``"placeholder"``: ``columns[0]`` is missing or one of ``PLACEHOLDERS``.
+
+    A rule whose columns are not loaded is skipped.
+    """
+
+    key: str
+    label: str
+    test: str
+    columns: tuple = ()
+    bounds: tuple = ()
+
+
+# The rule set; a rule's bit is its position in this list
+RULES = [
+    Rule("unparsed_date", "Date not readable or outside 1900–2099", "unparsed"),
+    Rule("unparsed_number", "Text in a numeric column", "unparsed"),
+    Rule("negative_lead_time", "Loaded before the order was placed", "before", ("Load Date From", "Order Placed Date")),
+    Rule("unload_before_load", "Unloaded before it was loaded", "before", ("Unload Date Till", "Load Date From")),
+    Rule("km_utilization", "KM utilization outside 0–100 %", "outside", ("KM Utilization %",), (0.0, 100.0)),
+    Rule("missing_carrier", "No carrier (\"-\" or empty)", "placeholder", ("Carrier",)),
+    Rule("missing_business_line", "No business line (\"-\" or empty)", "placeholder", ("Business Line",)),
+]
+BITS = {rule.key: np.uint16(1 << bit) for bit, rule in enumerate(RULES)}
+
+
+def _flagged(df: pd.DataFrame, rule: Rule, unparsed: dict) -> np.ndarray:
+    """Rows of ``df`` breaking ``rule`` (None when the rule does not apply)."""
+    if rule.test == "unparsed":
+        masks = unparsed.get(rule.key, {})
+        return np.logical_or.reduce(list(masks.values())) if masks else None
+    if not all(col in df.columns for col in rule.columns):
+        return None
+    first = df[rule.columns[0]]
+    if rule.test == "before":
+        day = first.to_numpy(dtype="datetime64[D]")
+        other = df[rule.columns[1]].to_numpy(dtype="datetime64[D]")
+        # NaT compares False, so rows missing either date are not flagged
+        return day < other
+    if rule.test == "outside":
+        values = first.to_numpy(dtype=float, na_value=np.nan)
+        low, high = rule.bounds
+        return (values < low) | (values > high)
+    if rule.test == "placeholder":
+        return (first.isna() | first.isin(PLACEHOLDERS)).to_numpy()
+    raise ValueError(f"Unknown rule test: {rule.test}")
+
+
+def validate(df: pd.DataFrame, unparsed: dict = None) -> pd.DataFrame:
+    """Evaluate ``RULES`` over ``df`` and store the per-row bitmask in ``ISSUES_COL``.
+
+    Every rule is one vectorized comparison over its columns; the results
+    are OR-ed into a uint16 mask in a single pass. ``unparsed`` maps an
+    ``"unparsed"`` rule's key to ``{column: mask}`` of the values the loader
+    could not read; the columns with such values are kept in
+    ``df.attrs["unparsed"]`` for the report.
+    """
+    unparsed = unparsed or {}
+    issues = np.zeros(len(df), dtype=np.uint16)
+    for rule in RULES:
+        flagged = _flagged(df, rule, unparsed)
+        if flagged is not None:
+            issues |= np.where(flagged, BITS[rule.key], np.uint16(0))
+    df[ISSUES_COL] = issues
+    df.attrs["unparsed"] = {
+        key: [col for col, mask in masks.items() if mask.any()] for key, masks in unparsed.items()
+    }
+    return df
+
+
+def valid_mask(df: pd.DataFrame, *keys) -> np.ndarray:
+    """Rows of ``df`` breaking none of the rules ``keys`` (all rules when none given).
+
+    Frames without an ``ISSUES_COL`` count as clean.
+    """
+    if ISSUES_COL not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    bits = np.uint16(0)
+    for key in keys or BITS:
+        bits |= BITS[key]
+    return (df[ISSUES_COL].to_numpy() & bits) == 0
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def quality_report(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Rows breaking each rule of the loaded ``_df``, cached per ``scope``.
+
+    Returns ``Rule`` (label), ``Rows``, ``Share %`` and the rule ``key``,
+    for the rules that apply to the loaded columns.
+    """
+    issues = _df[ISSUES_COL].to_numpy()
+    unparsed = _df.attrs.get("unparsed", {})
+    rows = []
+    for rule in RULES:
+        if rule.test == "unparsed" and rule.key not in unparsed:
+            continue
+        if rule.test != "unparsed" and not all(col in _df.columns for col in rule.columns):
+            continue
+        count = int(np.count_nonzero(issues & BITS[rule.key]))
+        rows.append({"Rule": rule.label, "Rows": count, "Share %": count / max(len(_df), 1) * 100, "key": rule.key})
+    return pd.DataFrame(rows, columns=["Rule", "Rows", "Share %", "key"])
+
+
+def sample_rows(df: pd.DataFrame, key: str, n: int = SAMPLE_ROWS) -> pd.DataFrame:
+    """The first ``n`` rows of ``df`` breaking rule ``key``, with the columns it checks."""
+    rule = RULES[int(BITS[key]).bit_length() - 1]
+    columns = list(rule.columns) or df.attrs.get("unparsed", {}).get(key, [])
+    columns = [col for col in SAMPLE_ID_COLS if col in df.columns and col not in columns] + columns
+    positions = np.flatnonzero(df[ISSUES_COL].to_numpy() & BITS[key])[:n]
+    return df.iloc[positions][columns].reset_index(drop=True)
+
+
+@st.fragment
+def render_report(df: pd.DataFrame):
+    """Expander with the issue counts of the loaded dataset and sample rows per rule."""
+    if ISSUES_COL not in df.columns:
+        return
+    report = quality_report(st.session_state.dataset_key, df)
+    flagged = int(np.count_nonzero(df[ISSUES_COL].to_numpy()))
+    with st.expander(f"🩺 Data quality: {flagged:,} of {len(df):,} rows with issues"):
+        st.dataframe(
+            report.drop(columns="key"), width='stretch', hide_index=True,
+            column_config={"Share %": st.column_config.NumberColumn(format="%.2f%%")},
+        )
+        st.caption(
+            "Charts leave out the rows an issue affects: negative lead times from the lead-time "
+            "analysis, utilization outside 0–100 % from its distribution, and missing carriers "
+            "and business lines from their breakdowns."
+        )
+        broken = report[report["Rows"] > 0]
+        if broken.empty:
+            return
+        labels = dict(zip(broken["key"], broken["Rule"]))
+        key = st.selectbox("Sample rows for", list(labels), format_func=labels.get, key="quality_rule")
+        st.dataframe(sample_rows(df, key), width='stretch', hide_index=True)
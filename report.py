@@ -0,0 +1,359 @@
+"""Headless batch report: compute the dashboard's page aggregates without a server.
+
+Usage::
+
+    python report.py data.xlsx --week 2026-W41 --out reports/
+    python report.py data.xlsx --date 2026-10-12 --format bundle --png
+
+The report covers the ISO week and month of the reference date (default:
+the last complete week) and is written either as one static HTML file or
+as a bundle directory with one JSON file per table and one Plotly JSON (or
+PNG, with ``--png`` and the optional ``kaleido`` package) per chart. Pages
+are computed in parallel worker processes.
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+# Ensure the project root is on the path so page imports work
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Same default as the dashboard's Order Placed Date filter
+DEFAULT_SINCE = "2025-01-01"
+# Number of top customers in the Customers section
+REPORT_TOP_N = 10
+
+# Pages in report order: (title, builder name)
+REPORT_PAGES = [
+    ("Order Intake", "order_intake_report"),
+    ("New Business - Week", "new_business_week_report"),
+    ("Heatmap Comparison", "heatmap_comparison_report"),
+    ("Overview", "overview_report"),
+    ("New Business - Month", "new_business_month_report"),
+    ("Lost Business", "lost_business_report"),
+    ("Customers", "customers_report"),
+    ("Geography", "geography_report"),
+    ("Operations", "operations_report"),
+]
+
+# Dataset shared with the worker processes (set by _init_worker)
+_DATA = {}
+
+
+def _quiet_streamlit():
+    """Silence Streamlit's bare-mode warnings (no server is running)."""
+    import streamlit.logger
+
+    streamlit.logger.set_log_level("error")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def _yoy_figure(daily: pd.DataFrame, title: str) -> go.Figure:
+    from rollups import year_period_pivot
+
+    fig = go.Figure()
+    cumulative = year_period_pivot(daily, "Week")["Cumulative"]
+    for year, row in cumulative.iterrows():
+        row = row.dropna()
+        fig.add_trace(go.Scatter(x=row.index, y=row.to_numpy(), mode="lines+markers", name=year))
+    fig.update_layout(title=title, xaxis_title="Week #", yaxis_title="Cumulative", legend_title="Year")
+    return fig
+
+
+def _weekly_table(daily: pd.DataFrame) -> pd.DataFrame:
+    """Weighted volume per ISO week (rows) and year (columns)."""
+    return daily.pivot_table(index="ISOWeek", columns="Year", values="Orders", aggfunc="sum", fill_value=0)
+
+
+def _heatmap_figure(daily: pd.DataFrame, label: str):
+    from rollups import weekday_heatmap
+
+    heat = weekday_heatmap(daily)
+    if heat.empty:
+        return None
+    return px.imshow(heat, labels=dict(x="Year-Week", y="Day", color=label), color_continuous_scale="YlOrRd", aspect="auto")
+
+
+def order_intake_report(df, df_raw, scope, ref) -> dict:
+    from views import order_intake
+
+    daily = order_intake.compute_daily(scope, df)
+    tables = {"Weekly orders": _weekly_table(daily)}
+    figures = {"Year-over-year running total": _yoy_figure(daily, "Cumulative orders")}
+    heat = _heatmap_figure(daily, "Orders")
+    if heat is not None:
+        figures["Order volume heatmap"] = heat
+    if "Load Date From" in df.columns:
+        lead_times = order_intake.compute_lead_times(scope, df)
+        if lead_times is not None:
+            tables["Lead time distribution by week"] = lead_times["pivot"]
+    return {"tables": tables, "figures": figures}
+
+
+def overview_report(df, df_raw, scope, ref) -> dict:
+    from views import overview
+
+    daily = overview.compute_daily(scope, df)
+    years = overview.default_years(daily)
+    daily = daily[daily["Year"].isin(years)]
+    tables = {"Weekly loads": _weekly_table(daily)}
+    figures = {"Year-over-year running total": _yoy_figure(daily, "Cumulative loads")}
+    if "Order Placed Date" in df.columns:
+        lead_times = overview.compute_lead_times(scope, df, years)
+        if lead_times is not None:
+            tables["Lead time distribution by week"] = lead_times["pivot"]
+    return {"tables": tables, "figures": figures}
+
+
+def _new_business_tables(result: dict) -> dict:
+    tables = {"New customers": result["customers"]}
+    if result["lanes"] is not None:
+        tables["New lanes"] = result["lanes"].reset_index(drop=True)
+    return tables
+
+
+def new_business_week_report(df, df_raw, scope, ref) -> dict:
+    from views import new_business, new_business_week
+
+    iso = ref.isocalendar()
+    start, end = new_business_week._week_bounds(f"{iso[0]}-W{iso[1]:02d}")
+    result = new_business.compute_new_business(scope, df_raw, start, end, 7)
+    return {"tables": _new_business_tables(result), "figures": {}}
+
+
+def new_business_month_report(df, df_raw, scope, ref) -> dict:
+    from views import new_business
+
+    start, end = new_business._month_bounds(ref.to_period("M"))
+    result = new_business.compute_new_business(scope, df_raw, start, end, 30)
+    return {"tables": _new_business_tables(result), "figures": {}}
+
+
+def lost_business_report(df, df_raw, scope, ref) -> dict:
+    from churn import lost_mask
+    from views import lost_business
+
+    tables = {}
+    for entity in lost_business.ENTITIES:
+        if entity == "Lanes" and "Lane ID" not in df_raw.columns:
+            continue
+        table = lost_business.compute_cadence(scope, df_raw, entity)
+        flagged = table[lost_mask(table)].sort_values("Volume", ascending=False)
+        tables[f"Lost {entity.lower()}"] = flagged.reset_index(drop=True)
+    return {"tables": tables, "figures": {}}
+
+
+def heatmap_comparison_report(df, df_raw, scope, ref) -> dict:
+    from views import heatmap_comparison
+
+    # Same defaults as the page: previous month as main, reference month to compare against
+    compare_month = ref.to_period("M")
+    main_month = compare_month - 1
+    available = heatmap_comparison.compute_months(scope, df_raw)
+    if main_month not in available or compare_month not in available:
+        return {"tables": {"Treemap comparison": pd.DataFrame()}, "figures": {}}
+    result = heatmap_comparison.compute_treemap(scope, df_raw, main_month, compare_month)
+    comparison = result["comparison"]
+    tables = {"Treemap comparison": comparison.drop(columns=["HoverText", "BLineHover", "Size"])}
+    figures = {}
+    if len(comparison) > 0:
+        fig = px.treemap(
+            comparison, path=["Business Line", "Customer"], values="Size", color="Difference",
+            color_continuous_scale=[[0.0, "#d62728"], [0.5, "#f0f0f0"], [1.0, "#2ca02c"]],
+            color_continuous_midpoint=0,
+            title=f"Order Volume Comparison: {main_month} vs {compare_month}",
+        )
+        figures["Treemap comparison"] = fig
+    return {"tables": tables, "figures": figures}
+
+
+def customers_report(df, df_raw, scope, ref) -> dict:
+    from views import customers
+
+    result = customers.compute_customers(scope, df, REPORT_TOP_N)
+    fig = px.bar(result["top"], x="Shipments", y="Customer", orientation="h", text_auto=True)
+    fig.update_layout(yaxis=dict(autorange="reversed"))
+    tables = {f"Top {REPORT_TOP_N} customers": result["top"]}
+    if result["business_lines"] is not None:
+        tables["Customers by business line"] = result["business_lines"]
+    return {"tables": tables, "figures": {f"Top {REPORT_TOP_N} customers": fig}}
+
+
+def geography_report(df, df_raw, scope, ref) -> dict:
+    from views import geography
+
+    result = geography.compute_geography(scope, df)
+    return {"tables": {name: table for name, table in result.items() if table is not None}, "figures": {}}
+
+
+def operations_report(df, df_raw, scope, ref) -> dict:
+    from views import operations
+
+    result = operations.compute_operations(scope, df)
+    tables = {}
+    if result["km"] is not None:
+        tables["KM utilization"] = pd.DataFrame([result["km"]])
+    for key, title in [("modality", "Modality"), ("carriers", "Top carriers"), ("legal_entity", "Legal entity")]:
+        if result[key] is not None:
+            tables[title] = result[key]
+    return {"tables": tables, "figures": {}}
+
+
+def _init_worker(data_path: str):
+    _quiet_streamlit()
+    with open(data_path, "rb") as fh:
+        _DATA.update(pickle.load(fh))
+
+
+def _slug(name: str) -> str:
+    return "".join(c.lower() if c.isalnum() else "_" for c in name).strip("_")
+
+
+def _table_html(table: pd.DataFrame) -> str:
+    return table.to_html(float_format=lambda v: f"{v:,.1f}", border=0, classes="table")
+
+
+def build_page(title: str, builder: str, out_format: str, out_dir: str, png: bool) -> tuple:
+    """Compute one page in a worker and render its part of the report.
+
+    Returns ``(title, html)`` for the HTML report, or ``(title, files)``
+    with the files written for a bundle.
+    """
+    start = time.perf_counter()
+    page = globals()[builder](_DATA["df"], _DATA["df_raw"], _DATA["scope"], _DATA["ref"])
+
+    if out_format == "html":
+        parts = [f"<h2>{title}</h2>"]
+        for name, fig in page["figures"].items():
+            parts.append(fig.to_html(full_html=False, include_plotlyjs=False, default_height=450))
+        for name, table in page["tables"].items():
+            parts.append(f"<h3>{name}</h3>")
+            parts.append(_table_html(table) if len(table) else "<p><em>No data.</em></p>")
+        parts.append(f"<p class='timing'>Computed in {time.perf_counter() - start:.2f} s</p>")
+        return title, "\n".join(parts)
+
+    page_dir = os.path.join(out_dir, _slug(title))
+    os.makedirs(page_dir, exist_ok=True)
+    files = []
+    for name, table in page["tables"].items():
+        path = os.path.join(page_dir, f"{_slug(name)}.json")
+        table.to_json(path, orient="split", date_format="iso")
+        files.append(path)
+    for name, fig in page["figures"].items():
+        path = os.path.join(page_dir, f"{_slug(name)}.{'png' if png else 'json'}")
+        if png:
+            fig.write_image(path, width=1200, height=600)
+        else:
+            fig.write_json(path)
+        files.append(path)
+    return title, files
+
+
+def reference_date(week: str = None, date: str = None) -> pd.Timestamp:
+    """Monday of ``week`` ("YYYY-Www"), ``date`` itself, or the Monday of last week."""
+    if week:
+        return pd.Timestamp.fromisocalendar(*map(int, week.split("-W")), 1)
+    if date:
+        return pd.Timestamp(date).normalize()
+    today = pd.Timestamp.now().normalize()
+    return today - timedelta(days=today.dayofweek + 7)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write the dashboard's page aggregates as a static report.")
+    parser.add_argument("workbook", help="Excel file to load (as in the dashboard)")
+    ref_group = parser.add_mutually_exclusive_group()
+    ref_group.add_argument("--week", help="reference ISO week, e.g. 2026-W41 (default: last complete week)")
+    ref_group.add_argument("--date", help="reference date, e.g. 2026-10-12")
+    parser.add_argument("--since", default=DEFAULT_SINCE, help=f"first Order Placed Date included (default: {DEFAULT_SINCE})")
+    parser.add_argument("--out", default="reports", help="output directory (default: reports)")
+    parser.add_argument("--format", choices=["html", "bundle"], default="html", help="one HTML file or a JSON bundle")
+    parser.add_argument("--png", action="store_true", help="write charts as PNG in a bundle (needs kaleido)")
+    parser.add_argument("--workers", type=int, default=min(len(REPORT_PAGES), os.cpu_count() or 1),
+                        help="parallel worker processes")
+    args = parser.parse_args(argv)
+
+    if args.png and args.format != "bundle":
+        parser.error("--png applies to --format bundle")
+    if args.png:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error("--png needs the 'kaleido' package (pip install kaleido)")
+
+    _quiet_streamlit()
+    from data_loader import load_data
+
+    ref = reference_date(args.week, args.date)
+    iso = ref.isocalendar()
+    label = f"{iso[0]}-W{iso[1]:02d}"
+
+    started = time.perf_counter()
+    df_raw = load_data(args.workbook)
+    loaded = time.perf_counter()
+
+    # Default dashboard view: Order Placed Date from --since, undated rows kept
+    df = df_raw
+    if "Order Placed Date" in df_raw.columns:
+        opd = df_raw["Order Placed Date"]
+        df = df_raw[(opd >= pd.Timestamp(args.since)) | opd.isna()]
+
+    os.makedirs(args.out, exist_ok=True)
+    out_dir = os.path.join(args.out, f"report_{label}") if args.format == "bundle" else args.out
+
+    with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as fh:
+        data_path = fh.name
+        pickle.dump({"df": df, "df_raw": df_raw, "scope": f"report:{os.path.abspath(args.workbook)}", "ref": ref}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    try:
+        with ProcessPoolExecutor(max_workers=max(args.workers, 1), initializer=_init_worker, initargs=(data_path,)) as pool:
+            futures = [pool.submit(build_page, title, builder, args.format, out_dir, args.png)
+                       for title, builder in REPORT_PAGES]
+            results = [future.result() for future in futures]
+    finally:
+        os.remove(data_path)
+    finished = time.perf_counter()
+
+    summary = (
+        f"{len(df):,} of {len(df_raw):,} shipments, reference week {label}; "
+        f"loaded in {loaded - started:.1f} s, pages computed in {finished - loaded:.1f} s"
+    )
+    if args.format == "html":
+        path = os.path.join(args.out, f"report_{label}.html")
+        body = "\n".join(html for _, html in results)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(
+                "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+                f"<title>Transport Report {label}</title>"
+                "<script src='https://cdn.plot.ly/plotly-2.35.2.min.js'></script>"
+                "<style>body{font-family:Montserrat,Arial,sans-serif;color:#404040;margin:24px}"
+                "h1{color:#E3000F}.table{border-collapse:collapse;font-size:13px}"
+                ".table td,.table th{padding:4px 8px;border-bottom:1px solid #ddd;text-align:right}"
+                ".timing{color:#888;font-size:12px}</style></head><body>"
+                f"<h1>Transport Report — {label}</h1><p>{summary}</p>{body}</body></html>"
+            )
+        written = [path]
+    else:
+        with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as fh:
+            json.dump({"week": label, "summary": summary, "pages": dict(results)}, fh, indent=2)
+        written = [out_dir]
+
+    print(summary)
+    for path in written:
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from quality import valid_mask
+from sketches import Histogram
+
+# Lead-time buckets in working days: (upper bound, label), checked in order
+LEAD_TIME_BUCKETS = [
+    (3, "1. <3 Days"),
+    (7, "2. 4-7 Days"),
+    (14, "3. 7-14 Days"),
+]
+LEAD_TIME_OVERFLOW = "4. >14 Days"
+
+
+def daily_rollup(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """Weighted orders and shipment count per calendar day of ``date_col``.
+
+    Every time-based section (running totals, same-period comparison,
+    timeline, week × day heatmap) can be derived from this frame, which has
+    one row per day instead of one per shipment.
+    """
+    rows = df.dropna(subset=[date_col])
+    day = rows[date_col].dt.normalize().rename("Date")
+    daily = rows.groupby(day).agg(
+        **{
+            "Orders": ("Shipment Weight", "sum"),
+            "Shipment Count": ("Shipment No", "count"),
+        }
+    ).reset_index()
+    daily["Year"] = daily["Date"].dt.year.astype(str)
+    daily["ISOWeek"] = daily["Date"].dt.isocalendar().week.astype(int)
+    daily["Month"] = daily["Date"].dt.month
+    daily["DayOfWeek"] = daily["Date"].dt.dayofweek
+    return daily
+
+
+# Rolling-average windows offered on the time-series charts, in weeks
+ROLLING_WEEKS = [1, 2, 3, 4]
+
+# Ways to put several years on one x-axis: label -> (year column, x column, axis title)
+ALIGNMENTS = {
+    "Day of year": ("Year", "DayOfYear", "Day of Year (Jan 1 → Dec 31)"),
+    "ISO week": ("ISOYear", "ISOWeekPos", "ISO Week (Mon → Sun)"),
+}
+
+
+def rolling_column(weeks: int) -> str:
+    """Name of the ``calendar_rollup`` column holding the ``weeks``-week average."""
+    return f"Avg {weeks}w"
+
+
+def calendar_rollup(daily: pd.DataFrame, value: str = "Orders", windows=ROLLING_WEEKS) -> pd.DataFrame:
+    """Dense daily calendar of ``value`` with trailing rolling averages.
+
+    ``daily`` (see ``daily_rollup``) only holds days with data. This
+    reindexes it to every calendar day from the first to the last one with
+    zeros for the gaps, so an N-week average always spans 7×N calendar days
+    (also across New Year). All windows come from one cumulative sum: each
+    average is the difference of two of its entries, divided by the window
+    length (or by the days so far, at the start of the calendar).
+
+    Returns ``Date``, ``value``, ``HasData`` (day present in ``daily``),
+    ``Year``, ``DayOfYear``, ``ISOYear``, ``ISOWeekPos`` (ISO week plus the
+    weekday as a fraction, for aligning years by ISO weekday) and one
+    ``rolling_column(w)`` per window.
+    """
+    if len(daily) == 0:
+        return pd.DataFrame(columns=["Date", value, "HasData", "Year", "DayOfYear", "ISOYear", "ISOWeekPos"]
+                            + [rolling_column(w) for w in windows])
+    dates = pd.date_range(daily["Date"].min(), daily["Date"].max(), freq="D")
+    series = daily.set_index("Date")[value].reindex(dates)
+    calendar = pd.DataFrame({"Date": dates, value: series.fillna(0).to_numpy(), "HasData": series.notna().to_numpy()})
+
+    cumulative = np.concatenate([[0.0], np.cumsum(calendar[value].to_numpy(dtype=float))])
+    end = np.arange(1, len(calendar) + 1)
+    for weeks in windows:
+        start = np.maximum(end - weeks * 7, 0)
+        calendar[rolling_column(weeks)] = (cumulative[end] - cumulative[start]) / (end - start)
+
+    iso = calendar["Date"].dt.isocalendar()
+    calendar["Year"] = calendar["Date"].dt.year.astype(str)
+    calendar["DayOfYear"] = calendar["Date"].dt.dayofyear
+    calendar["ISOYear"] = iso["year"].astype(int).astype(str).to_numpy()
+    calendar["ISOWeekPos"] = (iso["week"].astype(int) + (iso["day"].astype(int) - 1) / 7).to_numpy()
+    return calendar
+
+
+# Year colors: the most recent year blue, the one before red (as in the
+# original two-year charts), then further back in muted tones
+YEAR_COLORS = ["#1f77b4", "#d62728", "#ff7f0e", "#9467bd", "#8c564b", "#7f7f7f", "#bcbd22", "#17becf"]
+
+
+def year_colors(years) -> dict:
+    """Color per year label, assigned from the most recent year backwards."""
+    ordered = sorted(years, reverse=True)
+    return {year: YEAR_COLORS[i % len(YEAR_COLORS)] for i, year in enumerate(ordered)}
+
+
+def year_period_pivot(daily: pd.DataFrame, agg: str) -> dict:
+    """Totals per year × period (ISO week or month) for all years at once.
+
+    Returns ``{"Orders", "Shipment Count", "Cumulative"}`` frames with one
+    row per year and one column per period (``ISOWeek`` or ``Month``);
+    periods a year has no data for are NaN. ``Cumulative`` is the running
+    total of ``Orders`` over the periods of each year.
+    """
+    x_key = "ISOWeek" if agg == "Week" else "Month"
+    totals = daily.groupby(["Year", x_key])[["Orders", "Shipment Count"]].sum()
+    orders = totals["Orders"].unstack(x_key).sort_index(axis=1).astype("float64")
+    counts = totals["Shipment Count"].unstack(x_key).reindex_like(orders)
+    return {"Orders": orders, "Shipment Count": counts, "Cumulative": orders.cumsum(axis=1)}
+
+
+def complete_weeks(daily: pd.DataFrame, min_dow: int) -> pd.DataFrame:
+    """Year × ISO week flags: True where the week has a day on or after ``min_dow`` (Mon = 0)."""
+    last_dow = daily.groupby(["Year", "ISOWeek"])["DayOfWeek"].max().unstack("ISOWeek")
+    return (last_dow >= min_dow).sort_index(axis=1)
+
+
+def baseline_deltas(values: pd.DataFrame, baseline: str, valid: pd.DataFrame = None) -> pd.DataFrame:
+    """Difference of every other year's row of ``values`` to the ``baseline`` row.
+
+    With ``valid`` (a boolean frame like ``values``), a delta is only kept
+    where both the year and the baseline are valid; it is NaN elsewhere,
+    as it is wherever either year has no value.
+    """
+    deltas = values.sub(values.loc[baseline], axis=1).drop(index=baseline)
+    if valid is not None:
+        valid = valid.reindex_like(values).fillna(False).astype(bool)
+        deltas = deltas.where(valid.drop(index=baseline) & valid.loc[baseline])
+    return deltas
+
+
+def weekday_heatmap(daily: pd.DataFrame) -> pd.DataFrame:
+    """Orders per weekday × Year-Week, with weekend days folded into Friday."""
+    dow_weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    heat = daily[["Year", "ISOWeek", "Orders"]].copy()
+    heat["DOW"] = np.array(dow_weekdays)[daily["DayOfWeek"].clip(upper=4).to_numpy()]
+    heat["YearWeek"] = heat["Year"] + "-W" + heat["ISOWeek"].astype(str).str.zfill(2)
+    heat = heat.groupby(["YearWeek", "DOW"])["Orders"].sum().reset_index()
+    if heat.empty:
+        return pd.DataFrame()
+    heat_pivot = heat.pivot(index="DOW", columns="YearWeek", values="Orders").fillna(0)
+    heat_pivot = heat_pivot[sorted(heat_pivot.columns)]
+    return heat_pivot.reindex([d for d in dow_weekdays if d in heat_pivot.index])
+
+
+def working_days_between(start: pd.Series, end: pd.Series) -> np.ndarray:
+    """Mon–Fri working days from ``start`` to ``end`` (dates only, vectorized)."""
+    return np.busday_count(
+        start.to_numpy().astype("datetime64[D]"),
+        end.to_numpy().astype("datetime64[D]"),
+    )
+
+
+def lead_time_summary(df: pd.DataFrame) -> dict:
+    """Working-day lead times (order placed → load date) and the weekly bucket pivot.
+
+    Rows missing any of shipment number, customer, order date or load date
+    are skipped, as are rows flagged with a negative lead time (see
+    quality.py). Returns ``{"histogram": Histogram, "pivot": frame}`` (an
+    exact per-day histogram of the lead times; ``pivot`` is empty when no
+    row is left), or None when no row has all four fields.
+    """
+    lt_df = df[["Shipment No", "Customer Name", "Order Placed Date", "Load Date From"]].dropna()
+    if len(lt_df) == 0:
+        return None
+    lt_df = lt_df[valid_mask(df.loc[lt_df.index], "negative_lead_time")]
+    lead = working_days_between(lt_df["Order Placed Date"], lt_df["Load Date From"])
+    if len(lead) == 0:
+        return {"histogram": Histogram.of_integers(lead), "pivot": pd.DataFrame()}
+
+    # ISO year, so the days of a week spanning New Year share one column
+    iso = lt_df["Order Placed Date"].dt.isocalendar()
+    year_week = iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    bucket = np.select(
+        [lead < bound for bound, _ in LEAD_TIME_BUCKETS],
+        [label for _, label in LEAD_TIME_BUCKETS],
+        default=LEAD_TIME_OVERFLOW,
+    )
+    lt = pd.DataFrame(
+        {"Lead Time (Working Days)": lead, "YearWeek": year_week.to_numpy(), "Bucket": bucket}
+    )
+
+    # Pivot: weeks as columns, buckets as rows
+    pivot = lt.groupby(["Bucket", "YearWeek"]).size().unstack(fill_value=0)
+    # Reverse columns to show most recent (latest week) on the left
+    pivot = pivot[[c for c in sorted(pivot.columns, reverse=True)]]
+    # Add total row
+    pivot.loc["0. Total Orders"] = pivot.sum()
+    # Add average row
+    pivot.loc["5. Average"] = lt.groupby("YearWeek")["Lead Time (Working Days)"].mean()
+    # Sort rows by bucket order
+    pivot = pivot.sort_index()
+    return {"histogram": Histogram.of_integers(lead), "pivot": pivot}
@@ -0,0 +1,45 @@
+import logging
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+
+def record(name: str, elapsed: float):
+    """Count one execution of ``name`` for the current session."""
+    stats = st.session_state.setdefault("run_stats", {})
+    entry = stats.setdefault(name, {"runs": 0, "last_ms": 0.0})
+    entry["runs"] += 1
+    entry["last_ms"] = elapsed * 1000
+    logger.debug("%s ran in %.1f ms (run %d)", name, entry["last_ms"], entry["runs"])
+
+
+@contextmanager
+def timed(name: str):
+    """Count and time the enclosed block as one execution of ``name``.
+
+    Must be used on the script thread (it writes to session state).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def render_stats():
+    """Per-session execution counts, shown with ``?debug=1`` in the URL.
+
+    A widget inside a fragment only bumps that fragment's counter; the
+    filter chain and the other sections keep their count.
+    """
+    if st.query_params.get("debug") != "1":
+        return
+    stats = st.session_state.get("run_stats", {})
+    with st.expander("⏱ Run stats"):
+        st.dataframe(
+            [{"Block": name, "Runs": s["runs"], "Last (ms)": round(s["last_ms"], 1)} for name, s in stats.items()],
+            hide_index=True,
+        )
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import streamlit as st
+
+import runstats
+
+# Worker threads shared by all sessions; pandas / NumPy release the GIL in
+# their heavy kernels, so independent sections overlap on multi-core hosts
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+
+@dataclass(frozen=True)
+class Section:
+    """One node of a page's task graph.
+
+    ``compute`` runs on a worker thread and receives the values named in
+    ``inputs`` (values passed to ``run_sections`` or results of other
+    sections) as positional arguments. It must not call Streamlit
+    elements; ``render``, if given, is called on the script thread with
+    the result as soon as it is ready, inside ``container`` when one is
+    given (create it beforehand so the page layout does not depend on
+    which section finishes first).
+
+    A section without ``compute`` is rendered directly on the script
+    thread with its inputs. This is meant for fragments that own their
+    widgets: they run while the pool works on the other sections, and
+    rerun on their own when those widgets change.
+    """
+
+    name: str
+    compute: Optional[Callable]
+    inputs: tuple = ()
+    render: Optional[Callable] = None
+    container: Optional[object] = None
+
+    def draw(self, *args):
+        with self.container if self.container is not None else nullcontext():
+            return self.render(*args)
+
+
+@st.cache_resource(show_spinner=False)
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="section")
+
+
+def _timed_compute(compute: Callable, *args) -> tuple:
+    start = time.perf_counter()
+    result = compute(*args)
+    return result, time.perf_counter() - start
+
+
+def run_sections(sections: list, **values) -> dict:
+    """Compute ``sections`` concurrently, rendering each one as it finishes.
+
+    A section is submitted as soon as all of its inputs are available.
+    Renders happen in completion order. Every pooled section is counted in
+    ``runstats`` under its name. Returns all values and section results by
+    name.
+    """
+    results = dict(values)
+    pending = list(sections)
+    running = {}
+    while pending or running:
+        ready = [s for s in pending if all(i in results for i in s.inputs)]
+        for section in ready:
+            if section.compute is not None:
+                pending.remove(section)
+                args = [results[i] for i in section.inputs]
+                running[_pool().submit(_timed_compute, section.compute, *args)] = section
+        for section in ready:
+            if section.compute is None:
+                pending.remove(section)
+                results[section.name] = section.draw(*[results[i] for i in section.inputs])
+        if not running:
+            if pending and not ready:
+                missing = sorted({i for s in pending for i in s.inputs if i not in results})
+                raise ValueError(f"Sections have unresolved inputs: {missing}")
+            continue
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            section = running.pop(future)
+            results[section.name], elapsed = future.result()
+            runstats.record(section.name, elapsed)
+            if section.render is not None:
+                section.draw(results[section.name])
+    return results
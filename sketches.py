@@ -0,0 +1,259 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dimensions import date_bounds
+
+# Leaf dimensions of the sketch cube, besides the Order Placed Date month
+LEAF_COLS = ["Business Line", "Customer Name"]
+
+# Fixed bin grid per sketched column: (low, high) or None for the dataset's
+# range, and the number of equal-width bins. Values outside a fixed range
+# are not counted (as on the Operations page).
+SKETCH_COLUMNS = {
+    "KM Utilization %": ((0.0, 100.0), 400),
+    "Weight": (None, 600),
+}
+
+
+@dataclass(frozen=True)
+class Histogram:
+    """Counts on a fixed bin grid: a mergeable quantile sketch.
+
+    Bin ``i`` covers ``[edges[i], edges[i + 1])`` (the last bin also holds
+    ``edges[-1]``). Histograms on the same grid merge exactly by adding
+    counts, so the sketch of a union of leaves is the same as the sketch
+    of its rows. Quantiles interpolate within a bin and are off by at
+    most ``error_bound`` (one bin width). A ``discrete`` histogram has
+    unit bins holding integer values, so its quantiles are exact.
+    """
+
+    edges: np.ndarray
+    counts: np.ndarray
+    discrete: bool = False
+
+    @classmethod
+    def from_values(cls, values, edges: np.ndarray) -> "Histogram":
+        """Count ``values`` on the grid ``edges``; values outside it are dropped."""
+        values = pd.Series(values).to_numpy(dtype=float, na_value=np.nan)
+        values = values[(values >= edges[0]) & (values <= edges[-1])]
+        bins = np.minimum(np.searchsorted(edges, values, side="right") - 1, len(edges) - 2)
+        return cls(edges, np.bincount(bins, minlength=len(edges) - 1).astype(np.int64))
+
+    @classmethod
+    def of_integers(cls, values) -> "Histogram":
+        """Exact histogram of non-negative integers, one unit bin per value."""
+        values = np.asarray(values, dtype=np.int64)
+        counts = np.bincount(values).astype(np.int64) if len(values) else np.zeros(1, dtype=np.int64)
+        return cls(np.arange(len(counts) + 1, dtype=float), counts, discrete=True)
+
+    def __add__(self, other: "Histogram") -> "Histogram":
+        if self.discrete and other.discrete:
+            size = max(len(self.counts), len(other.counts))
+            counts = np.zeros(size, dtype=np.int64)
+            counts[:len(self.counts)] += self.counts
+            counts[:len(other.counts)] += other.counts
+            return Histogram(np.arange(size + 1, dtype=float), counts, discrete=True)
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms on different bin grids cannot be merged")
+        return Histogram(self.edges, self.counts + other.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def error_bound(self) -> float:
+        """Largest difference between a quantile estimate and the exact value."""
+        return 0.0 if self.discrete else float(np.max(np.diff(self.edges)))
+
+    def mean(self) -> float:
+        """Mean value (exact for discrete histograms, bin midpoints otherwise)."""
+        points = self.edges[:-1] if self.discrete else (self.edges[:-1] + self.edges[1:]) / 2
+        return float(np.dot(points, self.counts) / self.total)
+
+    def _value_at(self, rank: int) -> float:
+        """Estimate of the ``rank``-th smallest value (0-based)."""
+        cum = np.cumsum(self.counts)
+        b = int(np.searchsorted(cum, rank, side="right"))
+        if self.discrete:
+            return float(self.edges[b])
+        before = cum[b] - self.counts[b]
+        # Spread the bin's values evenly across its width
+        return float(self.edges[b] + (rank - before + 0.5) / self.counts[b] * (self.edges[b + 1] - self.edges[b]))
+
+    def quantile(self, q: float) -> float:
+        """Quantile with linear interpolation between ranks, as ``Series.quantile``."""
+        n = self.total
+        if n == 0:
+            return float("nan")
+        pos = q * (n - 1)
+        lo = int(np.floor(pos))
+        value = self._value_at(lo)
+        if pos > lo:
+            value += (pos - lo) * (self._value_at(lo + 1) - value)
+        return value
+
+    def bars(self, max_bins: int, upper: float = None) -> pd.DataFrame:
+        """Chart bars: whole bins merged into at most ``max_bins`` bars.
+
+        Empty bins at either end are trimmed, as are bins starting above
+        ``upper``. Returns ``Start``, ``End``, ``Mid``, ``Width`` and ``Count``
+        (for discrete histograms ``End`` is the last value included).
+        """
+        counts = self.counts
+        if upper is not None:
+            counts = counts[: int(np.searchsorted(self.edges, upper, side="right"))]
+        nonzero = np.flatnonzero(counts)
+        if len(nonzero) == 0:
+            return pd.DataFrame(columns=["Start", "End", "Mid", "Width", "Count"])
+        first, last = nonzero[0], nonzero[-1] + 1
+        step = max(1, -(-(last - first) // max_bins))
+        starts = np.arange(first, last, step)
+        ends = np.minimum(starts + step, len(self.edges) - 1)
+        grouped = np.add.reduceat(counts[first:last], starts - first)
+        out = pd.DataFrame({"Start": self.edges[starts], "End": self.edges[ends], "Count": grouped})
+        if self.discrete:
+            # Integer bars: End is the last value included, centred on the values
+            out["End"] -= 1
+            out["Mid"] = (out["Start"] + out["End"]) / 2
+            out["Width"] = out["End"] - out["Start"] + 1
+        else:
+            out["Mid"] = (out["Start"] + out["End"]) / 2
+            out["Width"] = out["End"] - out["Start"]
+        return out
+
+
+@dataclass(frozen=True)
+class SketchCube:
+    """Per-leaf histograms of ``SKETCH_COLUMNS`` for one dataset.
+
+    A leaf is one Order Placed Date month × ``LEAF_COLS`` combination. For
+    every column, the non-empty (leaf, bin) cells are stored as parallel
+    arrays, so merging any set of leaves costs one ``bincount`` over the
+    cells, independent of the number of rows.
+    """
+
+    edges: dict
+    leaf_month: np.ndarray
+    leaf_codes: dict
+    month_first: dict
+    month_last: dict
+    cells: dict = field(repr=False)
+
+    def histogram(self, column: str, leaves: np.ndarray) -> Histogram:
+        """Merged histogram of ``column`` over the leaves selected by ``leaves``."""
+        cell_leaf, cell_bin, cell_count = self.cells[column]
+        keep = leaves[cell_leaf]
+        counts = np.bincount(cell_bin[keep], weights=cell_count[keep], minlength=len(self.edges[column]) - 1)
+        return Histogram(self.edges[column], counts.astype(np.int64))
+
+    def view_histogram(self, column: str, df: pd.DataFrame, leaves: np.ndarray = None) -> Histogram:
+        """Histogram of ``column`` in the filtered view ``df``.
+
+        Merged from the leaves when ``leaves`` (from ``select``) is given,
+        else binned from the view's rows on the same grid; both give the
+        same counts.
+        """
+        if leaves is not None:
+            return self.histogram(column, leaves)
+        return Histogram.from_values(df[column], self.edges[column])
+
+    def select(self, catalog: dict, selections: dict, date_range) -> np.ndarray:
+        """Leaf mask equivalent to the sidebar filters, or None.
+
+        The filters can be answered from the cube when they only select
+        leaf columns and every month lies entirely inside or outside the
+        date range, which covers whole days: a month is inside when all of
+        its orders fall on those days (rows without an order date are
+        always kept, as in the app's date filter).
+        """
+        if any(selected and col not in self.leaf_codes for col, selected in selections.items()):
+            return None
+        leaves = np.ones(len(self.leaf_month), dtype=bool)
+        for col, codes in self.leaf_codes.items():
+            if selections.get(col):
+                lut = np.zeros(len(catalog[col].values) + 1, dtype=bool)
+                lut[catalog[col].lookup(selections[col])] = True
+                leaves &= lut[codes]
+
+        if date_range and len(date_range) == 2:
+            start, stop = date_bounds(date_range)
+            inside = set()
+            for month in self.month_first:
+                first, last = self.month_first[month], self.month_last[month]
+                if start <= first and last < stop:
+                    inside.add(month)
+                elif last >= start and first < stop:
+                    return None
+            leaves &= (self.leaf_month < 0) | np.isin(self.leaf_month, list(inside))
+        return leaves
+
+
+def _month_codes(df: pd.DataFrame) -> np.ndarray:
+    """Order Placed Date month as ``year * 12 + month - 1`` (-1 when missing)."""
+    if "Order Placed Date" not in df.columns:
+        return np.full(len(df), -1, dtype=np.int64)
+    opd = df["Order Placed Date"]
+    return (opd.dt.year * 12 + opd.dt.month - 1).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def column_edges(df: pd.DataFrame, column: str) -> np.ndarray:
+    """The fixed bin grid of a sketched column for this dataset."""
+    value_range, nbins = SKETCH_COLUMNS[column]
+    if value_range is None:
+        values = df[column].dropna()
+        value_range = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+        if value_range[0] == value_range[1]:
+            value_range = (value_range[0], value_range[0] + 1.0)
+    return np.linspace(value_range[0], value_range[1], nbins + 1)
+
+
+def build_cube(df: pd.DataFrame, catalog: dict) -> SketchCube:
+    """Sketch every column of ``SKETCH_COLUMNS`` present in ``df`` per leaf."""
+    leaf_cols = [col for col in LEAF_COLS if col in catalog]
+    months = _month_codes(df)
+
+    # Mixed-radix leaf key from the month and the catalog codes (+1 so that missing is 0)
+    key = months + 1
+    for col in leaf_cols:
+        key = key * (len(catalog[col].values) + 1) + (catalog[col].codes + 1)
+    uniques, leaf = np.unique(key, return_inverse=True)
+
+    leaf_codes = {}
+    for col in reversed(leaf_cols):
+        size = len(catalog[col].values) + 1
+        leaf_codes[col] = (uniques % size - 1).astype(np.int32)
+        uniques = uniques // size
+    leaf_month = uniques - 1
+
+    month_first, month_last = {}, {}
+    if "Order Placed Date" in df.columns:
+        bounds = df["Order Placed Date"].groupby(months).agg(["min", "max"])
+        bounds = bounds[bounds.index >= 0]
+        month_first = dict(zip(bounds.index.tolist(), bounds["min"]))
+        month_last = dict(zip(bounds.index.tolist(), bounds["max"]))
+
+    edges, cells = {}, {}
+    for column in SKETCH_COLUMNS:
+        if column not in df.columns:
+            continue
+        edges[column] = grid = column_edges(df, column)
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        valid = (values >= grid[0]) & (values <= grid[-1])
+        bins = np.minimum(np.searchsorted(grid, values[valid], side="right") - 1, len(grid) - 2)
+        cell_key, cell_count = np.unique(leaf[valid] * (len(grid) - 1) + bins, return_counts=True)
+        cells[column] = (cell_key // (len(grid) - 1), cell_key % (len(grid) - 1), cell_count)
+
+    return SketchCube(
+        edges=edges, leaf_month=leaf_month, leaf_codes=leaf_codes,
+        month_first=month_first, month_last=month_last, cells=cells,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_cube(dataset_key: str, _df: pd.DataFrame, _catalog: dict) -> SketchCube:
+    """Sketch cube for a loaded dataset, built once per ``dataset_key``."""
+    return build_cube(_df, _catalog)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from anomalies import YEAR_WEEKS, Z_THRESHOLD, score_weeks
+
+WEEKS = 110
+
+
+def _poisson(level: float, series: int = 1000, seed: int = 0, season=None) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rate = level * (np.ones(WEEKS) if season is None else season)
+    return rng.poisson(rate, (series, WEEKS)).astype(float)
+
+
+def test_constant_series_dropping_to_zero_is_flagged():
+    Y = np.full((1, WEEKS), 20.0)
+    Y[0, -1] = 0
+    expected, z = score_weeks(Y)
+    assert expected[0, -1] == 20.0
+    assert z[0, -1] <= -Z_THRESHOLD
+
+
+def test_steady_poisson_series_dropping_to_zero_is_flagged():
+    for level, share in [(20, 0.6), (40, 0.9)]:
+        Y = _poisson(level)
+        Y[:, -1] = 0
+        _, z = score_weeks(Y)
+        assert (z[:, -1] <= -Z_THRESHOLD).mean() >= share, level
+
+
+def test_steady_poisson_series_rarely_alert():
+    _, z = score_weeks(_poisson(20))
+    assert np.nanmean(np.abs(z[:, YEAR_WEEKS:]) >= Z_THRESHOLD) < 0.003
+
+
+def test_repeated_seasonal_peak_is_expected():
+    season = np.ones(WEEKS)
+    season[95 - YEAR_WEEKS - 2:95 - YEAR_WEEKS + 3] = 2.0
+    season[93:98] = 2.0
+    expected, z = score_weeks(_poisson(200, series=200, season=season))
+    assert np.median(expected[:, 95]) > 1.6 * 200
+    assert (np.abs(z[:, 95]) >= Z_THRESHOLD).mean() < 0.05
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import _clean_numeric, _convert_serial_dates
+
+
+@pytest.mark.parametrize("dtype", [object, "str", "string"])
+def test_placeholders_are_not_unparsed_numbers(dtype):
+    df = pd.DataFrame({"Quote": pd.Series(["-", "", None, "1250.5", "n/a"], dtype=dtype)})
+    unparsed = {}
+    df = _clean_numeric(df, unparsed)
+    assert df["Quote"].iloc[3] == 1250.5
+    assert unparsed["Quote"].tolist() == [False, False, False, False, True]
+
+
+@pytest.mark.parametrize("dtype", [object, "str", "string"])
+def test_placeholders_are_not_unparsed_dates(dtype):
+    df = pd.DataFrame({"Order Placed Date": pd.Series(["-", "2025-03-04", "", "not a date"], dtype=dtype)})
+    unparsed = {}
+    df = _convert_serial_dates(df, unparsed)
+    assert df["Order Placed Date"].iloc[1] == pd.Timestamp("2025-03-04")
+    assert unparsed["Order Placed Date"].tolist() == [False, False, False, True]
+
+
+def test_numbers_are_always_present():
+    df = pd.DataFrame({"Quote": [np.nan, 3.0]})
+    unparsed = {}
+    _clean_numeric(df, unparsed)
+    assert not unparsed["Quote"].any()
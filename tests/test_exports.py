@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+import exports
+
+
+def _frame(rows: int = 120_000) -> pd.DataFrame:
+    """Shipment-like rows spanning several export chunks."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Shipment No": np.arange(rows),
+        "Customer Name": pd.Categorical(rng.choice(["Acme", "Globex", None], rows)),
+        "Order Placed Date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "Weight": rng.random(rows) * 30_000,
+        "Note": rng.choice(["a", None, "c"], rows).astype(object),
+    })
+
+
+def _download(df: pd.DataFrame, fmt: str) -> bytes:
+    """Bytes served for the export button's deferred download, as Streamlit runs it."""
+    storage = MemoryMediaFileStorage("/media")
+    manager = MediaFileManager(storage)
+    ext, mime = exports.EXPORT_FORMATS[fmt]
+    file_id = manager.add_deferred(lambda: exports.export_file(df, fmt), mime, "coords", file_name=f"data.{ext}")
+    url = manager.execute_deferred(file_id)
+    return storage.get_file(url.rsplit("/", 1)[-1]).content
+
+
+@pytest.mark.parametrize("fmt, read", [
+    ("CSV", lambda data: pd.read_csv(io.BytesIO(data), parse_dates=["Order Placed Date"])),
+    ("Parquet", lambda data: pd.read_parquet(io.BytesIO(data))),
+    ("XLSX", lambda data: pd.read_excel(io.BytesIO(data))),
+])
+def test_download_round_trips(fmt, read):
+    df = _frame(60_000 if fmt == "XLSX" else 120_000)
+    back = read(_download(df, fmt))
+    assert len(back) == len(df)
+    assert list(back.columns) == list(df.columns)
+    assert (back["Shipment No"].to_numpy() == df["Shipment No"].to_numpy()).all()
+    assert np.allclose(back["Weight"].to_numpy(dtype=float), df["Weight"].to_numpy())
+    assert (pd.to_datetime(back["Order Placed Date"]).to_numpy() == df["Order Placed Date"].to_numpy()).all()
+    assert back["Customer Name"].isna().sum() == df["Customer Name"].isna().sum()
+
+
+@pytest.mark.parametrize("fmt", list(exports.EXPORT_FORMATS))
+def test_empty_download(fmt):
+    assert len(_download(_frame(0), fmt)) > 0
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import loading
+from data_loader import MAX_DATASETS
+
+# Held clear to keep a parse running
+release = threading.Event()
+release.set()
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Fake parser recording the file and thread of every parse."""
+    calls = []
+
+    def parse(file, progress=None):
+        release.wait(5)
+        calls.append((file, threading.current_thread().name))
+        return pd.DataFrame({"file": [file]})
+
+    monkeypatch.setattr(loading, "parse_excel", parse)
+    loading._registry.clear()
+    yield calls
+    loading._registry.clear()
+
+
+def _load(key: str) -> pd.DataFrame:
+    return loading.load_dataset(f"{key}.xlsx", f"{key}.xlsx", key)
+
+
+def test_cache_hits_refresh_recency(parses):
+    for key in "ABCD":
+        _load(key)
+    assert _load("A")["file"].iloc[0] == "A.xlsx"
+    _load("E")
+    # B was the least recently used dataset, so E replaced it rather than A
+    assert loading.status("A") == "ready"
+    assert loading.status("B") is None
+    assert len(parses) == MAX_DATASETS + 1
+
+    _load("A")
+    assert len(parses) == MAX_DATASETS + 1
+    _load("B")
+    assert [file for file, _ in parses].count("B.xlsx") == 2
+    # Every parse ran on a load thread, inside the load slots
+    assert all(thread.startswith("load ") for _, thread in parses)
+
+
+def test_sessions_share_one_parse(parses):
+    release.clear()
+    frames = []
+    sessions = [threading.Thread(target=lambda: frames.append(_load("A"))) for _ in range(3)]
+    for session in sessions:
+        session.start()
+    # Release the parse once all three sessions wait for the same load
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        load = loading._registry()["loads"].get("A")
+        if load is not None and load.waiting == 3:
+            break
+        time.sleep(0.01)
+    assert load.waiting == 3
+    release.set()
+    for session in sessions:
+        session.join(10)
+    assert len(parses) == 1
+    assert len(frames) == 3
+    # Each session gets its own copy
+    assert len({id(frame) for frame in frames}) == 3
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from rollups import lead_time_summary
+
+
+def test_lead_time_pivot_leads_with_the_latest_iso_week():
+    placed = pd.to_datetime(["2025-12-15", "2025-12-22", "2025-12-30", "2026-01-02"])
+    df = pd.DataFrame({
+        "Shipment No": range(len(placed)),
+        "Customer Name": "Acme",
+        "Order Placed Date": placed,
+        "Load Date From": placed + pd.Timedelta(days=5),
+    })
+    pivot = lead_time_summary(df)["pivot"]
+    # 30 Dec 2025 and 2 Jan 2026 both fall in ISO week 2026-W01, the first page's first column
+    assert list(pivot.columns) == ["2026-W01", "2025-W52", "2025-W51"]
+    assert pivot.loc["0. Total Orders", "2026-W01"] == 2
@@ -0,0 +1,72 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dimensions import build_catalog, date_mask
+from sketches import Histogram, build_cube
+
+
+@pytest.fixture(scope="module")
+def shipments() -> pd.DataFrame:
+    """Orders from mid-2024 to mid-March 2026, placed at any time of day."""
+    rng = np.random.default_rng(0)
+    rows = 50_000
+    start = pd.Timestamp("2024-06-12")
+    seconds = rng.integers(0, (pd.Timestamp("2026-03-17 18:30") - start).total_seconds(), rows)
+    df = pd.DataFrame({
+        "Order Placed Date": start + pd.to_timedelta(seconds, unit="s"),
+        "Business Line": rng.choice(["Bulk", "Tank", "Chem"], rows),
+        "Customer Name": rng.choice([f"Customer {i}" for i in range(40)], rows),
+        "KM Utilization %": rng.random(rows) * 110,
+        "Weight": rng.gamma(2.0, 8_000.0, rows),
+    })
+    df.loc[rng.choice(rows, 200, replace=False), "Order Placed Date"] = pd.NaT
+    return df
+
+
+def _default_range(df: pd.DataFrame) -> tuple:
+    """The sidebar's default date range (app.py): 1 Jan 2025, or the first order, to the last order."""
+    dates = df["Order Placed Date"].dropna()
+    return max(date(2025, 1, 1), dates.min().date()), dates.max().date()
+
+
+@pytest.mark.parametrize("date_range", [
+    "default",
+    "full",
+    (date(2025, 3, 1), date(2025, 8, 31)),
+])
+@pytest.mark.parametrize("customers", [[], ["Customer 3", "Customer 17"]])
+def test_select_merges_whole_months(shipments, date_range, customers):
+    dates = shipments["Order Placed Date"].dropna()
+    if date_range == "default":
+        date_range = _default_range(shipments)
+    elif date_range == "full":
+        date_range = (dates.min().date(), dates.max().date())
+    catalog = build_catalog(shipments)
+    cube = build_cube(shipments, catalog)
+    selections = {"Customer Name": customers}
+
+    leaves = cube.select(catalog, selections, date_range)
+    assert leaves is not None
+
+    view = shipments[date_mask(shipments["Order Placed Date"], date_range)]
+    if customers:
+        view = view[view["Customer Name"].isin(customers)]
+    for column in cube.edges:
+        merged = cube.view_histogram(column, view, leaves)
+        binned = Histogram.from_values(view[column], cube.edges[column])
+        assert merged.total > 0
+        assert np.array_equal(merged.counts, binned.counts)
+
+
+def test_select_falls_back_inside_a_month(shipments):
+    catalog = build_catalog(shipments)
+    cube = build_cube(shipments, catalog)
+    assert cube.select(catalog, {}, (date(2025, 3, 10), date(2025, 8, 31))) is None
+
+
+def test_date_mask_keeps_the_whole_last_day():
+    dates = pd.Series(pd.to_datetime(["2025-01-31 00:00", "2025-01-31 23:59", "2025-02-01 00:00", None]))
+    assert date_mask(dates, (date(2025, 1, 1), date(2025, 1, 31))).tolist() == [True, True, False, True]
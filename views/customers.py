@@ -1,7 +1,61 @@
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
+from anomalies import Z_THRESHOLD, get_scores, series_history
 from data_loader import count_weighted_shipments
+import runstats
+
+DEFAULT_TOP_N = 10
+# This page's entry in app.PAGES (alerts elsewhere link here)
+PAGE = "👥 Customers"
+# Weeks of history shown for an opened alert
+ALERT_HISTORY_WEEKS = 52
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_customers(scope: str, _df: pd.DataFrame, top_n: int) -> dict:
+    """Top-N customer totals, monthly trend and business line split, cached per ``scope``."""
+    totals = _df.groupby("Customer Name", observed=True)["Shipment Weight"].sum()
+    top = totals.nlargest(top_n).reset_index()
+    top.columns = ["Customer", "Shipments"]
+    top_names = top["Customer"].tolist()
+    top_df = _df[_df["Customer Name"].isin(top_names)]
+
+    trend = None
+    if "Load Month Name" in _df.columns:
+        trend = (
+            top_df.groupby(["Load Month Name", "Customer Name"], observed=True)["Shipment Weight"]
+            .sum()
+            .reset_index(name="Shipments")
+        )
+
+    cb = None
+    if "Business Line" in _df.columns:
+        cb = top_df.groupby(
+            ["Customer Name", "Business Line"], observed=True
+        )["Shipment Weight"].sum().reset_index(name="Shipments")
+
+    return {"top": top, "trend": trend, "business_lines": cb}
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    if "Customer Name" in df.columns:
+        compute_customers(view_key, df, DEFAULT_TOP_N)
+
+
+def open_alert(kind: str, key, customer: str):
+    """Button callback: show ``customer`` on this page with the alert's series.
+
+    Clears the other sidebar filters so the customer is reachable.
+    """
+    for name in list(st.session_state.keys()):
+        if name.startswith("filter_"):
+            st.session_state[name] = []
+    st.session_state["filter_Customer Name"] = [customer]
+    st.session_state.page = PAGE
+    st.session_state.alert_focus = (kind, key)
 
 
 def render(df: pd.DataFrame):
@@ -11,40 +65,70 @@ def render(df: pd.DataFrame):
         st.warning("No 'Customer Name' column found.")
         return
 
-    # ── Top N selector ───────────────────────────────────────
-    top_n = st.slider("Show top N customers", 5, 30, 10)
+    if st.session_state.get("alert_focus"):
+        alert_focus()
+    top_customers(df)
 
-    # ── Top customers by shipment count ──────────────────────
-    st.subheader(f"Top {top_n} Customers by Shipment Count")
-    top = df.groupby("Customer Name")["Shipment Weight"].sum().nlargest(top_n).reset_index()
-    top.columns = ["Customer", "Shipments"]
-    fig = px.bar(top, x="Shipments", y="Customer", orientation="h", text_auto=True, color="Shipments",
-                 color_continuous_scale="Teal")
-    fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
-                      margin=dict(t=20, b=20, l=150))
-    st.plotly_chart(fig, width='stretch')
-
-    # ── Customer trend over time ─────────────────────────────
-    st.subheader("Customer Volume Trend Over Time")
-    if "Load Month Name" in df.columns:
-        top_names = df.groupby("Customer Name")["Shipment Weight"].sum().nlargest(top_n).index.tolist()
-        trend_df = df[df["Customer Name"].isin(top_names)].copy()
-        trend = (
-            trend_df.groupby(["Load Month Name", "Customer Name"])["Shipment Weight"]
-            .sum()
-            .reset_index(name="Shipments")
-        )
-        fig = px.line(trend, x="Load Month Name", y="Shipments", color="Customer Name", markers=True)
-        fig.update_layout(xaxis_title="Month", margin=dict(t=20, b=20))
+
+@st.fragment
+def alert_focus():
+    """Weekly orders of the alert opened from the Alerts section against its baseline."""
+    with runstats.timed("customers: alert"):
+        kind, key = st.session_state.alert_focus
+        scores = get_scores(st.session_state.dataset_key, kind, st.session_state.df_raw)
+        if scores is None or key not in scores.keys:
+            del st.session_state.alert_focus
+            return
+        label = scores.labels[scores.keys.get_loc(key)]
+        c1, c2 = st.columns([4, 1])
+        c1.subheader(f"🚨 Alert: {label}")
+        if c2.button("Dismiss", key="alert_dismiss"):
+            del st.session_state.alert_focus
+            st.rerun()
+
+        history = series_history(scores, key).iloc[:scores.complete].tail(ALERT_HISTORY_WEEKS)
+        flagged = history[history["Z"].abs() >= Z_THRESHOLD]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=history["Week"], y=history["Expected"], mode="lines", name="Expected",
+                                 line=dict(color="#8A8A8A", dash="dash")))
+        fig.add_trace(go.Scatter(x=history["Week"], y=history["Orders"], mode="lines+markers", name="Orders",
+                                 line=dict(color="#1f77b4")))
+        fig.add_trace(go.Scatter(x=flagged["Week"], y=flagged["Orders"], mode="markers", name=f"|z| ≥ {Z_THRESHOLD:g}",
+                                 marker=dict(color="#E3000F", size=11, symbol="circle-open", line=dict(width=2))))
+        fig.update_layout(xaxis_title="Week", yaxis_title="Orders per week", hovermode="x unified",
+                          margin=dict(t=20, b=20))
         st.plotly_chart(fig, width='stretch')
 
-    # ── Customer × Business Line breakdown ───────────────────────────
-    if "Business Line" in df.columns:
-        st.subheader(f"Top {top_n} Customers × Business Line")
-        top_names = df.groupby("Customer Name")["Shipment Weight"].sum().nlargest(top_n).index.tolist()
-        cb = df[df["Customer Name"].isin(top_names)].groupby(
-            ["Customer Name", "Business Line"]
-        )["Shipment Weight"].sum().reset_index(name="Shipments")
-        fig = px.bar(cb, x="Customer Name", y="Shipments", color="Business Line", text_auto=True)
-        fig.update_layout(margin=dict(t=20, b=20))
+
+@st.fragment
+def top_customers(df: pd.DataFrame):
+    """Top-N customer sections; moving the slider reruns only this fragment."""
+    with runstats.timed("customers: top n"):
+        # ── Top N selector ───────────────────────────────────────
+        top_n = st.slider("Show top N customers", 5, 30, DEFAULT_TOP_N)
+        result = compute_customers(st.session_state.view_key, df, top_n)
+
+        # ── Top customers by shipment count ──────────────────────
+        st.subheader(f"Top {top_n} Customers by Shipment Count")
+        top = result["top"]
+        fig = px.bar(top, x="Shipments", y="Customer", orientation="h", text_auto=True, color="Shipments",
+                     color_continuous_scale="Teal")
+        fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
+                          margin=dict(t=20, b=20, l=150))
         st.plotly_chart(fig, width='stretch')
+
+        # ── Customer trend over time ─────────────────────────────
+        st.subheader("Customer Volume Trend Over Time")
+        if result["trend"] is not None:
+            trend = result["trend"]
+            fig = px.line(trend, x="Load Month Name", y="Shipments", color="Customer Name", markers=True)
+            fig.update_layout(xaxis_title="Month", margin=dict(t=20, b=20))
+            st.plotly_chart(fig, width='stretch')
+
+        # ── Customer × Business Line breakdown ───────────────────────────
+        if result["business_lines"] is not None:
+            st.subheader(f"Top {top_n} Customers × Business Line")
+            cb = result["business_lines"]
+            fig = px.bar(cb, x="Customer Name", y="Shipments", color="Business Line", text_auto=True)
+            fig.update_layout(margin=dict(t=20, b=20))
+            st.plotly_chart(fig, width='stretch')
@@ -2,19 +2,60 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 from data_loader import count_weighted_shipments
+from corridors import OD_LEVELS, OD_MEASURES, build_od_cube, od_matrix, rollup, slice_cube, top, top_corridors
+from lanes import route_labels
+import runstats
+
+# Largest origins / destinations shown in the OD matrix
+OD_MATRIX_LIMIT = 25
+# Corridors in the ranking
+TOP_CORRIDORS = 15
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_od_cube(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Origin–destination cube of the view (see ``corridors.build_od_cube``), cached per ``scope``."""
+    return build_od_cube(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_geography(scope: str, _df: pd.DataFrame) -> dict:
+    """Top load/unload countries and country routes, rolled up from the OD cube."""
+    cube = compute_od_cube(scope, _df)
+
+    def top_of(col, n, label):
+        return top(cube, col, n, label) if col in cube.columns else None
+
+    routes = None
+    if "Load Country" in cube.columns and "Unload Country" in cube.columns:
+        pairs = rollup(cube, ["Load Country", "Unload Country"]).reset_index()
+        pairs["Route"] = route_labels(pairs["Load Country"], pairs["Unload Country"])
+        routes = top(pairs, "Route", 15, "Route")
+
+    return {
+        "Load Country": top_of("Load Country", 15, "Country"),
+        "Unload Country": top_of("Unload Country", 15, "Country"),
+        "Route": routes,
+    }
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    compute_geography(view_key, df)
 
 
 def render(df: pd.DataFrame):
     st.header("🌍 Geography")
 
+    result = compute_geography(st.session_state.view_key, df)
+
     col_left, col_right = st.columns(2)
 
     # ── Load country ──────────────────────────────
     with col_left:
-        if "Load Country" in df.columns:
+        if result["Load Country"] is not None:
             st.subheader("Load Country Volume")
-            lc = df.groupby("Load Country")["Shipment Weight"].sum().nlargest(15).reset_index()
-            lc.columns = ["Country", "Shipments"]
+            lc = result["Load Country"]
             fig = px.bar(lc, x="Shipments", y="Country", orientation="h", text_auto=True,
                          color="Shipments", color_continuous_scale="Greens")
             fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
@@ -23,10 +64,9 @@ def render(df: pd.DataFrame):
 
     # ── Unload country ─────────────────────────────
     with col_right:
-        if "Unload Country" in df.columns:
+        if result["Unload Country"] is not None:
             st.subheader("Unload Country Volume")
-            uc = df.groupby("Unload Country")["Shipment Weight"].sum().nlargest(15).reset_index()
-            uc.columns = ["Country", "Shipments"]
+            uc = result["Unload Country"]
             fig = px.bar(uc, x="Shipments", y="Country", orientation="h", text_auto=True,
                          color="Shipments", color_continuous_scale="Purples")
             fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
@@ -34,24 +74,79 @@ def render(df: pd.DataFrame):
             st.plotly_chart(fig, width='stretch')
 
     # ── Top routes ──────────────────────────────────────────
-    if "Route" in df.columns:
+    if result["Route"] is not None:
         st.subheader("Top 15 Routes (Load → Unload Country)")
-        routes = df.groupby("Route")["Shipment Weight"].sum().nlargest(15).reset_index()
-        routes.columns = ["Route", "Shipments"]
+        routes = result["Route"]
         fig = px.bar(routes, x="Shipments", y="Route", orientation="h", text_auto=True,
                      color="Shipments", color_continuous_scale="Sunset")
         fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
                           margin=dict(t=20, b=20, l=120))
         st.plotly_chart(fig, width='stretch')
 
-    # ── Region drill-down ────────────────────────────────────────
-    st.subheader("Region Drill-Down")
-    region_col = st.selectbox("Region type", ["Load Region", "Unload Region"])
-    if region_col in df.columns:
-        reg = df.groupby(region_col)["Shipment Weight"].sum().nlargest(20).reset_index()
-        reg.columns = ["Region", "Shipments"]
-        fig = px.bar(reg, x="Shipments", y="Region", orientation="h", text_auto=True,
-                     color="Shipments", color_continuous_scale="Viridis")
+    # ── Origin–destination drill-down ─────────────────────────────
+    od_drill_down(compute_od_cube(st.session_state.view_key, df))
+
+
+def _drill(container, side: str, cube: pd.DataFrame, levels: list, path: dict) -> str:
+    """Drill-path selectboxes for one side; adds the chosen values to ``path``.
+
+    Returns the level shown for this side: the first level left at "All",
+    or the finest level.
+    """
+    index = 0 if side == "Origin" else 1
+    for level, finer in zip(levels, levels[1:]):
+        col = OD_LEVELS[level][index]
+        values = sorted(slice_cube(cube, path)[col].dropna().unique().tolist())
+        choice = container.selectbox(f"{side} {level.lower()}", ["All"] + values, key=f"od_{side}_{level}")
+        if choice == "All":
+            return level
+        path[col] = choice
+    return levels[-1]
+
+
+@st.fragment
+def od_drill_down(cube: pd.DataFrame):
+    """OD matrix and top corridors along any drill path; answered from the cube, rerunning only this fragment."""
+    with runstats.timed("geography: od drill-down"):
+        st.subheader("Origin–Destination Drill-Down")
+        levels = [level for level, cols in OD_LEVELS.items() if all(c in cube.columns for c in cols)]
+        if not levels:
+            st.info("Load / unload location columns not available.")
+            return
+
+        c1, c2, c3 = st.columns(3)
+        measure = c3.selectbox("Measure", OD_MEASURES, key="od_measure")
+        months = sorted(cube["Month"].dropna().unique().tolist())
+        month_range = None
+        if len(months) > 1:
+            month_range = c3.select_slider("Order month", months, value=(months[0], months[-1]), key="od_months")
+            # The full range also keeps shipments without an order date
+            if month_range == (months[0], months[-1]):
+                month_range = None
+
+        path = {}
+        origin_level = _drill(c1, "Origin", cube, levels, path)
+        destination_level = _drill(c2, "Destination", cube, levels, path)
+        view = slice_cube(cube, path, month_range)
+        if len(view) == 0:
+            st.info("No shipments on this drill path.")
+            return
+
+        # OD matrix
+        matrix = od_matrix(view, origin_level, destination_level, measure, limit=OD_MATRIX_LIMIT)
+        fig = px.imshow(
+            matrix, color_continuous_scale="YlOrRd", aspect="auto",
+            labels=dict(x=f"Unload {destination_level}", y=f"Load {origin_level}", color=measure),
+        )
+        fig.update_layout(margin=dict(t=20, b=20), height=max(350, 22 * len(matrix) + 120))
+        st.plotly_chart(fig, width='stretch')
+
+        # Top corridors
+        st.subheader(f"Top {TOP_CORRIDORS} Corridors ({origin_level} → {destination_level})")
+        corridors = top_corridors(view, origin_level, destination_level, TOP_CORRIDORS, measure)
+        fig = px.bar(corridors, x=measure, y="Corridor", orientation="h", text_auto=True,
+                     color=measure, color_continuous_scale="Viridis")
         fig.update_layout(yaxis=dict(autorange="reversed"), coloraxis_showscale=False,
                           margin=dict(t=20, b=20, l=180))
         st.plotly_chart(fig, width='stretch')
+        st.dataframe(corridors, hide_index=True, width='stretch')
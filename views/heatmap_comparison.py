@@ -4,121 +4,29 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import timedelta
 from data_loader import count_weighted_shipments
+from quality import valid_mask
+import exports
+import movers
+import runstats
 
+# Comparisons offered next to the usual period presets
+SELECTED_MONTHS = "Main month vs compare month (above)"
+CUSTOM = "Custom ranges"
 
-def render(df: pd.DataFrame):
-    st.header("🔥 Treemap Comparison")
 
-    # Use full unfiltered data from session state
-    if "df_raw" not in st.session_state or st.session_state.df_raw is None:
-        st.warning("Data not loaded. Please go back and load a file.")
-        return
-    
-    df_full = st.session_state.df_raw.copy()
-    
-    if "Order Placed Date" not in df_full.columns or "Customer Name" not in df_full.columns:
-        st.warning("Missing 'Order Placed Date' or 'Customer Name' columns.")
-        return
-    
-    if "Business Line" not in df_full.columns:
-        st.warning("Missing 'Business Line' column.")
-        return
-
-    # ══════════════════════════════════════════════════════════
-    # Get available months (exclude NaT)
-    # ══════════════════════════════════════════════════════════
-    df_full["YearMonth"] = df_full["Order Placed Date"].dt.to_period("M")
-    available_months = sorted(
-        [m for m in df_full["YearMonth"].unique() if pd.notna(m)],
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_months(scope: str, _df: pd.DataFrame) -> list:
+    """Order months of the full dataset, most recent first, cached per ``scope``."""
+    year_month = _df["Order Placed Date"].dt.to_period("M")
+    return sorted(
+        [m for m in year_month.unique() if pd.notna(m)],
         reverse=True
     )
-    
-    if len(available_months) < 2:
-        st.warning("Not enough data to compare. Need at least 2 months.")
-        return
 
-    # ══════════════════════════════════════════════════════════
-    # Month selectors with two columns
-    # ══════════════════════════════════════════════════════════
-    # Initialize session state
-    if "hm_main_month" not in st.session_state:
-        st.session_state.hm_main_month = available_months[1] if len(available_months) > 1 else available_months[0]
-    if "hm_compare_month" not in st.session_state:
-        st.session_state.hm_compare_month = available_months[0]
-    
-    col_left, col_right = st.columns(2)
-    
-    # Month icons - using simple calendar symbols
-    month_icons = ['🟰', '🟱', '🟲', '🟳', '🟴', '🟵', '🟶', '🟷', '🟸', '🟹', '🟺', '🟻']
-    # Alternative set using different colored emojis for better visibility
-    month_names_short = ['J', 'F', 'M', 'A', 'M', 'J', 'J', 'A', 'S', 'O', 'N', 'D']
-    
-    # Group months by year
-    months_by_year = {}
-    for month in available_months:
-        year = month.year
-        if year not in months_by_year:
-            months_by_year[year] = []
-        months_by_year[year].append(month)
-    
-    # Limit to max 3 years
-    all_years = sorted(months_by_year.keys(), reverse=True)
-    years_to_show = all_years[:3]
-    
-    with col_left:
-        st.write("**Compare Against**")
-        for year in sorted(years_to_show, reverse=True):
-            year_months = months_by_year[year]
-            row_text = f"{year}: "
-            for month in sorted(year_months, key=lambda x: x.month):
-                is_selected = st.session_state.hm_compare_month == month
-                icon_char = month_icons[month.month - 1]
-                # Add visual indicator of selection
-                if is_selected:
-                    row_text += f"**{icon_char}** "
-                else:
-                    row_text += f"{icon_char} "
-            
-            # Create compact button row
-            cols = st.columns(len(year_months) + 1)
-            cols[0].write(f"**{year}**")
-            for idx, month in enumerate(sorted(year_months, key=lambda x: x.month), 1):
-                with cols[idx]:
-                    is_selected = st.session_state.hm_compare_month == month
-                    month_letter = month_names_short[month.month - 1]
-                    # Use simple letter with visual indicator
-                    if is_selected:
-                        label = f"[{month_letter}]"
-                    else:
-                        label = month_letter
-                    if st.button(label, key=f"btn_compare_{year}_{month.month}", help=f"{month}"):
-                        st.session_state.hm_compare_month = month
-    
-    with col_right:
-        st.write("**Main Month**")
-        for year in sorted(years_to_show, reverse=True):
-            year_months = months_by_year[year]
-            # Create compact button row
-            cols = st.columns(len(year_months) + 1)
-            cols[0].write(f"**{year}**")
-            for idx, month in enumerate(sorted(year_months, key=lambda x: x.month), 1):
-                with cols[idx]:
-                    is_selected = st.session_state.hm_main_month == month
-                    month_letter = month_names_short[month.month - 1]
-                    # Use simple letter with visual indicator
-                    if is_selected:
-                        label = f"[{month_letter}]"
-                    else:
-                        label = month_letter
-                    if st.button(label, key=f"btn_main_{year}_{month.month}", help=f"{month}"):
-                        st.session_state.hm_main_month = month
-    
-    selected_month1 = st.session_state.hm_main_month
-    selected_month2 = st.session_state.hm_compare_month
-    
-    st.divider()
-    st.write(f"**Comparing: {selected_month1} (Main) vs {selected_month2} (Compare Against)**")
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_treemap(scope: str, _df: pd.DataFrame, selected_month1, selected_month2) -> dict:
+    """Business Line → Customer order comparison of two months, cached per ``scope``."""
     # ══════════════════════════════════════════════════════════
     # Prepare data for treemaps
     # ══════════════════════════════════════════════════════════
@@ -128,14 +36,16 @@ def render(df: pd.DataFrame):
     month2_start = selected_month2.to_timestamp()
     month2_end = (selected_month2 + 1).to_timestamp() - timedelta(days=1)
     
-    df_m1 = df_full[
-        (df_full["Order Placed Date"] >= month1_start) &
-        (df_full["Order Placed Date"] <= month1_end)
+    # Rows without a business line are left out of the hierarchy
+    _df = _df[valid_mask(_df, "missing_business_line")]
+    df_m1 = _df[
+        (_df["Order Placed Date"] >= month1_start) &
+        (_df["Order Placed Date"] <= month1_end)
     ].copy()
     
-    df_m2 = df_full[
-        (df_full["Order Placed Date"] >= month2_start) &
-        (df_full["Order Placed Date"] <= month2_end)
+    df_m2 = _df[
+        (_df["Order Placed Date"] >= month2_start) &
+        (_df["Order Placed Date"] <= month2_end)
     ].copy()
     
     # ══════════════════════════════════════════════════════════
@@ -149,7 +59,7 @@ def render(df: pd.DataFrame):
             
             # Get top 15 customers for this business line (by weighted shipments)
             top_customers = (
-                df_bline.groupby("Customer Name")["Shipment Weight"]
+                df_bline.groupby("Customer Name", observed=True)["Shipment Weight"]
                 .sum()
                 .nlargest(15)
                 .index.tolist()
@@ -181,10 +91,6 @@ def render(df: pd.DataFrame):
     # ══════════════════════════════════════════════════════════
     # Merge data for comparison and create single treemap
     # ══════════════════════════════════════════════════════════
-    # Filter out business lines with "-"
-    df_tree_m1 = df_tree_m1[df_tree_m1["Business Line"] != "-"].copy()
-    df_tree_m2 = df_tree_m2[df_tree_m2["Business Line"] != "-"].copy()
-    
     # Swap naming: Main month is base, Compare Against is for delta
     df_base_merged = df_tree_m1.rename(columns={"Orders": "Orders_Base"})
     df_compare_merged = df_tree_m2.rename(columns={"Orders": "Orders_Compare"})
@@ -217,9 +123,6 @@ def render(df: pd.DataFrame):
     ).round(1)
     
     # Build hover text for customers
-    selected_month1 = st.session_state.hm_main_month
-    selected_month2 = st.session_state.hm_compare_month
-    
     df_comparison["HoverText"] = df_comparison.apply(
         lambda row: (
             f"{selected_month1} (Main): {row['Orders_Base']} orders<br>"
@@ -237,7 +140,173 @@ def render(df: pd.DataFrame):
             f"Change: {int(row['Difference']):+d} orders ({row['Pct_Change']:+.1f}%)"
         )
     df_comparison["BLineHover"] = df_comparison["Business Line"].map(bline_hover_map)
+
+    return {
+        "tree_m1": df_tree_m1,
+        "tree_m2": df_tree_m2,
+        "comparison": df_comparison,
+    }
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    required = ["Order Placed Date", "Customer Name", "Business Line"]
+    if any(col not in df_raw.columns for col in required):
+        return
+    available_months = compute_months(dataset_key, df_raw)
+    if len(available_months) >= 2:
+        compute_treemap(dataset_key, df_raw, available_months[1], available_months[0])
+    movers.get_rollup(dataset_key, "Customer", df_raw)
+
+
+@st.fragment
+def top_movers(df_full: pd.DataFrame):
+    """Top gainers and losers between any two date ranges, by any dimension."""
+    with runstats.timed("heatmap comparison: top movers"):
+        scope = st.session_state.dataset_key
+        presets = movers.period_presets(df_full["Order Placed Date"].max())
+        c1, c2 = st.columns(2)
+        with c1:
+            dimension = st.selectbox("Break down by", movers.available(df_full), key="movers_dimension")
+        with c2:
+            choice = st.selectbox("Compare", [*presets, SELECTED_MONTHS, CUSTOM], key="movers_period")
+
+        if choice == SELECTED_MONTHS:
+            main, other = st.session_state.hm_main_month, st.session_state.hm_compare_month
+            current = (main.to_timestamp(), (main + 1).to_timestamp() - timedelta(days=1))
+            previous = (other.to_timestamp(), (other + 1).to_timestamp() - timedelta(days=1))
+        elif choice == CUSTOM:
+            default_current, default_previous = presets["Month to date vs previous month"]
+            c1, c2 = st.columns(2)
+            with c1:
+                current = st.date_input("Current period", value=tuple(d.date() for d in default_current), key="movers_current")
+            with c2:
+                previous = st.date_input("Previous period", value=tuple(d.date() for d in default_previous), key="movers_previous")
+            if len(current) != 2 or len(previous) != 2:
+                st.info("Pick a start and an end date for both periods.")
+                return
+        else:
+            current, previous = presets[choice]
+
+        comparison = movers.compare(movers.get_rollup(scope, dimension, df_full), current, previous, dimension)
+        movers.render_comparison(comparison, dimension, current, previous, key="movers")
+
+
+def render(df: pd.DataFrame):
+    st.header("🔥 Treemap Comparison")
+
+    # Use full unfiltered data from session state
+    if "df_raw" not in st.session_state or st.session_state.df_raw is None:
+        st.warning("Data not loaded. Please go back and load a file.")
+        return
+    
+    df_full = st.session_state.df_raw
+    scope = st.session_state.dataset_key
     
+    if "Order Placed Date" not in df_full.columns or "Customer Name" not in df_full.columns:
+        st.warning("Missing 'Order Placed Date' or 'Customer Name' columns.")
+        return
+    
+    if "Business Line" not in df_full.columns:
+        st.warning("Missing 'Business Line' column.")
+        return
+
+    # ══════════════════════════════════════════════════════════
+    # Get available months (exclude NaT)
+    # ══════════════════════════════════════════════════════════
+    available_months = compute_months(scope, df_full)
+    
+    if len(available_months) < 2:
+        st.warning("Not enough data to compare. Need at least 2 months.")
+        return
+
+    # ══════════════════════════════════════════════════════════
+    # Month selectors with two columns
+    # ══════════════════════════════════════════════════════════
+    # Initialize session state
+    if "hm_main_month" not in st.session_state:
+        st.session_state.hm_main_month = available_months[1] if len(available_months) > 1 else available_months[0]
+    if "hm_compare_month" not in st.session_state:
+        st.session_state.hm_compare_month = available_months[0]
+    
+    col_left, col_right = st.columns(2)
+    
+    # Month icons - using simple calendar symbols
+    month_icons = ['🟰', '🟱', '🟲', '🟳', '🟴', '🟵', '🟶', '🟷', '🟸', '🟹', '🟺', '🟻']
+    # Alternative set using different colored emojis for better visibility
+    month_names_short = ['J', 'F', 'M', 'A', 'M', 'J', 'J', 'A', 'S', 'O', 'N', 'D']
+    
+    # Group months by year
+    months_by_year = {}
+    for month in available_months:
+        year = month.year
+        if year not in months_by_year:
+            months_by_year[year] = []
+        months_by_year[year].append(month)
+    
+    # Limit to max 3 years
+    all_years = sorted(months_by_year.keys(), reverse=True)
+    years_to_show = all_years[:3]
+    
+    with col_left:
+        st.write("**Compare Against**")
+        for year in sorted(years_to_show, reverse=True):
+            year_months = months_by_year[year]
+            row_text = f"{year}: "
+            for month in sorted(year_months, key=lambda x: x.month):
+                is_selected = st.session_state.hm_compare_month == month
+                icon_char = month_icons[month.month - 1]
+                # Add visual indicator of selection
+                if is_selected:
+                    row_text += f"**{icon_char}** "
+                else:
+                    row_text += f"{icon_char} "
+            
+            # Create compact button row
+            cols = st.columns(len(year_months) + 1)
+            cols[0].write(f"**{year}**")
+            for idx, month in enumerate(sorted(year_months, key=lambda x: x.month), 1):
+                with cols[idx]:
+                    is_selected = st.session_state.hm_compare_month == month
+                    month_letter = month_names_short[month.month - 1]
+                    # Use simple letter with visual indicator
+                    if is_selected:
+                        label = f"[{month_letter}]"
+                    else:
+                        label = month_letter
+                    if st.button(label, key=f"btn_compare_{year}_{month.month}", help=f"{month}"):
+                        st.session_state.hm_compare_month = month
+    
+    with col_right:
+        st.write("**Main Month**")
+        for year in sorted(years_to_show, reverse=True):
+            year_months = months_by_year[year]
+            # Create compact button row
+            cols = st.columns(len(year_months) + 1)
+            cols[0].write(f"**{year}**")
+            for idx, month in enumerate(sorted(year_months, key=lambda x: x.month), 1):
+                with cols[idx]:
+                    is_selected = st.session_state.hm_main_month == month
+                    month_letter = month_names_short[month.month - 1]
+                    # Use simple letter with visual indicator
+                    if is_selected:
+                        label = f"[{month_letter}]"
+                    else:
+                        label = month_letter
+                    if st.button(label, key=f"btn_main_{year}_{month.month}", help=f"{month}"):
+                        st.session_state.hm_main_month = month
+    
+    selected_month1 = st.session_state.hm_main_month
+    selected_month2 = st.session_state.hm_compare_month
+    
+    st.divider()
+    st.write(f"**Comparing: {selected_month1} (Main) vs {selected_month2} (Compare Against)**")
+
+    result = compute_treemap(scope, df_full, selected_month1, selected_month2)
+    df_tree_m1 = result["tree_m1"]
+    df_tree_m2 = result["tree_m2"]
+    df_comparison = result["comparison"]
+
     # ══════════════════════════════════════════════════════════
     # Display single treemap
     # ══════════════════════════════════════════════════════════
@@ -275,6 +344,11 @@ def render(df: pd.DataFrame):
         )
         
         st.plotly_chart(fig, width="stretch")
+        exports.export_menu(
+            df_comparison.drop(columns=["HoverText", "BLineHover", "Size"]),
+            f"treemap_comparison_{selected_month1}_vs_{selected_month2}",
+            key="export_treemap_comparison",
+        )
     else:
         st.info("No data to display for the selected months.")
 
@@ -296,3 +370,13 @@ def render(df: pd.DataFrame):
         change = total_m2 - total_m1
         pct_change = (change / total_m1 * 100) if total_m1 > 0 else 0
         st.metric("Month-over-Month Change", f"{int(change):+d}", f"{pct_change:+.1f}%")
+
+    # ══════════════════════════════════════════════════════════
+    # Top movers: any two periods, any dimension
+    # ══════════════════════════════════════════════════════════
+    st.divider()
+    st.subheader("📈 Top Movers")
+    if movers.available(df_full):
+        top_movers(df_full)
+    else:
+        st.info("No dimension columns available to compare.")
@@ -0,0 +1,122 @@
+import streamlit as st
+import pandas as pd
+from churn import DATE_COL, DEFAULT_FACTOR, MIN_ORDER_DAYS, MIN_SILENCE_DAYS, add_silence, entity_cadence, lost_mask
+import exports
+import grid
+from lanes import get_lane_table
+import runstats
+
+# Entities tracked: label -> columns naming an entity
+ENTITIES = {"Customers": ["Customer Name"], "Lanes": ["Customer Name", "Route"]}
+TABLE_COLUMNS = [
+    "Volume", "Shipments", "Order Days", "First Order", "Last Order", "Cadence (days)", "Days Silent", "Overdue ×",
+]
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_cadence(scope: str, _df: pd.DataFrame, entity: str) -> pd.DataFrame:
+    """Order cadence and silence of every customer or lane of the full dataset, cached per ``scope``.
+
+    Silence is measured up to the dataset's last order date, so an older
+    export does not make every entity look lost.
+    """
+    weights = _df["Shipment Weight"].to_numpy()
+    dates = _df[DATE_COL].to_numpy()
+    if entity == "Customers":
+        codes, names = pd.factorize(_df["Customer Name"], sort=True)
+        table = entity_cadence(codes, dates, weights, len(names))
+        table.insert(0, "Customer Name", pd.Index(names).astype(str))
+    else:
+        lanes = get_lane_table(scope, _df)
+        codes = _df["Lane ID"].to_numpy()
+        table = entity_cadence(codes, dates, weights, int(lanes.index.max()) + 1 if len(lanes) else 0)
+        table = lanes[["Customer Name", "Route"]].join(table)
+    table = table[table["Order Days"] > 0].reset_index(drop=True)
+    return add_silence(table, _df[DATE_COL].max())
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    if DATE_COL not in df_raw.columns or "Customer Name" not in df_raw.columns:
+        return
+    compute_cadence(dataset_key, df_raw, "Customers")
+    if "Lane ID" in df_raw.columns:
+        compute_cadence(dataset_key, df_raw, "Lanes")
+
+
+@st.fragment
+def lost_business(df_full: pd.DataFrame):
+    """Flagged customers or lanes, ranked by historic volume; the widgets rerun only this fragment."""
+    with runstats.timed("lost business: flagged"):
+        scope = st.session_state.dataset_key
+        entities = [name for name in ENTITIES if name == "Customers" or "Lane ID" in df_full.columns]
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c1:
+            entity = st.radio("Track", entities, horizontal=True, key="lost_entity")
+        with c2:
+            factor = st.slider(
+                "Flag when silent for more than × the usual gap between orders",
+                min_value=1.0, max_value=6.0, value=DEFAULT_FACTOR, step=0.5, key="lost_factor",
+            )
+        with c3:
+            min_orders = st.number_input("Minimum order days", min_value=2, value=MIN_ORDER_DAYS, step=1, key="lost_min_orders")
+
+        table = compute_cadence(scope, df_full, entity)
+        lost = lost_mask(table, factor, min_orders)
+        flagged = table[lost].sort_values("Volume", ascending=False, kind="stable")
+        as_of = df_full[DATE_COL].max()
+
+        total_volume = table["Volume"].sum()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric(f"Flagged {entity}", f"{len(flagged):,} of {len(table):,}")
+        c2.metric("Historic Volume Flagged", f"{flagged['Volume'].sum():,.1f}")
+        c3.metric("Share of Historic Volume", f"{flagged['Volume'].sum() / total_volume * 100:.1f}%" if total_volume else "-")
+        c4.metric("Silence Measured To", f"{as_of:%d-%b-%Y}")
+        st.caption(
+            f"The usual gap is the median number of days between an entity's order days. "
+            f"Flagged: at least {min_orders} order days, silent for at least {MIN_SILENCE_DAYS} days and "
+            f"for more than {factor:g} × the usual gap since the last order. Ranked by weighted "
+            "shipments over the whole history; the sidebar filters do not apply."
+        )
+        if flagged.empty:
+            st.success(f"No {entity.lower()} are overdue by more than {factor:g} × their usual gap.")
+            return
+
+        column_config = {
+            "First Order": st.column_config.DateColumn(format="DD-MMM-YYYY"),
+            "Last Order": st.column_config.DateColumn(format="DD-MMM-YYYY"),
+            "Volume": st.column_config.NumberColumn(format="%.1f"),
+            "Cadence (days)": st.column_config.NumberColumn(format="%.1f"),
+            "Overdue ×": st.column_config.NumberColumn(format="%.1f×"),
+        }
+        columns = ENTITIES[entity] + TABLE_COLUMNS
+        if entity == "Customers" and "Lane ID" in df_full.columns:
+            # A flagged customer's lanes are shown when its row is selected
+            lanes = compute_cadence(scope, df_full, "Lanes")
+            lanes = lanes[lanes["Customer Name"].isin(flagged["Customer Name"])].sort_values("Volume", ascending=False)
+            lanes.insert(2, "Lost", lost_mask(lanes, factor, min_orders))
+            grid.grouped_grid(
+                flagged[columns], "lost_customers", details=lanes[["Customer Name", "Route", "Lost"] + TABLE_COLUMNS],
+                group_col="Customer Name", sort_by="Volume", noun="customers", detail_noun="lanes",
+                column_config=column_config,
+            )
+        else:
+            grid.grouped_grid(flagged[columns], f"lost_{entity.lower()}", sort_by="Volume", noun=entity.lower(),
+                              column_config=column_config)
+        exports.export_menu(flagged, f"lost_{entity.lower()}", key=f"export_lost_{entity.lower()}")
+
+
+def render(df: pd.DataFrame):
+    st.header("📉 Lost Business")
+
+    # Use full unfiltered data from session state, like the New Business pages
+    if "df_raw" not in st.session_state or st.session_state.df_raw is None:
+        st.warning("Data not loaded. Please go back and load a file.")
+        return
+
+    df_full = st.session_state.df_raw
+    if DATE_COL not in df_full.columns or "Customer Name" not in df_full.columns:
+        st.warning("Missing 'Order Placed Date' or 'Customer Name' columns.")
+        return
+
+    lost_business(df_full)
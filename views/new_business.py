@@ -1,7 +1,179 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import timedelta
 from data_loader import count_weighted_shipments
+import exports
+import grid
+from lanes import get_lane_table
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_months(scope: str, _df: pd.DataFrame) -> list:
+    """Sorted order months of the full dataset, cached per ``scope``."""
+    return sorted(_df["Order Placed Date"].dt.to_period("M").unique())
+
+
+def _window_totals(rows: pd.DataFrame, key: str, window_days: int) -> pd.Series:
+    """Weighted orders per ``key`` within ``window_days`` of its first order."""
+    first = rows.groupby(key, observed=True)["Order Placed Date"].transform("min")
+    in_window = rows["Order Placed Date"].between(first, first + timedelta(days=window_days))
+    return rows["Shipment Weight"].where(in_window, 0).groupby(rows[key], observed=True).sum()
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_new_business(scope: str, _df: pd.DataFrame, period_start, period_end, window_days: int) -> dict:
+    """New customers and new lanes whose first order falls in a period.
+
+    Returns ``{"customers": frame, "lanes": frame or None, "lane_groups":
+    frame or None}`` with each entity's first order date and its weighted
+    orders in the first ``window_days`` days; ``lane_groups`` sums the new
+    lanes per customer. The lane frames are None without lane columns.
+    Cached per ``scope`` (the dataset key, since these pages ignore sidebar
+    filters).
+    """
+    df = _df
+    window_col = f"Orders (First {window_days} Days)"
+
+    # Get first order date for each customer (across ALL data)
+    customer_first_order = (
+        df.groupby("Customer Name", observed=True)["Order Placed Date"]
+        .min()
+        .reset_index()
+    )
+    customer_first_order.columns = ["Customer Name", "First Order Date"]
+
+    # Filter to customers whose first order was in the selected period
+    new_customers = customer_first_order[
+        (customer_first_order["First Order Date"] >= period_start) &
+        (customer_first_order["First Order Date"] <= period_end)
+    ].sort_values("First Order Date", ascending=False)
+
+    # Calculate orders in the first days from first order (one grouped pass)
+    cust_rows = df[df["Customer Name"].isin(new_customers["Customer Name"])]
+    new_customers[window_col] = (
+        _window_totals(cust_rows, "Customer Name", window_days)
+        .reindex(new_customers["Customer Name"])
+        .to_numpy()
+    )
+
+    if "Lane ID" not in df.columns:
+        return {"customers": new_customers, "lanes": None, "lane_groups": None}
+
+    # Lanes are interned integer ids; labels come from the lane table
+    lanes = get_lane_table(scope, df)
+
+    # Get first order date for each lane
+    lane_first_order = df.groupby("Lane ID")["Order Placed Date"].min()
+
+    # Filter to lanes with first order in selected period
+    is_new_lane = (lane_first_order >= period_start) & (lane_first_order <= period_end)
+    new_lanes = lanes.loc[lane_first_order.index[is_new_lane], ["Customer Name", "Route"]].copy()
+    new_lanes["First Order Date"] = lane_first_order[is_new_lane]
+
+    # Mark which lanes belong to new customers
+    new_lanes["Is New Customer"] = new_lanes["Customer Name"].isin(set(new_customers["Customer Name"].tolist()))
+
+    # Calculate orders in the first days per lane
+    lane_rows = df[df["Lane ID"].isin(new_lanes.index)]
+    new_lanes[window_col] = _window_totals(lane_rows, "Lane ID", window_days)
+    new_lanes = new_lanes.sort_values("First Order Date", ascending=False)
+    return {"customers": new_customers, "lanes": new_lanes, "lane_groups": _lane_groups(new_lanes, window_col)}
+
+
+def _lane_groups(new_lanes: pd.DataFrame, window_col: str) -> pd.DataFrame:
+    """One row per customer with new lanes: status, lane count, orders and latest first order."""
+    groups = new_lanes.groupby("Customer Name", observed=True, sort=False).agg(
+        is_new=("Is New Customer", "first"),
+        lanes=("Route", "size"),
+        orders=(window_col, "sum"),
+        latest=("First Order Date", "max"),
+    )
+    return pd.DataFrame({
+        "Customer Name": groups.index.astype(str),
+        "Status": np.where(groups["is_new"], "🆕 NEW", "➕ EXISTING"),
+        "New Lanes": groups["lanes"].to_numpy(),
+        window_col: groups["orders"].to_numpy(),
+        "Latest First Order": groups["latest"].to_numpy(),
+    })
+
+
+def _month_bounds(month: pd.Period) -> tuple:
+    """First and last day of a month."""
+    return month.to_timestamp(), (month + 1).to_timestamp() - timedelta(days=1)
+
+
+def _default_month_index(months_reversed: list) -> int:
+    """Index of the current month, or 0 (most recent) if it has no data."""
+    try:
+        return months_reversed.index(pd.Timestamp.now().to_period("M"))
+    except ValueError:
+        return 0
+
+
+def render_results(result: dict, period, window_days: int, key: str):
+    """New customers and new lanes of ``period`` as paged grids (lanes grouped by customer).
+
+    ``key`` ("month" or "week") keeps the widgets of the two pages apart.
+    """
+    window_col = f"Orders (First {window_days} Days)"
+    dates = {
+        col: st.column_config.DateColumn(format="DD-MMM-YYYY") for col in ["First Order Date", "Latest First Order"]
+    }
+    orders = {window_col: st.column_config.NumberColumn(format="%.1f")}
+
+    # ══════════════════════════════════════════════════════════
+    # 1. NEW CUSTOMERS with orders in their first days
+    # ══════════════════════════════════════════════════════════
+    st.subheader(f"🆕 New Customers — {period}")
+
+    new_customers = result["customers"]
+    if len(new_customers) > 0:
+        grid.grouped_grid(
+            new_customers[["Customer Name", "First Order Date", window_col]], f"new_customers_{key}",
+            sort_by="First Order Date", noun="customers", column_config={**dates, **orders},
+        )
+        st.caption(f"**{len(new_customers)}** new customers in {period}")
+    else:
+        st.info(f"No new customers in {period}.")
+
+    st.divider()
+
+    # ══════════════════════════════════════════════════════════
+    # 2. NEW BUSINESS LANES (grouped by customer, expandable)
+    # ══════════════════════════════════════════════════════════
+    st.subheader(f"🆕 New Business Lanes — {period}")
+
+    new_lanes = result["lanes"]
+    if new_lanes is None:
+        st.warning("Missing 'Load City' or 'Unload City' columns.")
+        return
+    if len(new_lanes) == 0:
+        st.info(f"No new business lanes in {period}.")
+        return
+
+    # One grid of customers; a customer's lanes are shown when its row is selected
+    grid.grouped_grid(
+        result["lane_groups"], f"new_lanes_{key}",
+        details=new_lanes[["Customer Name", "Route", "First Order Date", window_col]],
+        group_col="Customer Name", sort_by=window_col, noun="customers", detail_noun="new lanes",
+        column_config={**dates, **orders},
+    )
+    total_new_lanes = len(new_lanes)
+    new_customer_lanes = int(new_lanes["Is New Customer"].sum())
+    existing_customer_lanes = total_new_lanes - new_customer_lanes
+    st.caption(f"**{total_new_lanes}** total new lanes | **{new_customer_lanes}** from new customers | **{existing_customer_lanes}** from existing customers")
+    exports.export_menu(new_lanes.reset_index(drop=True), f"new_lanes_{period}", key=f"export_new_lanes_{key}")
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    if "Order Placed Date" not in df_raw.columns or "Customer Name" not in df_raw.columns:
+        return
+    months_reversed = list(reversed(compute_months(dataset_key, df_raw)))
+    if months_reversed:
+        month = months_reversed[_default_month_index(months_reversed)]
+        compute_new_business(dataset_key, df_raw, *_month_bounds(month), 30)
 
 
 def render(df: pd.DataFrame):
@@ -12,7 +184,8 @@ def render(df: pd.DataFrame):
         st.warning("Data not loaded. Please go back and load a file.")
         return
     
-    df_full = st.session_state.df_raw.copy()
+    df_full = st.session_state.df_raw
+    scope = st.session_state.dataset_key
     
     if "Order Placed Date" not in df_full.columns or "Customer Name" not in df_full.columns:
         st.warning("Missing 'Order Placed Date' or 'Customer Name' columns.")
@@ -21,24 +194,15 @@ def render(df: pd.DataFrame):
     # ══════════════════════════════════════════════════════════
     # Month selector
     # ══════════════════════════════════════════════════════════
-    df_copy = df_full.copy()
-    df_copy["YearMonth"] = df_copy["Order Placed Date"].dt.to_period("M")
-    available_months = sorted(df_copy["YearMonth"].unique())
+    available_months = compute_months(scope, df_full)
     
     col1, col2 = st.columns([2, 1])
     with col2:
-        # Get current month
-        today = pd.Timestamp.now()
-        current_month = today.to_period("M")
-        
         # Reverse months so most recent is first
         months_reversed = list(reversed(available_months))
         
-        # Find index of current month, default to 0 (most recent) if not found
-        try:
-            default_index = months_reversed.index(current_month)
-        except ValueError:
-            default_index = 0
+        # Default to the current month, or the most recent one if it has no data
+        default_index = _default_month_index(months_reversed)
         
         selected_month = st.selectbox(
             "Select Month",
@@ -52,140 +216,6 @@ def render(df: pd.DataFrame):
         st.warning("No data available for the selected month.")
         return
 
-    # Get first order date for each customer (across ALL data)
-    customer_first_order = (
-        df_copy.groupby("Customer Name")["Order Placed Date"]
-        .min()
-        .reset_index()
-    )
-    customer_first_order.columns = ["Customer Name", "First Order Date"]
-
-    # Filter to customers whose first order was in the selected month
-    selected_month_start = selected_month.to_timestamp()
-    selected_month_end = (selected_month + 1).to_timestamp() - timedelta(days=1)
-    
-    new_customers_in_month = customer_first_order[
-        (customer_first_order["First Order Date"] >= selected_month_start) &
-        (customer_first_order["First Order Date"] <= selected_month_end)
-    ].copy()
-
-    # ══════════════════════════════════════════════════════════
-    # 1. NEW CUSTOMERS with first-month orders (30 days from first order)
-    # ══════════════════════════════════════════════════════════
-    st.subheader(f"🆕 New Customers — {selected_month}")
-
-    if len(new_customers_in_month) > 0:
-        new_customers_display = new_customers_in_month.sort_values("First Order Date", ascending=False).copy()
-        
-        # Calculate orders in first 30 days from first order
-        first_month_orders = []
-        for _, row in new_customers_display.iterrows():
-            cust = row["Customer Name"]
-            first_date = row["First Order Date"]
-            cutoff = first_date + timedelta(days=30)
-            orders_count = df_copy[
-                (df_copy["Customer Name"] == cust) &
-                (df_copy["Order Placed Date"] >= first_date) &
-                (df_copy["Order Placed Date"] <= cutoff)
-            ]["Shipment Weight"].sum()
-            first_month_orders.append(orders_count)
-        
-        new_customers_display["Orders (First 30 Days)"] = first_month_orders
-        new_customers_display["First Order Date"] = new_customers_display["First Order Date"].dt.strftime("%d-%b-%Y")
-        
-        display_cols = ["Customer Name", "First Order Date", "Orders (First 30 Days)"]
-        st.dataframe(new_customers_display[display_cols], use_container_width=True, hide_index=True)
-        st.caption(f"**{len(new_customers_display)}** new customers in {selected_month}")
-    else:
-        st.info(f"No new customers in {selected_month}.")
-
-    st.divider()
-
-    # ══════════════════════════════════════════════════════════
-    # 2. NEW BUSINESS LANES (clustered by customer, expandable)
-    # ══════════════════════════════════════════════════════════
-    st.subheader(f"🆕 New Business Lanes — {selected_month}")
-
-    if "Load City" in df_copy.columns and "Unload City" in df_copy.columns:
-        # Create lane identifier
-        df_lanes = df_copy.copy()
-        df_lanes["Lane"] = (
-            df_lanes["Customer Name"].fillna("") + " | " +
-            df_lanes["Load City"].fillna("") + " → " +
-            df_lanes["Unload City"].fillna("")
-        )
-
-        # Get first order date for each lane
-        lane_first_order = (
-            df_lanes.groupby("Lane")["Order Placed Date"]
-            .min()
-            .reset_index()
-        )
-        lane_first_order.columns = ["Lane", "First Order Date"]
-
-        # Filter to lanes with first order in selected month
-        new_lanes = lane_first_order[
-            (lane_first_order["First Order Date"] >= selected_month_start) &
-            (lane_first_order["First Order Date"] <= selected_month_end)
-        ].copy()
-
-        if len(new_lanes) > 0:
-            # Extract customer name from lane
-            new_lanes["Customer Name"] = new_lanes["Lane"].str.split(r" \| ").str[0]
-            
-            # Mark which lanes belong to new customers
-            new_customer_names = set(new_customers_in_month["Customer Name"].tolist()) if len(new_customers_in_month) > 0 else set()
-            new_lanes["Is New Customer"] = new_lanes["Customer Name"].isin(new_customer_names)
-            
-            # Calculate orders in first 30 days per lane
-            lane_first_month_orders = []
-            for _, row in new_lanes.iterrows():
-                lane = row["Lane"]
-                first_date = row["First Order Date"]
-                cutoff = first_date + timedelta(days=30)
-                orders_count = df_lanes[
-                    (df_lanes["Lane"] == lane) &
-                    (df_lanes["Order Placed Date"] >= first_date) &
-                    (df_lanes["Order Placed Date"] <= cutoff)
-                ]["Shipment Weight"].sum()
-                lane_first_month_orders.append(orders_count)
-            
-            new_lanes["Orders (First 30 Days)"] = lane_first_month_orders
-            
-            # Group by customer and display with collapsible sections
-            # Calculate total orders per customer for sorting
-            customer_totals = new_lanes.groupby("Customer Name")["Orders (First 30 Days)"].sum().sort_values(ascending=False)
-            customers_with_lanes = customer_totals.index.tolist()
-            total_new_lanes = len(new_lanes)
-            new_customer_lanes = len(new_lanes[new_lanes["Is New Customer"]])
-            existing_customer_lanes = total_new_lanes - new_customer_lanes
-            
-            for cust in customers_with_lanes:
-                cust_lanes = new_lanes[new_lanes["Customer Name"] == cust].sort_values("First Order Date", ascending=False)
-                total_lane_orders = cust_lanes["Orders (First 30 Days)"].sum()
-                is_new = cust_lanes["Is New Customer"].iloc[0]
-                badge = "🆕 NEW" if is_new else "➕ EXISTING"
-                
-                with st.expander(f"📦 **{cust}** {badge} — {len(cust_lanes)} lane(s), {total_lane_orders:.1f} order(s)"):
-                    # Build table for lanes under this customer
-                    lanes_table = []
-                    for _, lane_row in cust_lanes.iterrows():
-                        lane_parts = lane_row["Lane"].split(" | ")
-                        if len(lane_parts) >= 2:
-                            route = lane_parts[1]
-                        else:
-                            route = ""
-                        lanes_table.append({
-                            "Route": route,
-                            "First Order Date": lane_row["First Order Date"].strftime("%d-%b-%Y"),
-                            "Orders (First 30 Days)": lane_row["Orders (First 30 Days)"]
-                        })
-                    
-                    lanes_df = pd.DataFrame(lanes_table)
-                    st.dataframe(lanes_df, use_container_width=True, hide_index=True)
-            
-            st.caption(f"**{total_new_lanes}** total new lanes | **{new_customer_lanes}** from new customers | **{existing_customer_lanes}** from existing customers")
-        else:
-            st.info(f"No new business lanes in {selected_month}.")
-    else:
-        st.warning("Missing 'Load City' or 'Unload City' columns.")
+    selected_month_start, selected_month_end = _month_bounds(selected_month)
+    result = compute_new_business(scope, df_full, selected_month_start, selected_month_end, 30)
+    render_results(result, selected_month, 30, "month")
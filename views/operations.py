@@ -1,55 +1,293 @@
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
+from backhaul import DEFAULT_WINDOW_HOURS, MATCH_LEVELS, match_backhauls, savings_by
+from capacity import GROUPINGS, UNDERFILL_PCT, fill_bands, fill_summary, get_fill_index
 from data_loader import count_weighted_shipments
+from dimensions import get_catalog
+from quality import valid_mask
+from sketches import get_cube
+import exports
+import runstats
+
+# Rows listed in the backhaul tables
+BACKHAUL_ROWS = 20
+# Groups charted in the fill-ratio bands
+FILL_CHART_GROUPS = 20
+# Fill ratios offered in the capacity section: label -> column
+FILL_RATIOS = {"Binding (max of both)": "Fill %", "Volumetric": "Volume Fill %", "Weight": "Weight Fill %"}
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_operations(scope: str, _df: pd.DataFrame) -> dict:
+    """KM metrics, distribution values and breakdown tables, cached per ``scope``."""
+    df = _df
+    result = {"km": None, "modality": None, "carriers": None, "legal_entity": None}
+
+    if all(c in df.columns for c in ["Full KM", "Empty KM", "Total KM"]):
+        km_data = df[["Full KM", "Empty KM", "Total KM"]].dropna()
+        result["km"] = {
+            "rows": len(km_data),
+            "avg_full": km_data["Full KM"].mean(),
+            "avg_empty": km_data["Empty KM"].mean(),
+            "utilization": km_data["Full KM"].sum() / km_data["Total KM"].replace(0, pd.NA).sum() * 100,
+        }
+
+    if "Modality" in df.columns:
+        mod = df.groupby("Modality", observed=True)["Shipment Weight"].sum().reset_index()
+        mod.columns = ["Modality", "Count"]
+        result["modality"] = mod
+
+    if "Carrier" in df.columns:
+        carriers_df = df[valid_mask(df, "missing_carrier")]
+        carr = carriers_df.groupby("Carrier", observed=True)["Shipment Weight"].sum().nlargest(10).reset_index()
+        carr.columns = ["Carrier", "Shipments"]
+        result["carriers"] = carr
+
+    if "Legal Entity" in df.columns:
+        le = df.groupby("Legal Entity", observed=True)["Shipment Weight"].sum().reset_index()
+        le.columns = ["Legal Entity", "Count"]
+        result["legal_entity"] = le
+
+    return result
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_backhauls(scope: str, _df: pd.DataFrame, level: str, window_hours: int):
+    """Backhaul pairs and savings per lane and carrier, cached per ``scope``."""
+    result = match_backhauls(_df, level, window_hours)
+    if result is not None:
+        result["by_lane"] = savings_by(result["pairs"], ["Lane", "Carrier"])
+        result["by_carrier"] = savings_by(result["pairs"], "Carrier")
+    return result
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_capacity(scope: str, _df: pd.DataFrame, _df_raw: pd.DataFrame, dataset_key: str,
+                     grouping: str, column: str) -> dict:
+    """Fill-ratio summary and percentile bands per ``grouping``, cached per ``scope``.
+
+    Rolled up from the dataset's precomputed fill index over the view's rows.
+    """
+    index = get_fill_index(dataset_key, _df_raw)
+    if column not in index.bins or grouping not in index.groups:
+        return None
+    rows = _df_raw.index.get_indexer(_df.index)
+    return {"summary": fill_summary(index, rows), "bands": fill_bands(index, rows, grouping, column)}
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    compute_operations(view_key, df)
+    compute_backhauls(view_key, df, "City", DEFAULT_WINDOW_HOURS)
+    compute_capacity(view_key, df, df_raw, dataset_key, next(iter(GROUPINGS)), "Fill %")
+    get_cube(dataset_key, df_raw, get_catalog(dataset_key, df_raw))
+
+
+def _histogram_figure(values: pd.Series, hist, nbins: int, title: str):
+    """Distribution chart: raw ``values`` (exact mode) or the sketch ``hist``."""
+    if values is not None:
+        fig = px.histogram(values, nbins=nbins, labels={"value": title})
+    else:
+        bars = hist.bars(nbins)
+        fig = px.bar(bars, x="Mid", y="Count", hover_data={"Start": True, "End": True, "Mid": False})
+        fig.update_traces(width=bars["Width"], marker_line_width=0)
+    fig.update_layout(
+        xaxis_title=title,
+        yaxis_title="# Shipments",
+        showlegend=False,
+        margin=dict(t=20, b=20),
+    )
+    return fig
+
+
+@st.fragment
+def distributions(df: pd.DataFrame, show_utilization: bool):
+    """KM utilization and weight histograms; the exact-mode switch reruns only this fragment.
+
+    By default the histograms are merged from the dataset's per-leaf
+    sketches (month × business line × customer) whenever the filters
+    select whole leaves, and binned on the same fixed grid otherwise, so
+    the chart size does not depend on the number of rows. Exact mode bins
+    the raw values instead.
+    """
+    with runstats.timed("operations: distributions"):
+        dataset_key = st.session_state.dataset_key
+        df_raw = st.session_state.df_raw
+        catalog = get_catalog(dataset_key, df_raw)
+        cube = get_cube(dataset_key, df_raw, catalog)
+        date_range, selections = st.session_state.view_filters
+        leaves = cube.select(catalog, selections, date_range)
+
+        exact = st.toggle(
+            "Exact distributions",
+            key="operations_exact",
+            help="Bin the raw values of every shipment instead of the precomputed sketches.",
+        )
+
+        if show_utilization and "KM Utilization %" in cube.edges:
+            hist = cube.view_histogram("KM Utilization %", df, leaves)
+            if hist.total > 0:
+                values = None
+                if exact:
+                    values = df.loc[valid_mask(df, "km_utilization"), "KM Utilization %"].dropna()
+                st.plotly_chart(_histogram_figure(values, hist, 20, "KM Utilization %"), width='stretch')
+
+        st.divider()
+
+        if "Weight" in cube.edges:
+            st.subheader("Weight Distribution")
+            hist = cube.view_histogram("Weight", df, leaves)
+            if hist.total > 0:
+                values = df["Weight"].dropna() if exact else None
+                st.plotly_chart(_histogram_figure(values, hist, 30, "Weight"), width='stretch')
+                if not exact:
+                    st.caption(
+                        f"{'Merged from per-leaf sketches' if leaves is not None else 'Binned from the filtered rows'}; "
+                        f"values resolved to {hist.error_bound:,.1f}."
+                    )
+
+
+@st.fragment
+def backhauls(df: pd.DataFrame):
+    """Backhaul matching; the level and window widgets rerun only this fragment."""
+    with runstats.timed("operations: backhauls"):
+        st.subheader("Backhaul Matching")
+        c1, c2 = st.columns([1, 2])
+        with c1:
+            level = st.radio("Match follow-on loads by", list(MATCH_LEVELS), horizontal=True, key="backhaul_level")
+        with c2:
+            window = st.slider("Window after unload (hours)", 0, 168, DEFAULT_WINDOW_HOURS, step=6, key="backhaul_window")
+        result = compute_backhauls(st.session_state.view_key, df, level, window)
+        if result is None:
+            st.info("Load / unload dates and locations are needed for backhaul matching.")
+            return
+
+        pairs = result["pairs"]
+        saved = pairs["Empty KM Saved"].sum()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Shipments with Candidates", f"{result['with_candidates']:,}",
+                  help=f"Of {result['shipments']:,} shipments; {result['candidates']:,} candidates in total.")
+        c2.metric("Matched Pairs", f"{len(pairs):,}")
+        c3.metric("Empty KM Saved (est.)", f"{saved:,.0f}")
+        c4.metric("Share of Empty KM", f"{saved / result['empty_km'] * 100:.1f}%" if result["empty_km"] else "–")
+        st.caption(
+            f"Each shipment is paired with the earliest free shipment loading in its unload {level.lower()} "
+            f"within {window} h after Unload Date Till (cancelled shipments excluded). "
+            "The saving of a pair is the smaller of the two shipments' Empty KM."
+        )
+        if pairs.empty:
+            return
+
+        col_left, col_right = st.columns(2)
+        with col_left:
+            st.markdown("**Empty KM Saved by Lane and Carrier**")
+            st.dataframe(result["by_lane"].head(BACKHAUL_ROWS), width='stretch', hide_index=True)
+        with col_right:
+            st.markdown("**Empty KM Saved by Carrier**")
+            by_carrier = result["by_carrier"].head(BACKHAUL_ROWS)
+            fig = px.bar(by_carrier, x="Empty KM Saved", y="Carrier", orientation="h", hover_data=["Pairs"])
+            fig.update_layout(yaxis=dict(autorange="reversed"), margin=dict(t=20, b=20, l=120))
+            st.plotly_chart(fig, width='stretch')
+
+        st.markdown("**Matched Pairs**")
+        st.dataframe(pairs.nlargest(BACKHAUL_ROWS, "Empty KM Saved"), width='stretch', hide_index=True)
+        exports.export_menu(pairs, "backhaul_pairs", key="export_backhaul_pairs", label=f"⬇️ Export all {len(pairs):,} pairs")
+
+
+def _bands_figure(bands: pd.DataFrame, grouping: str, title: str):
+    """P10–P90 bar per group with a P50 marker and the underfill threshold."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=bands[grouping], x=bands["P90"] - bands["P10"], base=bands["P10"], orientation="h",
+        name="P10 – P90", marker_color="rgba(46, 134, 193, 0.35)",
+        customdata=bands[["P10", "P90", "Shipments"]].to_numpy(),
+        hovertemplate="<b>%{y}</b><br>P10 – P90: %{customdata[0]:.1f} – %{customdata[1]:.1f}%<br>Shipments: %{customdata[2]:,}<extra></extra>",
+    ))
+    fig.add_trace(go.Scatter(
+        y=bands[grouping], x=bands["P50"], mode="markers", name="Median",
+        marker=dict(color="#404040", size=9, symbol="line-ns", line=dict(width=3, color="#404040")),
+        hovertemplate="<b>%{y}</b><br>Median: %{x:.1f}%<extra></extra>",
+    ))
+    fig.add_vline(x=UNDERFILL_PCT, line_dash="dash", line_color="#E3000F",
+                  annotation_text=f"{UNDERFILL_PCT:g}%", annotation_position="top")
+    fig.update_layout(
+        xaxis_title=title, yaxis=dict(autorange="reversed", type="category"),
+        margin=dict(t=30, b=20, l=150), height=max(300, 28 * len(bands) + 80),
+    )
+    return fig
+
+
+@st.fragment
+def capacity(df: pd.DataFrame):
+    """Tank-container fill ratios; the grouping and ratio widgets rerun only this fragment."""
+    with runstats.timed("operations: capacity"):
+        st.subheader("Tank Container Fill")
+        c1, c2 = st.columns(2)
+        with c1:
+            grouping = st.radio("Group by", list(GROUPINGS), horizontal=True, key="capacity_grouping")
+        with c2:
+            ratio = st.radio("Fill ratio", list(FILL_RATIOS), horizontal=True, key="capacity_ratio")
+        result = compute_capacity(
+            st.session_state.view_key, df, st.session_state.df_raw, st.session_state.dataset_key,
+            grouping, FILL_RATIOS[ratio],
+        )
+        if result is None:
+            st.info("TC Total Capacity, Weight or the grouping columns are not available.")
+            return
+
+        summary = result["summary"]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Median Fill", f"{summary['Fill %']['median']:.1f}%", help="Larger of the volumetric and weight fill.")
+        c2.metric("Median Volumetric Fill", f"{summary['Volume Fill %']['median']:.1f}%")
+        c3.metric("Median Weight Fill", f"{summary['Weight Fill %']['median']:.1f}%")
+        c4.metric(f"Underfilled (< {UNDERFILL_PCT:g}%)", f"{summary['Fill %']['underfilled']:.1f}%",
+                  help=f"Share of {summary['Fill %']['rows']:,} containers below {UNDERFILL_PCT:g}% on both volume and weight.")
+        st.caption(
+            "Volumetric fill: TC Volume (or Weight ÷ specific gravity) of TC Total Capacity. "
+            "Weight fill: Weight of the most the tank can carry of the product (capacity × specific gravity, "
+            "capped at the maximum payload). Percentiles are resolved to 0.5%."
+        )
+
+        bands = result["bands"]
+        if bands.empty:
+            return
+        shown = bands.head(FILL_CHART_GROUPS)
+        st.plotly_chart(_bands_figure(shown, grouping, f"{ratio} fill (%)"), width='stretch')
+        st.dataframe(bands, width='stretch', hide_index=True)
+        exports.export_menu(bands, f"fill_by_{grouping.lower()}", key="export_capacity_bands")
 
 
 def render(df: pd.DataFrame):
     st.header("⚙️ Operations")
 
+    result = compute_operations(st.session_state.view_key, df)
+
     # ── KM Utilization ───────────────────────────────────────
     st.subheader("KM Utilization")
-    has_km = all(c in df.columns for c in ["Full KM", "Empty KM", "Total KM"])
-    if has_km:
-        km_data = df[["Full KM", "Empty KM", "Total KM"]].dropna()
-        if len(km_data) > 0:
+    km = result["km"]
+    if km is not None:
+        if km["rows"] > 0:
             c1, c2, c3 = st.columns(3)
-            c1.metric("Avg Full KM", f"{km_data['Full KM'].mean():,.0f}")
-            c2.metric("Avg Empty KM", f"{km_data['Empty KM'].mean():,.0f}")
-            avg_util = km_data["Full KM"].sum() / km_data["Total KM"].replace(0, pd.NA).sum() * 100
-            c3.metric("Overall Utilization", f"{avg_util:.1f}%")
-
-            # Distribution
-            if "KM Utilization %" in df.columns:
-                util = df["KM Utilization %"].dropna()
-                util = util[(util >= 0) & (util <= 100)]
-                if len(util) > 0:
-                    fig = px.histogram(util, nbins=20, labels={"value": "Utilization %"})
-                    fig.update_layout(
-                        xaxis_title="KM Utilization %",
-                        yaxis_title="# Shipments",
-                        showlegend=False,
-                        margin=dict(t=20, b=20),
-                    )
-                    st.plotly_chart(fig, width='stretch')
+            c1.metric("Avg Full KM", f"{km['avg_full']:,.0f}")
+            c2.metric("Avg Empty KM", f"{km['avg_empty']:,.0f}")
+            c3.metric("Overall Utilization", f"{km['utilization']:.1f}%")
     else:
         st.info("KM data not available.")
 
+    # ── KM utilization and weight distributions ───────────────
+    distributions(df, km is not None and km["rows"] > 0)
+
     st.divider()
 
-    # ── Weight distribution ──────────────────────────────────
-    if "Weight" in df.columns:
-        st.subheader("Weight Distribution")
-        w = df["Weight"].dropna()
-        if len(w) > 0:
-            fig = px.histogram(w, nbins=30, labels={"value": "Weight"})
-            fig.update_layout(
-                xaxis_title="Weight",
-                yaxis_title="# Shipments",
-                showlegend=False,
-                margin=dict(t=20, b=20),
-            )
-            st.plotly_chart(fig, width='stretch')
+    # ── Backhaul matching ─────────────────────────────────────
+    backhauls(df)
+
+    st.divider()
+
+    # ── Tank container fill ratios ────────────────────────────
+    capacity(df)
 
     st.divider()
 
@@ -57,21 +295,18 @@ def render(df: pd.DataFrame):
     col_left, col_right = st.columns(2)
 
     with col_left:
-        if "Modality" in df.columns:
+        if result["modality"] is not None:
             st.subheader("Modality")
-            mod = df.groupby("Modality")["Shipment Weight"].sum().reset_index()
-            mod.columns = ["Modality", "Count"]
+            mod = result["modality"]
             fig = px.pie(mod, names="Modality", values="Count", hole=0.4)
             fig.update_layout(margin=dict(t=20, b=20))
             st.plotly_chart(fig, width='stretch')
 
     with col_right:
-        if "Carrier" in df.columns:
+        if result["carriers"] is not None:
             st.subheader("Top 10 Carriers")
-            carriers_df = df[df["Carrier"].notna() & (df["Carrier"] != "-")].copy()
-            if len(carriers_df) > 0:
-                carr = carriers_df.groupby("Carrier")["Shipment Weight"].sum().nlargest(10).reset_index()
-                carr.columns = ["Carrier", "Shipments"]
+            carr = result["carriers"]
+            if len(carr) > 0:
                 fig = px.bar(carr, x="Shipments", y="Carrier", orientation="h", text_auto=True)
                 fig.update_layout(
                     yaxis=dict(autorange="reversed"),
@@ -80,10 +315,9 @@ def render(df: pd.DataFrame):
                 st.plotly_chart(fig, width='stretch')
 
     # ── Legal Entity breakdown ────────────────────────────────────
-    if "Legal Entity" in df.columns:
+    if result["legal_entity"] is not None:
         st.subheader("Legal Entity")
-        le = df.groupby("Legal Entity")["Shipment Weight"].sum().reset_index()
-        le.columns = ["Legal Entity", "Count"]
+        le = result["legal_entity"]
         fig = px.bar(le, x="Legal Entity", y="Count", text_auto=True, color="Legal Entity")
         fig.update_layout(showlegend=False, margin=dict(t=20, b=20))
         st.plotly_chart(fig, width='stretch')
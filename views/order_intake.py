@@ -4,6 +4,60 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from data_loader import count_weighted_shipments
+from forecast import BAND_Z, MODEL_NAMES, forecast_orders, forecast_table, period_forecast, weekly_actuals, weekly_forecast
+from rollups import (
+    ALIGNMENTS, ROLLING_WEEKS, baseline_deltas, calendar_rollup, complete_weeks, daily_rollup,
+    lead_time_summary, rolling_column, weekday_heatmap, year_colors, year_period_pivot,
+)
+import exports
+import grid
+import movers
+import runstats
+from sections import Section, run_sections
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_daily(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Daily order-intake rollup, cached per ``scope``."""
+    return daily_rollup(_df, "Order Placed Date")
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_calendar(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Gap-filled daily calendar with rolling averages, cached per ``scope``."""
+    return calendar_rollup(compute_daily(scope, _df))
+
+
+# Breakdowns offered by the forecast section (None: the view's total)
+FORECAST_BREAKDOWNS = {"Total": None, "Business Line": "Business Line", "Customer": "Customer Name", "Load Country": "Load Country"}
+FORECAST_WEEKS = 4
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_forecast(scope: str, _df: pd.DataFrame, by: str = None):
+    """Daily order forecasts per value of ``by`` (or of the total), cached per ``scope``."""
+    return forecast_orders(_df, by)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_lead_times(scope: str, _df: pd.DataFrame):
+    """Lead-time values and weekly pivot of all orders, cached per ``scope``."""
+    return lead_time_summary(_df.dropna(subset=["Order Placed Date"]))
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    if "Order Placed Date" not in df.columns or df["Order Placed Date"].isna().all():
+        return
+    compute_daily(view_key, df)
+    compute_calendar(view_key, df)
+    compute_forecast(view_key, df)
+    if "Business Line" in df.columns:
+        compute_forecast(view_key, df, "Business Line")
+    if "Load Date From" in df.columns:
+        compute_lead_times(view_key, df)
+    if "Customer" in movers.available(df):
+        movers.get_rollup(view_key, "Customer", df)
 
 
 def render(df: pd.DataFrame):
@@ -13,306 +67,388 @@ def render(df: pd.DataFrame):
         st.warning("No 'Order Placed Date' data available for this analysis.")
         return
 
-    orders = df.dropna(subset=["Order Placed Date"]).copy()
-    orders["OPD"] = orders["Order Placed Date"]
-    orders["Year"] = orders["OPD"].dt.year.astype(str)
-    orders["ISOWeek"] = orders["OPD"].dt.isocalendar().week.astype(int)
+    scope = st.session_state.view_key
+
+    # Daily rollup of weighted orders / shipment counts by order placed date
+    daily = compute_daily(scope, df)
 
-    available_years = sorted(orders["Year"].unique())
+    # Years to compare: any contiguous window of the years in the data
+    all_years = sorted(daily["Year"].unique())
+    available_years = all_years
+    if len(all_years) > 1:
+        first, last = st.select_slider("Compare years", all_years, value=(all_years[0], all_years[-1]), key="order_intake_years")
+        available_years = [year for year in all_years if first <= year <= last]
+    # Colorblind-friendly colors: most recent year blue, the one before red
+    colors_yoy = year_colors(available_years)
+    colors = colors_yoy
 
-    # ── Aggregation toggle ───────────────────────────────────
-    agg = st.radio("Aggregate by", ["Week", "Month"], horizontal=True, key="yoy_agg")
+    # ── Layout: one container per section ────────────────────
+    # Sections are drawn into these as they finish. The first three own
+    # their widgets and run as fragments, so changing one of those widgets
+    # only reruns that section (not the sidebar filters or other sections).
+    yoy_area = st.container()
+    same_period_area = st.container()
+    timeline_area = st.container()
+    forecast_area = st.container()
+
+    st.subheader("Order Volume Heatmap (Week × Day) — Full Timeline")
+    heatmap_area = st.container()
+
+    st.subheader("Lead Time (Working Days: Order Placed → Load Date)")
+    lead_time_area = st.container()
 
     # ══════════════════════════════════════════════════════════
     # 1. YEAR-OVER-YEAR RUNNING TOTAL
     # ══════════════════════════════════════════════════════════
-    st.subheader("Year-over-Year Running Total")
-    # Colorblind-friendly colors: red and blue
-    colors_yoy = {available_years[0]: "#d62728", available_years[1]: "#1f77b4"} if len(available_years) >= 2 else {year: ["#d62728", "#1f77b4"][i % 2] for i, year in enumerate(available_years)}
-    
-    fig = go.Figure()
-    year_data = {}
-    
-    # Collect data for all years
-    for year in available_years:
-        yr_df = orders[orders["Year"] == year].copy()
-        if agg == "Week":
-            grouped = yr_df.groupby("ISOWeek").agg({"Shipment Weight": "sum", "Shipment No": "count"}).reset_index()
-            grouped.columns = ["ISOWeek", "Orders", "Shipment Count"]
-            grouped = grouped.sort_values("ISOWeek")
-            grouped["Cumulative"] = grouped["Orders"].cumsum()
-            x_key = "ISOWeek"
-            x_title = "Week #"
-        else:
-            yr_df["Month"] = yr_df["OPD"].dt.month
-            grouped = yr_df.groupby("Month").agg({"Shipment Weight": "sum", "Shipment No": "count"}).reset_index()
-            grouped.columns = ["Month", "Orders", "Shipment Count"]
-            grouped = grouped.sort_values("Month")
-            grouped["Cumulative"] = grouped["Orders"].cumsum()
-            x_key = "Month"
-            x_title = "Month"
-        
-        year_data[year] = grouped
-        x_vals = grouped[x_key]
-        
+    def add_yoy_forecast(fig, pivot, agg, x_title):
+        """Continue the latest year's running total with the forecast and its 80 % band."""
+        result = compute_forecast(scope, df)
+        year = available_years[-1]
+        if result is None or str(result["dates"][0].year) != year:
+            return
+        actual = pivot["Orders"].loc[year].dropna()
+        ahead = period_forecast(result, 0, agg)
+        # Periods from the last one with orders: its actuals plus the rest forecast
+        combined = actual.add(ahead["Forecast"], fill_value=0).sort_index().cumsum()
+        combined = combined[combined.index >= actual.index.max()]
+        spread = BAND_Z * ahead["CumSD"].reindex(combined.index).fillna(0).to_numpy()
+        color = colors_yoy.get(year, "#1f77b4")
+        fig.add_trace(go.Scatter(
+            x=combined.index, y=combined.to_numpy() + spread, mode="lines",
+            line=dict(width=0), showlegend=False, hoverinfo="skip",
+        ))
+        fig.add_trace(go.Scatter(
+            x=combined.index, y=np.maximum(combined.to_numpy() - spread, 0), mode="lines",
+            line=dict(width=0), fill="tonexty", fillcolor="rgba(31, 119, 180, 0.15)",
+            name=f"{year} forecast (80% band)", hoverinfo="skip",
+        ))
         fig.add_trace(go.Scatter(
-            x=x_vals, y=grouped["Cumulative"],
-            mode="lines+markers", name=year,
-            line=dict(color=colors_yoy.get(year, "#1f77b4")),
-            marker=dict(color=colors_yoy.get(year, "#1f77b4")),
-            customdata=grouped[["Orders", "Shipment Count"]].values,
-            hovertemplate=f"<b>{year}</b><br>{x_title}: %{{x}}<br>Period Weight: %{{customdata[0]:.1f}}<br>Shipments: %{{customdata[1]:.0f}}<br>Cumulative: %{{y:.1f}}<extra></extra>",
+            x=combined.index, y=combined.to_numpy(), mode="lines",
+            name=f"{year} forecast", line=dict(color=color, dash="dot"),
+            customdata=spread,
+            hovertemplate=f"<b>{year} forecast</b><br>{x_title}: %{{x}}<br>Cumulative: %{{y:.1f}} ± %{{customdata:.1f}}<extra></extra>",
         ))
-    
-    # Add delta line if we have 2 or more years
-    if len(available_years) >= 2 and agg == "Week":
-        year1 = available_years[-1]  # Most recent year
-        year0 = available_years[-2]  # Previous year
-        
-        # Get week completeness data for both years
-        week_complete_y1 = set()
-        yr_df_y1 = orders[orders["Year"] == year1].copy()
-        for week in yr_df_y1["ISOWeek"].unique():
-            week_data = yr_df_y1[yr_df_y1["ISOWeek"] == week]
-            # Check if week has Friday (day 5) or later
-            has_friday_or_later = (week_data["OPD"].dt.dayofweek >= 4).any()
-            if has_friday_or_later:
-                week_complete_y1.add(week)
-        
-        week_complete_y0 = set()
-        yr_df_y0 = orders[orders["Year"] == year0].copy()
-        for week in yr_df_y0["ISOWeek"].unique():
-            week_data = yr_df_y0[yr_df_y0["ISOWeek"] == week]
-            # Check if week has Friday (day 5) or later
-            has_friday_or_later = (week_data["OPD"].dt.dayofweek >= 4).any()
-            if has_friday_or_later:
-                week_complete_y0.add(week)
-        
-        # Only keep weeks that are complete in both years
-        complete_weeks = week_complete_y1 & week_complete_y0
-        
-        df_y1 = year_data[year1].set_index(x_key)
-        df_y0 = year_data[year0].set_index(x_key)
-        
-        # Filter to complete weeks in both years
-        df_y1_filtered = df_y1[df_y1.index.isin(complete_weeks)]
-        df_y0_filtered = df_y0[df_y0.index.isin(complete_weeks)]
-        
-        # Only show delta where both years have data
-        merged = pd.DataFrame({"Y1": df_y1_filtered["Cumulative"], "Y0": df_y0_filtered["Cumulative"]}).dropna()
-        merged["Delta"] = merged["Y1"] - merged["Y0"]
-        
-        if not merged.empty:
+
+    def build_yoy(daily, agg, baseline, show_forecast=False):
+        fig = go.Figure()
+        # One year × period pivot holds every compared year's series
+        pivot = year_period_pivot(daily[daily["Year"].isin(available_years)], agg)
+        x_title = "Week #" if agg == "Week" else "Month"
+
+        for year in available_years:
+            cumulative = pivot["Cumulative"].loc[year].dropna()
+            periods = cumulative.index
             fig.add_trace(go.Scatter(
-                x=merged.index, y=merged["Delta"],
-                mode="lines+markers", name=f"Delta ({year1} vs {year0})",
-                line=dict(color="#2ca02c", dash="dash", width=2),
-                marker=dict(color="#2ca02c", size=6),
-                yaxis="y2",
-                hovertemplate=f"<b>Delta</b><br>{x_title}: %{{x}}<br>Difference: %{{y:.1f}}<extra></extra>",
+                x=periods, y=cumulative.to_numpy(),
+                mode="lines+markers", name=year,
+                line=dict(color=colors_yoy.get(year, "#1f77b4")),
+                marker=dict(color=colors_yoy.get(year, "#1f77b4")),
+                customdata=np.column_stack([pivot["Orders"].loc[year, periods], pivot["Shipment Count"].loc[year, periods]]),
+                hovertemplate=f"<b>{year}</b><br>{x_title}: %{{x}}<br>Period Weight: %{{customdata[0]:.1f}}<br>Shipments: %{{customdata[1]:.0f}}<br>Cumulative: %{{y:.1f}}<extra></extra>",
             ))
+        if show_forecast:
+            add_yoy_forecast(fig, pivot, agg, x_title)
 
-    # Add secondary y-axis for delta if we have multiple years
-    if len(available_years) >= 2:
-        fig.update_layout(
-            xaxis_title=x_title, yaxis_title="Cumulative Orders",
-            yaxis2=dict(title="Delta (Difference)", overlaying="y", side="right"),
-            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-        )
-    else:
-        fig.update_layout(
-            xaxis_title=x_title, yaxis_title="Cumulative Orders",
-            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-        )
-    st.plotly_chart(fig, width='stretch')
+        # Delta of every other year against the baseline year, over weeks
+        # complete in both years
+        if len(available_years) >= 2 and agg == "Week":
+            # (a week counts once it has an order on Friday or later)
+            complete = complete_weeks(daily, 4)
+            deltas = baseline_deltas(pivot["Cumulative"], baseline, complete)
+            for year, delta in deltas.iterrows():
+                delta = delta.dropna()
+                if delta.empty:
+                    continue
+                fig.add_trace(go.Scatter(
+                    x=delta.index, y=delta.to_numpy(),
+                    mode="lines+markers", name=f"Delta ({year} vs {baseline})",
+                    line=dict(color=colors_yoy.get(year, "#2ca02c"), dash="dash", width=2),
+                    marker=dict(color=colors_yoy.get(year, "#2ca02c"), size=6),
+                    yaxis="y2",
+                    hovertemplate=f"<b>Delta {year} vs {baseline}</b><br>{x_title}: %{{x}}<br>Difference: %{{y:.1f}}<extra></extra>",
+                ))
+
+        # Add secondary y-axis for delta if we have multiple years
+        if len(available_years) >= 2:
+            fig.update_layout(
+                xaxis_title=x_title, yaxis_title="Cumulative Orders",
+                yaxis2=dict(title="Delta (Difference)", overlaying="y", side="right"),
+                hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+            )
+        else:
+            fig.update_layout(
+                xaxis_title=x_title, yaxis_title="Cumulative Orders",
+                hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+            )
+        return fig
+
+    def show_drivers(daily, agg, baseline):
+        """Break the running-total delta of a year vs the baseline down by any dimension."""
+        with st.expander(f"🔍 Who drove this change? (vs {baseline})"):
+            others = [year for year in available_years if year != baseline]
+            x_key, unit = ("ISOWeek", "week") if agg == "Week" else ("Month", "month")
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                year = st.selectbox("Year", others, index=len(others) - 1, key="yoy_drill_year")
+            periods = sorted(daily.loc[daily["Year"] == year, x_key].unique().tolist())
+            with c2:
+                period = st.selectbox(f"Up to {unit}", periods, index=len(periods) - 1, key=f"yoy_drill_{unit}")
+            with c3:
+                dimension = st.selectbox("Break down by", movers.available(df), key="yoy_drill_dimension")
+            current = movers.year_to_period(int(year), agg, period)
+            previous = movers.year_to_period(int(baseline), agg, period)
+            st.caption(
+                f"Running totals from 1 January to the end of {unit} {period} in both years (the chart "
+                "places the first days of January in the previous year's last ISO week, so the totals "
+                "can differ slightly from the delta line around New Year)."
+            )
+            comparison = movers.compare(movers.get_rollup(scope, dimension, df), current, previous, dimension)
+            movers.render_comparison(comparison, dimension, current, previous, key="yoy_drill")
+
+    @st.fragment
+    def yoy_section(daily):
+        with runstats.timed("order intake: yoy"):
+            c1, c2, c3 = st.columns([2, 1, 1])
+            with c1:
+                agg = st.radio("Aggregate by", ["Week", "Month"], horizontal=True, key="yoy_agg")
+            with c3:
+                show_forecast = st.checkbox("Show forecast", value=True, key="yoy_forecast")
+            baseline = available_years[-1]
+            if len(available_years) >= 2:
+                with c2:
+                    baseline = st.selectbox("Baseline year", available_years, index=len(available_years) - 2, key="yoy_baseline")
+            st.subheader("Year-over-Year Running Total")
+            st.plotly_chart(build_yoy(daily, agg, baseline, show_forecast), width='stretch')
+            if len(available_years) >= 2 and movers.available(df):
+                show_drivers(daily, agg, baseline)
 
     # ══════════════════════════════════════════════════════════
     # 2. WEEKLY COMPARISON (years side-by-side by day-of-year)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Order Volume — Year Comparison (Same Period)")
-    c1, c2 = st.columns([3, 1])
-    with c2:
-        week_window = st.selectbox("Rolling avg (weeks)", [1, 2, 3, 4], index=0, key="smooth_window", label_visibility="collapsed")
-    
-    # Colorblind-friendly colors: red and blue
-    colors = {available_years[0]: "#d62728", available_years[1]: "#1f77b4"} if len(available_years) >= 2 else {year: ["#d62728", "#1f77b4"][i % 2] for i, year in enumerate(available_years)}
-    
-    fig2 = go.Figure()
-    # First pass: add all lines (aligned by day-of-year)
-    for year in available_years:
-        yr_df = orders[orders["Year"] == year].copy()
-        # Aggregate by day
-        daily = yr_df.groupby(yr_df["OPD"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        # Calculate day-of-year (1-366) for x-axis alignment
-        daily["DayOfYear"] = pd.to_datetime(daily["Date"]).dt.dayofyear
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b")
-        # Calculate rolling average per week (days in a week = 7) - backward-looking (trailing)
-        daily["Smoothed"] = daily["Orders"].rolling(window=week_window * 7, min_periods=1).mean()
-        fig2.add_trace(go.Scatter(
-            x=daily["DayOfYear"], y=daily["Smoothed"],
-            mode="lines", name=year, line=dict(width=2, color=colors.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
-        ))
-    # Second pass: add all dots (on top) with matching colors
-    for year in available_years:
-        yr_df = orders[orders["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["OPD"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        daily["DayOfYear"] = pd.to_datetime(daily["Date"]).dt.dayofyear
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b")
-        fig2.add_trace(go.Scatter(
-            x=daily["DayOfYear"], y=daily["Orders"],
-            mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
-            showlegend=False,
-        ))
+    def build_same_period(calendar, week_window, align):
+        fig2 = go.Figure()
+        year_col, x_col, x_title = ALIGNMENTS[align]
+        avg_col = rolling_column(week_window)
+
+        # Per-year slices of the gap-filled calendar (rolling averages already computed)
+        same_period = dict(tuple(calendar[calendar[year_col].isin(available_years)].groupby(year_col)))
+        empty = calendar.iloc[:0]
+
+        # First pass: add all lines (aligned by day-of-year or ISO week / weekday)
+        for year in available_years:
+            daily_yr = same_period.get(year, empty)
+            fig2.add_trace(go.Scatter(
+                x=daily_yr[x_col], y=daily_yr[avg_col],
+                mode="lines", name=year, line=dict(width=2, color=colors.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%a %d-%b"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
+            ))
+        # Second pass: add all dots (on top) with matching colors, days with data only
+        for year in available_years:
+            daily_yr = same_period.get(year, empty)
+            daily_yr = daily_yr[daily_yr["HasData"]]
+            fig2.add_trace(go.Scatter(
+                x=daily_yr[x_col], y=daily_yr["Orders"],
+                mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%a %d-%b"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
+                showlegend=False,
+            ))
 
-    fig2.update_layout(
-        xaxis_title="Day of Year (Jan 1 → Dec 31)", yaxis_title=f"# Orders ({week_window}-week rolling avg)",
-        hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-    )
-    st.plotly_chart(fig2, width='stretch')
+        fig2.update_layout(
+            xaxis_title=x_title, yaxis_title=f"# Orders ({week_window}-week rolling avg)",
+            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+        )
+        return fig2
+
+    @st.fragment
+    def same_period_section(calendar):
+        with runstats.timed("order intake: same period"):
+            st.subheader("Order Volume — Year Comparison (Same Period)")
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                align = st.radio("Align years by", list(ALIGNMENTS), horizontal=True, key="same_period_align")
+            with c2:
+                week_window = st.selectbox("Rolling avg (weeks)", ROLLING_WEEKS, index=0, key="smooth_window", label_visibility="collapsed")
+            st.plotly_chart(build_same_period(calendar, week_window, align), width='stretch')
 
     # ══════════════════════════════════════════════════════════
     # 3. FULL TIMELINE (all years continuous, daily detail with week smoothing)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Full Timeline — All Years (Continuous)")
-    c1_tl, c2_tl = st.columns([3, 1])
-    with c2_tl:
-        tl_window = st.selectbox("Rolling avg (weeks)", [1, 2, 3, 4], index=0, key="timeline_window", label_visibility="collapsed")
-    
-    fig3 = go.Figure()
-    # First pass: add all lines per year
-    for year in available_years:
-        yr_df = orders[orders["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["OPD"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b-%Y")
-        daily["Smoothed"] = daily["Orders"].rolling(window=tl_window * 7, min_periods=1).mean()
-        fig3.add_trace(go.Scatter(
-            x=daily["Date"], y=daily["Smoothed"],
-            mode="lines", name=year, line=dict(width=2, color=colors_yoy.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
+    def build_timeline(calendar, tl_window):
+        fig3 = go.Figure()
+        avg_col = rolling_column(tl_window)
+        # Rolling averages run over the continuous calendar, across year ends
+        timeline = dict(tuple(calendar[calendar["Year"].isin(available_years)].groupby("Year")))
+        empty = calendar.iloc[:0]
+
+        # First pass: add all lines per year
+        for year in available_years:
+            daily_yr = timeline.get(year, empty)
+            fig3.add_trace(go.Scatter(
+                x=daily_yr["Date"], y=daily_yr[avg_col],
+                mode="lines", name=year, line=dict(width=2, color=colors_yoy.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%d-%b-%Y"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
+            ))
+        # Second pass: add all dots per year, days with data only
+        for year in available_years:
+            daily_yr = timeline.get(year, empty)
+            daily_yr = daily_yr[daily_yr["HasData"]]
+            fig3.add_trace(go.Scatter(
+                x=daily_yr["Date"], y=daily_yr["Orders"],
+                mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors_yoy.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%d-%b-%Y"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
+                showlegend=False,
+            ))
+
+        fig3.update_layout(
+            xaxis_title="Date", yaxis_title=f"# Orders ({tl_window}-week rolling avg)",
+            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+        )
+        return fig3
+
+    @st.fragment
+    def timeline_section(calendar):
+        with runstats.timed("order intake: timeline"):
+            st.subheader("Full Timeline — All Years (Continuous)")
+            c1_tl, c2_tl = st.columns([3, 1])
+            with c2_tl:
+                tl_window = st.selectbox("Rolling avg (weeks)", ROLLING_WEEKS, index=0, key="timeline_window", label_visibility="collapsed")
+            st.plotly_chart(build_timeline(calendar, tl_window), width='stretch')
+
+    # ══════════════════════════════════════════════════════════
+    # 4. FORECAST (per business line / customer / load country)
+    # ══════════════════════════════════════════════════════════
+    def build_forecast_chart(result, series):
+        actual = weekly_actuals(result, series)
+        ahead = weekly_forecast(result, series)
+        fig4 = go.Figure()
+        fig4.add_trace(go.Scatter(
+            x=actual["Week"], y=actual["Orders"], mode="lines+markers", name="Actual",
+            line=dict(color="#1f77b4"), hovertemplate="Week of %{x|%d-%b-%Y}<br>Orders: %{y:.1f}<extra></extra>",
         ))
-    # Second pass: add all dots per year
-    for year in available_years:
-        yr_df = orders[orders["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["OPD"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b-%Y")
-        fig3.add_trace(go.Scatter(
-            x=daily["Date"], y=daily["Orders"],
-            mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors_yoy.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
-            showlegend=False,
+        fig4.add_trace(go.Scatter(
+            x=ahead["Week"], y=ahead["Upper"], mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip",
         ))
-    
-    fig3.update_layout(
-        xaxis_title="Date", yaxis_title=f"# Orders ({tl_window}-week rolling avg)",
-        hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-    )
-    st.plotly_chart(fig3, width='stretch')
+        fig4.add_trace(go.Scatter(
+            x=ahead["Week"], y=ahead["Lower"], mode="lines", line=dict(width=0),
+            fill="tonexty", fillcolor="rgba(214, 39, 40, 0.15)", name="80% band", hoverinfo="skip",
+        ))
+        fig4.add_trace(go.Scatter(
+            x=ahead["Week"], y=ahead["Forecast"], mode="lines+markers", name="Forecast",
+            line=dict(color="#d62728", dash="dot"),
+            customdata=ahead[["Lower", "Upper"]].to_numpy(),
+            hovertemplate="Week of %{x|%d-%b-%Y}<br>Forecast: %{y:.1f}<br>80% band: %{customdata[0]:.1f} – %{customdata[1]:.1f}<extra></extra>",
+        ))
+        fig4.update_layout(
+            xaxis_title="Week", yaxis_title="Orders per week",
+            hovermode="x unified", margin=dict(t=30, b=40),
+        )
+        return fig4
+
+    @st.fragment
+    def forecast_section():
+        with runstats.timed("order intake: forecast"):
+            st.subheader("Order Intake Forecast")
+            breakdowns = [label for label, col in FORECAST_BREAKDOWNS.items() if col is None or col in df.columns]
+            c1, c2 = st.columns([1, 2])
+            with c1:
+                label = st.selectbox("Forecast by", breakdowns, index=min(1, len(breakdowns) - 1), key="forecast_by")
+            result = compute_forecast(scope, df, FORECAST_BREAKDOWNS[label])
+            if result is None:
+                st.info("Not enough order history for a forecast.")
+                return
+            table = forecast_table(result, FORECAST_WEEKS)
+            with c2:
+                series = st.selectbox("Series", table["Series"], key="forecast_series") if len(table) > 1 else table["Series"].iloc[0]
+            index = int(np.flatnonzero(result["keys"] == series)[0])
+            st.caption(
+                f"Forecast from {result['dates'][0]:%d-%b-%Y} ({MODEL_NAMES[result['model'][index]]}); "
+                "each series uses the model with the smallest error over its last 4 weeks."
+            )
+            st.plotly_chart(build_forecast_chart(result, index), width='stretch')
+            st.dataframe(
+                table.rename(columns={"Series": label}), width='stretch', hide_index=True,
+                column_config={"Change %": st.column_config.NumberColumn(format="%.1f%%")},
+            )
+            exports.export_menu(table, "order_intake_forecast", key="export_order_intake_forecast")
 
     # ══════════════════════════════════════════════════════════
-    # 4. HEATMAP — full continuous timeline (Mon–Fri, weekends → Friday)
+    # 5. HEATMAP — full continuous timeline (Mon–Fri, weekends → Friday)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Order Volume Heatmap (Week × Day) — Full Timeline")
-    dow_weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-    if "Order DOW" in orders.columns:
-        # Move Saturday/Sunday orders to Friday
-        heat_orders = orders.copy()
-        heat_orders.loc[heat_orders["Order DOW"].isin(["Saturday", "Sunday"]), "Order DOW"] = "Friday"
-        heat_orders["YearWeek"] = heat_orders["Year"] + "-W" + heat_orders["ISOWeek"].astype(str).str.zfill(2)
-        heat = heat_orders.groupby(["YearWeek", "Order DOW"])["Shipment Weight"].sum().reset_index(name="Orders")
-        if not heat.empty:
-            heat_pivot = heat.pivot(index="Order DOW", columns="YearWeek", values="Orders").fillna(0)
-            heat_pivot = heat_pivot[sorted(heat_pivot.columns)]
-            heat_pivot = heat_pivot.reindex([d for d in dow_weekdays if d in heat_pivot.index])
-            fig5 = px.imshow(
-                heat_pivot,
-                labels=dict(x="Year-Week", y="Day", color="Orders"),
-                color_continuous_scale="YlOrRd",
-                aspect="auto",
-            )
-            fig5.update_layout(margin=dict(t=20, b=20))
+    def build_heatmap(daily):
+        if "Order DOW" not in df.columns:
+            return None
+        # Saturday/Sunday orders are counted on Friday
+        heat_pivot = weekday_heatmap(daily)
+        if heat_pivot.empty:
+            return None
+        fig5 = px.imshow(
+            heat_pivot,
+            labels=dict(x="Year-Week", y="Day", color="Orders"),
+            color_continuous_scale="YlOrRd",
+            aspect="auto",
+        )
+        fig5.update_layout(margin=dict(t=20, b=20))
+        return fig5
+
+    def show_heatmap(fig5):
+        if fig5 is not None:
             st.plotly_chart(fig5, width='stretch')
 
     # ══════════════════════════════════════════════════════════
-    # 5. LEAD TIME TABLE (working days)
+    # 6. LEAD TIME TABLE (working days)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Lead Time (Working Days: Order Placed → Load Date)")
-    if "Order Placed Date" in orders.columns and "Load Date From" in df.columns:
-        lt_df = orders[["Shipment No", "Customer Name", "Order Placed Date", "Load Date From"]].dropna().copy()
-        if len(lt_df) > 0:
-            # Calculate working days (exclude Sat/Sun)
-            lt_df["Lead Time (Working Days)"] = lt_df.apply(
-                lambda r: np.busday_count(
-                    r["Order Placed Date"].date(),
-                    r["Load Date From"].date(),
-                ), axis=1,
-            )
-            # Filter out negatives
-            lt_df = lt_df[lt_df["Lead Time (Working Days)"] >= 0]
-
-            if len(lt_df) > 0:
-                avg_lt = lt_df["Lead Time (Working Days)"].mean()
-                med_lt = lt_df["Lead Time (Working Days)"].median()
-                c1, c2, c3 = st.columns(3)
-                c1.metric("Average Lead Time", f"{avg_lt:.1f} working days")
-                c2.metric("Median Lead Time", f"{med_lt:.0f} working days")
-                c3.metric("Orders with Lead Time", f"{len(lt_df):,}")
-
-                # Histogram
-                lt_vals = lt_df["Lead Time (Working Days)"]
-                lt_clipped = lt_vals[lt_vals <= lt_vals.quantile(0.99)]
-                fig6 = px.histogram(lt_clipped, nbins=30, labels={"value": "Working Days"})
-                fig6.update_layout(
-                    xaxis_title="Lead Time (working days)", yaxis_title="# Shipments",
-                    showlegend=False, margin=dict(t=20, b=20),
-                )
-                st.plotly_chart(fig6, width='stretch')
-
-                # Lead time distribution by week
-                st.subheader("Lead Time Distribution by Week")
-                lt_df["YearWeek"] = lt_df["Order Placed Date"].dt.year.astype(str) + "-W" + lt_df["Order Placed Date"].dt.isocalendar().week.astype(str).str.zfill(2)
-                
-                # Create lead time buckets (ordered by duration)
-                def bucket_leadtime(lt):
-                    if lt < 3:
-                        return "1. <3 Days"
-                    elif lt < 7:
-                        return "2. 4-7 Days"
-                    elif lt < 14:
-                        return "3. 7-14 Days"
-                    else:
-                        return "4. >14 Days"
-                
-                lt_df["Bucket"] = lt_df["Lead Time (Working Days)"].apply(bucket_leadtime)
-                
-                # Pivot: weeks as columns, buckets as rows
-                pivot = lt_df.groupby(["Bucket", "YearWeek"]).size().unstack(fill_value=0)
-                # Reverse columns to show most recent (latest week) on the left
-                pivot = pivot[[c for c in sorted(pivot.columns, reverse=True)]]
-                # Add total row
-                total_row = pivot.sum()
-                pivot.loc["0. Total Orders"] = total_row
-                # Add average row
-                avg_row = lt_df.groupby("YearWeek")["Lead Time (Working Days)"].mean()
-                pivot.loc["5. Average"] = avg_row
-                # Sort rows by bucket order
-                pivot = pivot.sort_index()
-                
-                st.dataframe(pivot, width='stretch')
-            else:
-                st.info("No valid lead time data available.")
+    def build_lead_times():
+        lead_times = compute_lead_times(scope, df)
+        if lead_times is None or lead_times["histogram"].total == 0:
+            return lead_times, None
+        # Working days (Mon–Fri), negative lead times already filtered out;
+        # the per-day histogram gives exact quantiles without the raw values
+        hist = lead_times["histogram"]
+        bars = hist.bars(30, upper=hist.quantile(0.99))
+        fig6 = px.bar(bars, x="Mid", y="Count", hover_data={"Start": True, "End": True, "Mid": False})
+        fig6.update_traces(width=bars["Width"], marker_line_width=0)
+        fig6.update_layout(
+            xaxis_title="Lead Time (working days)", yaxis_title="# Shipments",
+            showlegend=False, margin=dict(t=20, b=20),
+        )
+        return lead_times, fig6
+
+    def show_lead_times(result):
+        lead_times, fig6 = result
+        if lead_times is None:
+            return
+        hist = lead_times["histogram"]
+        if hist.total > 0:
+            avg_lt = hist.mean()
+            med_lt = hist.quantile(0.5)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Average Lead Time", f"{avg_lt:.1f} working days")
+            c2.metric("Median Lead Time", f"{med_lt:.0f} working days")
+            c3.metric("Orders with Lead Time", f"{hist.total:,}")
+
+            st.plotly_chart(fig6, width='stretch')
+
+            # Lead time distribution by week (buckets as rows, most recent week first)
+            st.subheader("Lead Time Distribution by Week")
+            grid.paged_columns(lead_times["pivot"], "order_lead_time_weeks", noun="weeks")
+            exports.export_menu(lead_times["pivot"], "order_lead_time_by_week", key="export_order_lead_time_by_week", index=True)
+        else:
+            st.info("No valid lead time data available.")
+
+    sections = [
+        Section("order intake: yoy", None, ("daily",), render=yoy_section, container=yoy_area),
+        Section("order intake: same period", None, ("calendar",), render=same_period_section, container=same_period_area),
+        Section("order intake: timeline", None, ("calendar",), render=timeline_section, container=timeline_area),
+        Section("order intake: forecast", None, render=forecast_section, container=forecast_area),
+        Section("order intake: heatmap", build_heatmap, ("daily",), render=show_heatmap, container=heatmap_area),
+    ]
+    if "Load Date From" in df.columns:
+        sections.append(Section("order intake: lead times", build_lead_times, render=show_lead_times, container=lead_time_area))
     else:
-        st.info("Order Placed Date or Load Date From column not available.")
+        lead_time_area.info("Order Placed Date or Load Date From column not available.")
+
+    run_sections(sections, daily=daily, calendar=compute_calendar(scope, df))
@@ -4,351 +4,402 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from data_loader import count_weighted_shipments
+from rollups import (
+    ALIGNMENTS, ROLLING_WEEKS, baseline_deltas, calendar_rollup, complete_weeks, daily_rollup,
+    lead_time_summary, rolling_column, weekday_heatmap, year_colors, year_period_pivot,
+)
+from anomalies import SERIES_KINDS, Z_THRESHOLD, alerts, get_scores
+import exports
+import grid
+import runstats
+from sections import Section, run_sections
+from views import customers
+
+# Years compared by default: the most recent ones in the data
+DEFAULT_YEAR_COUNT = 2
+# Alert rows listed at most
+ALERT_ROWS = 25
+
+
+def _shipments(df: pd.DataFrame) -> pd.DataFrame:
+    """Shipments with a load date, excluding OPEN and CANCEL statuses."""
+    return df[~df["Shipment Status"].isin(["OPEN", "CANCEL"])].dropna(subset=["Load Date From"])
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_daily(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Daily load rollup of the page's shipments, cached per ``scope``."""
+    return daily_rollup(_shipments(_df), "Load Date From")
+
+
+def default_years(daily: pd.DataFrame) -> tuple:
+    """The ``DEFAULT_YEAR_COUNT`` most recent years of ``daily``."""
+    return tuple(sorted(daily["Year"].unique())[-DEFAULT_YEAR_COUNT:])
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_calendar(scope: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Gap-filled daily calendar with rolling averages, cached per ``scope``."""
+    return calendar_rollup(compute_daily(scope, _df))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_lead_times(scope: str, _df: pd.DataFrame, years: tuple):
+    """Lead-time histogram and weekly pivot for the compared ``years``, cached per ``scope``."""
+    shipments = _shipments(_df)
+    shipments = shipments[shipments["Load Date From"].dt.year.astype(str).isin(years)]
+    return lead_time_summary(shipments)
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    for kind in SERIES_KINDS:
+        get_scores(dataset_key, kind, df_raw)
+    if "Load Date From" not in df.columns or df["Load Date From"].isna().all():
+        return
+    daily = compute_daily(view_key, df)
+    compute_calendar(view_key, df)
+    if "Order Placed Date" in df.columns and len(daily) > 0:
+        compute_lead_times(view_key, df, default_years(daily))
+
+
+@st.fragment
+def alerts_section():
+    """Largest order-volume deviations of all customers / lanes in the loaded dataset."""
+    with runstats.timed("overview: alerts"):
+        st.subheader("🚨 Alerts — Order Volume vs. Seasonal Baseline")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            kind = st.radio("Series", list(SERIES_KINDS), horizontal=True, key="alerts_kind")
+        with c2:
+            weeks = st.selectbox("Within the last", [1, 2, 4], format_func=lambda w: f"{w} complete week{'s' * (w > 1)}", key="alerts_weeks")
+        with c3:
+            direction = st.radio("Show", ["Drops", "Spikes", "Both"], horizontal=True, key="alerts_direction")
+
+        scores = get_scores(st.session_state.dataset_key, kind, st.session_state.df_raw)
+        if scores is None or scores.complete == 0:
+            st.info("No order history available for alerts.")
+            return
+        table = alerts(scores, weeks)
+        if direction != "Both":
+            table = table[(table["Z"] < 0) == (direction == "Drops")]
+        # Series scored in at least one week of the window the table covers
+        scored = int(np.isfinite(scores.z[:, max(scores.complete - weeks, 0):scores.complete]).any(axis=1).sum())
+        st.caption(
+            f"Weekly orders (Order Placed Date) up to the week of {scores.weeks[scores.complete - 1]:%d-%b-%Y}, "
+            f"all filters ignored: {len(table):,} of {scored:,} scored {kind.lower()}s deviate by a robust z-score "
+            f"of at least {Z_THRESHOLD:g} from their baseline (median of the previous weeks, adjusted by last year's season)."
+        )
+        if table.empty:
+            st.success("No deviations.")
+            return
+
+        shown = table.head(ALERT_ROWS)
+        event = st.dataframe(
+            shown.drop(columns="Key"), width='stretch', hide_index=True,
+            on_select="rerun", selection_mode="single-row", key="alerts_table",
+            column_config={"Week": st.column_config.DateColumn(format="DD-MMM-YYYY"),
+                           "Change %": st.column_config.NumberColumn(format="%.1f%%")},
+        )
+        rows = event.selection.rows
+        if rows:
+            alert = shown.iloc[rows[0]]
+            if st.button(f"Open {alert['Customer']} in Customers", key="alerts_open",
+                         on_click=customers.open_alert, args=(kind, alert["Key"], alert["Customer"])):
+                st.rerun()
+        else:
+            st.caption("Select a row to open it on the Customers page.")
 
 
 def render(df: pd.DataFrame):
     st.header("📊 Load Patterns")
 
+    alerts_section()
+
     if "Load Date From" not in df.columns or df["Load Date From"].isna().all():
         st.warning("No 'Load Date From' data available for this analysis.")
         return
 
-    # Filter out OPEN and CANCEL statuses
-    shipments = df[~df["Shipment Status"].isin(["OPEN", "CANCEL"])].dropna(subset=["Load Date From"]).copy()
+    scope = st.session_state.view_key
+
+    # Daily rollup of shipments excluding OPEN and CANCEL statuses
+    daily = compute_daily(scope, df)
     
-    if len(shipments) == 0:
+    if len(daily) == 0:
         st.warning("No shipments available after filtering out OPEN and CANCEL statuses.")
         return
-    
-    shipments["LDF"] = shipments["Load Date From"]
-    shipments["Year"] = shipments["LDF"].dt.year.astype(str)
-    shipments["ISOWeek"] = shipments["LDF"].dt.isocalendar().week.astype(int)
 
-    # Filter to only 2025 and 2026
-    shipments = shipments[shipments["Year"].isin(["2025", "2026"])]
-    
-    if len(shipments) == 0:
-        st.warning("No shipments found in 2025 or 2026.")
-        return
+    # Years to compare: any contiguous window of the years in the data,
+    # the most recent ones by default
+    all_years = sorted(daily["Year"].unique())
+    available_years = all_years
+    if len(all_years) > 1:
+        default = default_years(daily)
+        first, last = st.select_slider("Compare years", all_years, value=(default[0], default[-1]), key="overview_years")
+        available_years = [year for year in all_years if first <= year <= last]
+    daily = daily[daily["Year"].isin(available_years)]
+    # Colorblind-friendly colors: most recent year blue, the one before red
+    colors_yoy = year_colors(available_years)
+    colors = colors_yoy
 
-    available_years = sorted(shipments["Year"].unique())
+    # ── Layout: one container per section ────────────────────
+    # Sections are drawn into these as they finish. The first three own
+    # their widgets and run as fragments, so changing one of those widgets
+    # only reruns that section (not the sidebar filters or other sections).
+    yoy_area = st.container()
+    same_period_area = st.container()
+    timeline_area = st.container()
 
-    # ── Aggregation toggle ───────────────────────────────────
-    agg = st.radio("Aggregate by", ["Week", "Month"], horizontal=True, key="yoy_agg")
+    st.subheader("Load Volume Heatmap (Week × Day) — Full Timeline")
+    heatmap_area = st.container()
+
+    st.subheader("Lead Time (Working Days: Order Placed → Load Date)")
+    lead_time_area = st.container()
 
     # ══════════════════════════════════════════════════════════
     # 1. YEAR-OVER-YEAR RUNNING TOTAL
     # ══════════════════════════════════════════════════════════
-    st.subheader("Year-over-Year Running Total")
-    # Colorblind-friendly colors: red and blue
-    colors_yoy = {available_years[0]: "#d62728", available_years[1]: "#1f77b4"} if len(available_years) >= 2 else {year: ["#d62728", "#1f77b4"][i % 2] for i, year in enumerate(available_years)}
-    
-    fig = go.Figure()
-    year_data = {}
-    
-    # Collect data for all years
-    for year in available_years:
-        yr_df = shipments[shipments["Year"] == year].copy()
-        if agg == "Week":
-            grouped = yr_df.groupby("ISOWeek").agg({"Shipment Weight": "sum", "Shipment No": "count"}).reset_index()
-            grouped.columns = ["ISOWeek", "Orders", "Shipment Count"]
-            grouped = grouped.sort_values("ISOWeek")
-            grouped["Cumulative"] = grouped["Orders"].cumsum()
-            x_key = "ISOWeek"
-            x_title = "Week #"
-        else:
-            yr_df["Month"] = yr_df["LDF"].dt.month
-            grouped = yr_df.groupby("Month").agg({"Shipment Weight": "sum", "Shipment No": "count"}).reset_index()
-            grouped.columns = ["Month", "Orders", "Shipment Count"]
-            grouped = grouped.sort_values("Month")
-            grouped["Cumulative"] = grouped["Orders"].cumsum()
-            x_key = "Month"
-            x_title = "Month"
-        
-        year_data[year] = grouped
-        x_vals = grouped[x_key]
-        
-        fig.add_trace(go.Scatter(
-            x=x_vals, y=grouped["Cumulative"],
-            mode="lines+markers", name=year,
-            line=dict(color=colors_yoy.get(year, "#1f77b4")),
-            marker=dict(color=colors_yoy.get(year, "#1f77b4")),
-            customdata=grouped[["Orders", "Shipment Count"]].values,
-            hovertemplate=f"<b>{year}</b><br>{x_title}: %{{x}}<br>Period Weight: %{{customdata[0]:.1f}}<br>Shipments: %{{customdata[1]:.0f}}<br>Cumulative: %{{y:.1f}}<extra></extra>",
-        ))
-    
-    # Add delta line if we have 2 or more years
-    if len(available_years) >= 2 and agg == "Week":
-        year1 = available_years[-1]  # Most recent year
-        year0 = available_years[-2]  # Previous year
-        today = pd.Timestamp.now()
-        today_date = today.date()
-        today_week = today.isocalendar()[1]
-        today_year = today.year
-        
-        # Get week completeness data for both years (Thursday = day 3 or later)
-        # AND only for weeks that are in the past or currently complete
-        week_complete_y1 = set()
-        yr_df_y1 = shipments[shipments["Year"] == year1].copy()
-        for week in yr_df_y1["ISOWeek"].unique():
-            week_data = yr_df_y1[yr_df_y1["ISOWeek"] == week]
-            # Check if week has Thursday (day 3) or later
-            has_thursday_or_later = (week_data["LDF"].dt.dayofweek >= 3).any()
-            # Only include weeks that are complete in the past
-            is_past = True
-            if int(year1) == today_year:
-                # If current year, only include weeks on or before today and before Thursday
-                is_past = week < today_week or (week == today_week and today.dayofweek >= 3)
-            if has_thursday_or_later and is_past:
-                week_complete_y1.add(week)
-        
-        week_complete_y0 = set()
-        yr_df_y0 = shipments[shipments["Year"] == year0].copy()
-        for week in yr_df_y0["ISOWeek"].unique():
-            week_data = yr_df_y0[yr_df_y0["ISOWeek"] == week]
-            # Check if week has Thursday (day 3) or later
-            has_thursday_or_later = (week_data["LDF"].dt.dayofweek >= 3).any()
-            if has_thursday_or_later:
-                week_complete_y0.add(week)
-        
-        # Only keep weeks that are complete in both years
-        complete_weeks = week_complete_y1 & week_complete_y0
-        
-        df_y1 = year_data[year1].set_index(x_key)
-        df_y0 = year_data[year0].set_index(x_key)
-        
-        # Filter to complete weeks in both years
-        df_y1_filtered = df_y1[df_y1.index.isin(complete_weeks)]
-        df_y0_filtered = df_y0[df_y0.index.isin(complete_weeks)]
-        
-        # Only show delta where both years have data
-        merged = pd.DataFrame({"Y1": df_y1_filtered["Cumulative"], "Y0": df_y0_filtered["Cumulative"]}).dropna()
-        merged["Delta"] = merged["Y1"] - merged["Y0"]
-        
-        if not merged.empty:
+    def build_yoy(daily, agg, baseline):
+        fig = go.Figure()
+        # One year × period pivot holds every compared year's series
+        pivot = year_period_pivot(daily[daily["Year"].isin(available_years)], agg)
+        x_title = "Week #" if agg == "Week" else "Month"
+
+        for year in available_years:
+            cumulative = pivot["Cumulative"].loc[year].dropna()
+            periods = cumulative.index
             fig.add_trace(go.Scatter(
-                x=merged.index, y=merged["Delta"],
-                mode="lines+markers", name=f"Delta ({year1} vs {year0})",
-                line=dict(color="#2ca02c", dash="dash", width=2),
-                marker=dict(color="#2ca02c", size=6),
-                yaxis="y2",
-                hovertemplate=f"<b>Delta</b><br>{x_title}: %{{x}}<br>Difference: %{{y:.1f}}<extra></extra>",
+                x=periods, y=cumulative.to_numpy(),
+                mode="lines+markers", name=year,
+                line=dict(color=colors_yoy.get(year, "#1f77b4")),
+                marker=dict(color=colors_yoy.get(year, "#1f77b4")),
+                customdata=np.column_stack([pivot["Orders"].loc[year, periods], pivot["Shipment Count"].loc[year, periods]]),
+                hovertemplate=f"<b>{year}</b><br>{x_title}: %{{x}}<br>Period Weight: %{{customdata[0]:.1f}}<br>Shipments: %{{customdata[1]:.0f}}<br>Cumulative: %{{y:.1f}}<extra></extra>",
             ))
 
-    # Add secondary y-axis for delta if we have multiple years
-    if len(available_years) >= 2:
-        fig.update_layout(
-            xaxis_title=x_title, yaxis_title="Cumulative Loads",
-            yaxis2=dict(title="Delta (Difference)", overlaying="y", side="right"),
-            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-        )
-    else:
-        fig.update_layout(
-            xaxis_title=x_title, yaxis_title="Cumulative Loads",
-            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-        )
-    st.plotly_chart(fig, width='stretch')
+        # Delta of every other year against the baseline year, over weeks
+        # complete in both years
+        if len(available_years) >= 2 and agg == "Week":
+            # a week counts once it has a load on Thursday or later; in the
+            # current year, only weeks up to today (this week from Thursday on)
+            complete = complete_weeks(daily, 3)
+            today = pd.Timestamp.now()
+            today_week = today.isocalendar()[1]
+            if str(today.year) in complete.index:
+                weeks = complete.columns.to_numpy()
+                complete.loc[str(today.year)] &= (weeks < today_week) | ((weeks == today_week) & (today.dayofweek >= 3))
+            deltas = baseline_deltas(pivot["Cumulative"], baseline, complete)
+            for year, delta in deltas.iterrows():
+                delta = delta.dropna()
+                if delta.empty:
+                    continue
+                fig.add_trace(go.Scatter(
+                    x=delta.index, y=delta.to_numpy(),
+                    mode="lines+markers", name=f"Delta ({year} vs {baseline})",
+                    line=dict(color=colors_yoy.get(year, "#2ca02c"), dash="dash", width=2),
+                    marker=dict(color=colors_yoy.get(year, "#2ca02c"), size=6),
+                    yaxis="y2",
+                    hovertemplate=f"<b>Delta {year} vs {baseline}</b><br>{x_title}: %{{x}}<br>Difference: %{{y:.1f}}<extra></extra>",
+                ))
+
+        # Add secondary y-axis for delta if we have multiple years
+        if len(available_years) >= 2:
+            fig.update_layout(
+                xaxis_title=x_title, yaxis_title="Cumulative Loads",
+                yaxis2=dict(title="Delta (Difference)", overlaying="y", side="right"),
+                hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+            )
+        else:
+            fig.update_layout(
+                xaxis_title=x_title, yaxis_title="Cumulative Loads",
+                hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+            )
+        return fig
+
+    @st.fragment
+    def yoy_section(daily):
+        with runstats.timed("overview: yoy"):
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                agg = st.radio("Aggregate by", ["Week", "Month"], horizontal=True, key="yoy_agg")
+            baseline = available_years[-1]
+            if len(available_years) >= 2:
+                with c2:
+                    baseline = st.selectbox("Baseline year", available_years, index=len(available_years) - 2, key="yoy_baseline")
+            st.subheader("Year-over-Year Running Total")
+            st.plotly_chart(build_yoy(daily, agg, baseline), width='stretch')
 
     # ══════════════════════════════════════════════════════════
     # 2. WEEKLY COMPARISON (years side-by-side by day-of-year)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Load Volume — Year Comparison (Same Period)")
-    c1, c2 = st.columns([3, 1])
-    with c2:
-        week_window = st.selectbox("Rolling avg (weeks)", [1, 2, 3, 4], index=0, key="smooth_window", label_visibility="collapsed")
-    
-    # Colorblind-friendly colors: red and blue
-    colors = {available_years[0]: "#d62728", available_years[1]: "#1f77b4"} if len(available_years) >= 2 else {year: ["#d62728", "#1f77b4"][i % 2] for i, year in enumerate(available_years)}
-    
-    fig2 = go.Figure()
-    # Get today's date for filtering past dates
-    today = pd.Timestamp.now().date()
-    
-    # First pass: add all lines (aligned by day-of-year)
-    for year in available_years:
-        yr_df = shipments[shipments["Year"] == year].copy()
-        # Aggregate by day
-        daily = yr_df.groupby(yr_df["LDF"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        
-        # Only keep dates in the past
-        daily["DateObj"] = pd.to_datetime(daily["Date"])
-        daily = daily[daily["DateObj"].dt.date <= today]
-        
-        # Calculate day-of-year (1-366) for x-axis alignment
-        daily["DayOfYear"] = daily["DateObj"].dt.dayofyear
-        daily["DateStr"] = daily["DateObj"].dt.strftime("%d-%b")
-        # Calculate rolling average per week (days in a week = 7) - backward-looking (trailing)
-        daily["Smoothed"] = daily["Orders"].rolling(window=week_window * 7, min_periods=1).mean()
-        fig2.add_trace(go.Scatter(
-            x=daily["DayOfYear"], y=daily["Smoothed"],
-            mode="lines", name=year, line=dict(width=2, color=colors.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
-        ))
-    # Second pass: add all dots (on top) with matching colors
-    for year in available_years:
-        yr_df = shipments[shipments["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["LDF"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        
-        # Only keep dates in the past
-        daily["DateObj"] = pd.to_datetime(daily["Date"])
-        daily = daily[daily["DateObj"].dt.date <= today]
-        
-        daily["DayOfYear"] = daily["DateObj"].dt.dayofyear
-        daily["DateStr"] = daily["DateObj"].dt.strftime("%d-%b")
-        fig2.add_trace(go.Scatter(
-            x=daily["DayOfYear"], y=daily["Orders"],
-            mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
-            showlegend=False,
-        ))
-
-    fig2.update_layout(
-        xaxis_title="Day of Year (Jan 1 → Dec 31)", yaxis_title=f"# Loads ({week_window}-week rolling avg)",
-        hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-    )
-    st.plotly_chart(fig2, width='stretch')
+    def build_same_period(calendar, week_window, align):
+        fig2 = go.Figure()
+        year_col, x_col, x_title = ALIGNMENTS[align]
+        avg_col = rolling_column(week_window)
+        # Only dates in the past
+        calendar = calendar[calendar["Date"] <= pd.Timestamp.now().normalize()]
+
+        # Per-year slices of the gap-filled calendar (rolling averages already computed)
+        same_period = dict(tuple(calendar[calendar[year_col].isin(available_years)].groupby(year_col)))
+        empty = calendar.iloc[:0]
+
+        # First pass: add all lines (aligned by day-of-year or ISO week / weekday)
+        for year in available_years:
+            daily_yr = same_period.get(year, empty)
+            fig2.add_trace(go.Scatter(
+                x=daily_yr[x_col], y=daily_yr[avg_col],
+                mode="lines", name=year, line=dict(width=2, color=colors.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%a %d-%b"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
+            ))
+        # Second pass: add all dots (on top) with matching colors, days with data only
+        for year in available_years:
+            daily_yr = same_period.get(year, empty)
+            daily_yr = daily_yr[daily_yr["HasData"]]
+            fig2.add_trace(go.Scatter(
+                x=daily_yr[x_col], y=daily_yr["Orders"],
+                mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%a %d-%b"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
+                showlegend=False,
+            ))
+
+        fig2.update_layout(
+            xaxis_title=x_title, yaxis_title=f"# Loads ({week_window}-week rolling avg)",
+            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+        )
+        return fig2
+
+    @st.fragment
+    def same_period_section(calendar):
+        with runstats.timed("overview: same period"):
+            st.subheader("Load Volume — Year Comparison (Same Period)")
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                align = st.radio("Align years by", list(ALIGNMENTS), horizontal=True, key="same_period_align")
+            with c2:
+                week_window = st.selectbox("Rolling avg (weeks)", ROLLING_WEEKS, index=0, key="smooth_window", label_visibility="collapsed")
+            st.plotly_chart(build_same_period(calendar, week_window, align), width='stretch')
 
     # ══════════════════════════════════════════════════════════
     # 3. FULL TIMELINE (all years continuous, daily detail with week smoothing)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Full Timeline — All Years (Continuous)")
-    c1_tl, c2_tl = st.columns([3, 1])
-    with c2_tl:
-        tl_window = st.selectbox("Rolling avg (weeks)", [1, 2, 3, 4], index=0, key="timeline_window", label_visibility="collapsed")
-    
-    fig3 = go.Figure()
-    # First pass: add all lines per year
-    for year in available_years:
-        yr_df = shipments[shipments["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["LDF"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b-%Y")
-        daily["Smoothed"] = daily["Orders"].rolling(window=tl_window * 7, min_periods=1).mean()
-        fig3.add_trace(go.Scatter(
-            x=daily["Date"], y=daily["Smoothed"],
-            mode="lines", name=year, line=dict(width=2, color=colors_yoy.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
-        ))
-    # Second pass: add all dots per year
-    for year in available_years:
-        yr_df = shipments[shipments["Year"] == year].copy()
-        daily = yr_df.groupby(yr_df["LDF"].dt.date)["Shipment Weight"].sum().reset_index(name="Orders")
-        daily.columns = ["Date", "Orders"]
-        daily = daily.sort_values("Date")
-        daily["DateStr"] = pd.to_datetime(daily["Date"]).dt.strftime("%d-%b-%Y")
-        fig3.add_trace(go.Scatter(
-            x=daily["Date"], y=daily["Orders"],
-            mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors_yoy.get(year, "#1f77b4")),
-            customdata=daily["DateStr"],
-            hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
-            showlegend=False,
-        ))
-    
-    fig3.update_layout(
-        xaxis_title="Date", yaxis_title=f"# Loads ({tl_window}-week rolling avg)",
-        hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
-    )
-    st.plotly_chart(fig3, width='stretch')
+    def build_timeline(calendar, tl_window):
+        fig3 = go.Figure()
+        avg_col = rolling_column(tl_window)
+        # Rolling averages run over the continuous calendar, across year ends
+        timeline = dict(tuple(calendar[calendar["Year"].isin(available_years)].groupby("Year")))
+        empty = calendar.iloc[:0]
+
+        # First pass: add all lines per year
+        for year in available_years:
+            daily_yr = timeline.get(year, empty)
+            fig3.add_trace(go.Scatter(
+                x=daily_yr["Date"], y=daily_yr[avg_col],
+                mode="lines", name=year, line=dict(width=2, color=colors_yoy.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%d-%b-%Y"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + "<br>Avg: %{y:.1f}<extra></extra>",
+            ))
+        # Second pass: add all dots per year, days with data only
+        for year in available_years:
+            daily_yr = timeline.get(year, empty)
+            daily_yr = daily_yr[daily_yr["HasData"]]
+            fig3.add_trace(go.Scatter(
+                x=daily_yr["Date"], y=daily_yr["Orders"],
+                mode="markers", name=f"{year} (daily)", marker=dict(size=4, opacity=0.5, color=colors_yoy.get(year, "#1f77b4")),
+                customdata=daily_yr["Date"].dt.strftime("%d-%b-%Y"),
+                hovertemplate="<b>%{customdata}</b><br>" + year + " (daily)<br>Orders: %{y}<extra></extra>",
+                showlegend=False,
+            ))
+
+        fig3.update_layout(
+            xaxis_title="Date", yaxis_title=f"# Loads ({tl_window}-week rolling avg)",
+            hovermode="x unified", margin=dict(t=30, b=40), legend_title="Year",
+        )
+        return fig3
+
+    @st.fragment
+    def timeline_section(calendar):
+        with runstats.timed("overview: timeline"):
+            st.subheader("Full Timeline — All Years (Continuous)")
+            c1_tl, c2_tl = st.columns([3, 1])
+            with c2_tl:
+                tl_window = st.selectbox("Rolling avg (weeks)", ROLLING_WEEKS, index=0, key="timeline_window", label_visibility="collapsed")
+            st.plotly_chart(build_timeline(calendar, tl_window), width='stretch')
 
     # ══════════════════════════════════════════════════════════
     # 4. HEATMAP — full continuous timeline (Mon–Fri, weekends → Friday)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Load Volume Heatmap (Week × Day) — Full Timeline")
-    dow_weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-    if "Load DOW" in shipments.columns:
-        # Move Saturday/Sunday orders to Friday
-        heat_shipments = shipments.copy()
-        heat_shipments.loc[heat_shipments["Load DOW"].isin(["Saturday", "Sunday"]), "Load DOW"] = "Friday"
-        heat_shipments["YearWeek"] = heat_shipments["Year"] + "-W" + heat_shipments["ISOWeek"].astype(str).str.zfill(2)
-        heat = heat_shipments.groupby(["YearWeek", "Load DOW"])["Shipment Weight"].sum().reset_index(name="Orders")
-        if not heat.empty:
-            heat_pivot = heat.pivot(index="Load DOW", columns="YearWeek", values="Orders").fillna(0)
-            heat_pivot = heat_pivot[sorted(heat_pivot.columns)]
-            heat_pivot = heat_pivot.reindex([d for d in dow_weekdays if d in heat_pivot.index])
-            fig5 = px.imshow(
-                heat_pivot,
-                labels=dict(x="Year-Week", y="Day", color="Loads"),
-                color_continuous_scale="YlOrRd",
-                aspect="auto",
-            )
-            fig5.update_layout(margin=dict(t=20, b=20))
+    def build_heatmap(daily):
+        if "Load DOW" not in df.columns:
+            return None
+        # Saturday/Sunday loads are counted on Friday
+        heat_pivot = weekday_heatmap(daily)
+        if heat_pivot.empty:
+            return None
+        fig5 = px.imshow(
+            heat_pivot,
+            labels=dict(x="Year-Week", y="Day", color="Loads"),
+            color_continuous_scale="YlOrRd",
+            aspect="auto",
+        )
+        fig5.update_layout(margin=dict(t=20, b=20))
+        return fig5
+
+    def show_heatmap(fig5):
+        if fig5 is not None:
             st.plotly_chart(fig5, width='stretch')
 
     # ══════════════════════════════════════════════════════════
     # 5. LEAD TIME TABLE (working days)
     # ══════════════════════════════════════════════════════════
-    st.subheader("Lead Time (Working Days: Order Placed → Load Date)")
-    if "Order Placed Date" in shipments.columns and "Load Date From" in df.columns:
-        lt_df = shipments[["Shipment No", "Customer Name", "Order Placed Date", "Load Date From"]].dropna().copy()
-        if len(lt_df) > 0:
-            # Calculate working days (exclude Sat/Sun)
-            lt_df["Lead Time (Working Days)"] = lt_df.apply(
-                lambda r: np.busday_count(
-                    r["Order Placed Date"].date(),
-                    r["Load Date From"].date(),
-                ), axis=1,
-            )
-            # Filter out negatives
-            lt_df = lt_df[lt_df["Lead Time (Working Days)"] >= 0]
-
-            if len(lt_df) > 0:
-                avg_lt = lt_df["Lead Time (Working Days)"].mean()
-                med_lt = lt_df["Lead Time (Working Days)"].median()
-                c1, c2, c3 = st.columns(3)
-                c1.metric("Average Lead Time", f"{avg_lt:.1f} working days")
-                c2.metric("Median Lead Time", f"{med_lt:.0f} working days")
-                c3.metric("Shipments with Lead Time", f"{len(lt_df):,}")
-
-                # Histogram
-                lt_vals = lt_df["Lead Time (Working Days)"]
-                lt_clipped = lt_vals[lt_vals <= lt_vals.quantile(0.99)]
-                fig6 = px.histogram(lt_clipped, nbins=30, labels={"value": "Working Days"})
-                fig6.update_layout(
-                    xaxis_title="Lead Time (working days)", yaxis_title="# Shipments",
-                    showlegend=False, margin=dict(t=20, b=20),
-                )
-                st.plotly_chart(fig6, width='stretch')
-
-                # Lead time distribution by week
-                st.subheader("Lead Time Distribution by Week")
-                lt_df["YearWeek"] = lt_df["Order Placed Date"].dt.year.astype(str) + "-W" + lt_df["Order Placed Date"].dt.isocalendar().week.astype(str).str.zfill(2)
-                
-                # Create lead time buckets (ordered by duration)
-                def bucket_leadtime(lt):
-                    if lt < 3:
-                        return "1. <3 Days"
-                    elif lt < 7:
-                        return "2. 4-7 Days"
-                    elif lt < 14:
-                        return "3. 7-14 Days"
-                    else:
-                        return "4. >14 Days"
-                
-                lt_df["Bucket"] = lt_df["Lead Time (Working Days)"].apply(bucket_leadtime)
-                
-                # Pivot: weeks as columns, buckets as rows
-                pivot = lt_df.groupby(["Bucket", "YearWeek"]).size().unstack(fill_value=0)
-                # Reverse columns to show most recent (latest week) on the left
-                pivot = pivot[[c for c in sorted(pivot.columns, reverse=True)]]
-                # Add total row
-                total_row = pivot.sum()
-                pivot.loc["0. Total Orders"] = total_row
-                # Add average row
-                avg_row = lt_df.groupby("YearWeek")["Lead Time (Working Days)"].mean()
-                pivot.loc["5. Average"] = avg_row
-                # Sort rows by bucket order
-                pivot = pivot.sort_index()
-                
-                st.dataframe(pivot, width='stretch')
-            else:
-                st.info("No valid lead time data available.")
+    def build_lead_times():
+        lead_times = compute_lead_times(scope, df, tuple(available_years))
+        if lead_times is None or lead_times["histogram"].total == 0:
+            return lead_times, None
+        # Working days (Mon–Fri), negative lead times already filtered out;
+        # the per-day histogram gives exact quantiles without the raw values
+        hist = lead_times["histogram"]
+        bars = hist.bars(30, upper=hist.quantile(0.99))
+        fig6 = px.bar(bars, x="Mid", y="Count", hover_data={"Start": True, "End": True, "Mid": False})
+        fig6.update_traces(width=bars["Width"], marker_line_width=0)
+        fig6.update_layout(
+            xaxis_title="Lead Time (working days)", yaxis_title="# Shipments",
+            showlegend=False, margin=dict(t=20, b=20),
+        )
+        return lead_times, fig6
+
+    def show_lead_times(result):
+        lead_times, fig6 = result
+        if lead_times is None:
+            return
+        hist = lead_times["histogram"]
+        if hist.total > 0:
+            avg_lt = hist.mean()
+            med_lt = hist.quantile(0.5)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Average Lead Time", f"{avg_lt:.1f} working days")
+            c2.metric("Median Lead Time", f"{med_lt:.0f} working days")
+            c3.metric("Shipments with Lead Time", f"{hist.total:,}")
+
+            st.plotly_chart(fig6, width='stretch')
+
+            # Lead time distribution by week (buckets as rows, most recent week first)
+            st.subheader("Lead Time Distribution by Week")
+            grid.paged_columns(lead_times["pivot"], "load_lead_time_weeks", noun="weeks")
+            exports.export_menu(lead_times["pivot"], "load_lead_time_by_week", key="export_load_lead_time_by_week", index=True)
+        else:
+            st.info("No valid lead time data available.")
+
+    sections = [
+        Section("overview: yoy", None, ("daily",), render=yoy_section, container=yoy_area),
+        Section("overview: same period", None, ("calendar",), render=same_period_section, container=same_period_area),
+        Section("overview: timeline", None, ("calendar",), render=timeline_section, container=timeline_area),
+        Section("overview: heatmap", build_heatmap, ("daily",), render=show_heatmap, container=heatmap_area),
+    ]
+    if "Order Placed Date" in df.columns and "Load Date From" in df.columns:
+        sections.append(Section("overview: lead times", build_lead_times, render=show_lead_times, container=lead_time_area))
     else:
-        st.info("Order Placed Date or Load Date From column not available.")
+        lead_time_area.info("Order Placed Date or Load Date From column not available.")
+
+    run_sections(sections, daily=daily, calendar=compute_calendar(scope, df))
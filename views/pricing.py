@@ -0,0 +1,187 @@
+import streamlit as st
+import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
+from pricing import (
+    LANE_LEVELS, MIN_LANE_QUOTES, OUTLIER_FENCE, QUANTILES, RATE_COLUMNS, SEGMENT_COL,
+    get_price_index, grouped_quantiles, lane_pricing, price_cube, trend_bands,
+)
+import exports
+import runstats
+
+# Colors of the price segments (others fall back to grey)
+SEGMENT_COLORS = {"Spot": "#E3000F", "Dedicated": "#2E86C1"}
+# Rate shown on the page: label -> column, with its number format
+RATES = {"Per full km": "Rate / KM", "Per ton-km": "Rate / Ton-KM"}
+RATE_FORMATS = {"Rate / KM": "%.2f", "Rate / Ton-KM": "%.4f"}
+OUTLIER_COLUMNS = ["Shipment No", "Order Placed Date", "Customer Name", "Quote", "Full KM", "Weight"]
+
+
+def _rows(df: pd.DataFrame, df_raw: pd.DataFrame) -> np.ndarray:
+    """Positions of the view's rows in the loaded dataset."""
+    return df_raw.index.get_indexer(df.index)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_pricing(scope: str, _df: pd.DataFrame, _df_raw: pd.DataFrame, dataset_key: str,
+                    level: str, rate: str) -> dict:
+    """Rate summary, monthly trend, lane bands and outlier quotes, cached per ``scope``."""
+    index = get_price_index(dataset_key, _df_raw)
+    if rate not in index.rates or level not in index.lanes:
+        return None
+    rows = _rows(_df, _df_raw)
+
+    summary = {}
+    for col, values in index.rates.items():
+        values = values[rows]
+        stats = grouped_quantiles(np.zeros(len(values), dtype=np.int64), values, 1, {"P50": 0.5})
+        summary[col] = {"quotes": int(stats["count"][0]), "median": float(stats["P50"][0])}
+
+    result = lane_pricing(index, rows, level, rate)
+    flagged = result["outliers"]
+    outliers = _df.iloc[flagged["position"].to_numpy()]
+    outliers = outliers[[col for col in OUTLIER_COLUMNS if col in _df.columns]].reset_index(drop=True)
+    outliers.insert(3, "Lane", flagged["Lane"].to_numpy())
+    if SEGMENT_COL in _df.columns:
+        outliers.insert(4, SEGMENT_COL, _df[SEGMENT_COL].to_numpy()[flagged["position"].to_numpy()])
+    outliers[rate] = index.rates[rate][rows][flagged["position"].to_numpy()]
+    outliers["Lane P50"] = flagged["P50"].to_numpy()
+    outliers["Low Fence"] = flagged["Low"].to_numpy()
+    outliers["High Fence"] = flagged["High"].to_numpy()
+
+    return {
+        "summary": summary,
+        "trend": trend_bands(index, rows, rate),
+        "lanes": result["lanes"],
+        "outliers": outliers,
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_cube(scope: str, _df: pd.DataFrame, _df_raw: pd.DataFrame, dataset_key: str,
+                 level: str, rate: str) -> pd.DataFrame:
+    """Lane × month × segment price cube of the view, cached per ``scope``."""
+    index = get_price_index(dataset_key, _df_raw)
+    return price_cube(index, _rows(_df, _df_raw), level, rate)
+
+
+def precompute(df: pd.DataFrame, view_key: str, df_raw: pd.DataFrame, dataset_key: str):
+    """Fill the result cache with everything ``render`` needs at default settings."""
+    if "Quote" not in df.columns:
+        return
+    level, rate = next(iter(LANE_LEVELS)), RATE_COLUMNS[0]
+    compute_pricing(view_key, df, df_raw, dataset_key, level, rate)
+    compute_cube(view_key, df, df_raw, dataset_key, level, rate)
+
+
+def _bands_figure(bands: pd.DataFrame, title: str, outliers: pd.DataFrame = None, rate: str = None):
+    """Monthly P50 line and P10–P90 band per segment, with optional outlier quotes as points."""
+    fig = go.Figure()
+    for segment, part in bands.groupby(SEGMENT_COL, sort=True):
+        color = SEGMENT_COLORS.get(segment, "#7F7F7F")
+        r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+        fig.add_trace(go.Scatter(
+            x=part["Month"], y=part["P90"], mode="lines", line=dict(width=0),
+            showlegend=False, hoverinfo="skip", legendgroup=segment,
+        ))
+        fig.add_trace(go.Scatter(
+            x=part["Month"], y=part["P10"], mode="lines", line=dict(width=0),
+            fill="tonexty", fillcolor=f"rgba({r}, {g}, {b}, 0.15)",
+            name=f"{segment} P10 – P90", hoverinfo="skip", legendgroup=segment,
+        ))
+        fig.add_trace(go.Scatter(
+            x=part["Month"], y=part["P50"], mode="lines+markers", name=f"{segment} median",
+            line=dict(color=color), legendgroup=segment,
+            customdata=part[["P10", "P90", "Quotes"]].to_numpy(),
+            hovertemplate=(
+                f"<b>{segment}</b> %{{x}}<br>Median: %{{y:.4g}}<br>"
+                "P10 – P90: %{customdata[0]:.4g} – %{customdata[1]:.4g}<br>Quotes: %{customdata[2]:,}<extra></extra>"
+            ),
+        ))
+    if outliers is not None and len(outliers) and "Order Placed Date" in outliers.columns:
+        fig.add_trace(go.Scatter(
+            x=outliers["Order Placed Date"].dt.strftime("%Y-%m"), y=outliers[rate], mode="markers",
+            name="Outlier quotes", marker=dict(color="#404040", symbol="x", size=8),
+            hovertemplate="Outlier: %{y:.4g}<extra></extra>",
+        ))
+    fig.update_layout(
+        xaxis_title="Order month", yaxis_title=title, xaxis=dict(type="category", categoryorder="category ascending"),
+        hovermode="closest", margin=dict(t=30, b=20),
+    )
+    return fig
+
+
+@st.fragment
+def pricing(df: pd.DataFrame):
+    """Rate bands, lane table and outlier quotes; the widgets rerun only this fragment."""
+    with runstats.timed("pricing: lanes"):
+        c1, c2 = st.columns(2)
+        with c1:
+            rate_label = st.radio("Rate", list(RATES), horizontal=True, key="pricing_rate")
+        with c2:
+            level = st.radio("Lane", list(LANE_LEVELS), horizontal=True, key="pricing_level")
+        rate = RATES[rate_label]
+        scope, df_raw, dataset_key = st.session_state.view_key, st.session_state.df_raw, st.session_state.dataset_key
+        result = compute_pricing(scope, df, df_raw, dataset_key, level, rate)
+        if result is None:
+            st.warning("Quote, Full KM, Weight or the lane columns are not available for this rate.")
+            return
+
+        summary, fmt = result["summary"], RATE_FORMATS[rate]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Quotes Priced", f"{summary[rate]['quotes']:,}")
+        c2.metric("Median per Full KM", f"{summary['Rate / KM']['median']:.2f}" if "Rate / KM" in summary else "-")
+        c3.metric("Median per Ton-KM", f"{summary['Rate / Ton-KM']['median']:.4f}" if "Rate / Ton-KM" in summary else "-")
+        c4.metric("Outlier Quotes", f"{len(result['outliers']):,}")
+        st.caption(
+            "Rates divide the Quote by the Full KM (and by the Weight in tonnes for the ton-km rate). "
+            f"A quote is an outlier when its rate lies more than {OUTLIER_FENCE:g} interquartile ranges "
+            f"outside the P25–P75 range of its lane and {SEGMENT_COL.lower()} segment "
+            f"(lanes with at least {MIN_LANE_QUOTES} quotes)."
+        )
+
+        st.subheader("Rate by Order Month")
+        if not result["trend"].empty:
+            st.plotly_chart(_bands_figure(result["trend"], rate), width='stretch')
+
+        st.subheader("Lane Pricing")
+        lanes = result["lanes"]
+        min_quotes = st.number_input("Minimum quotes per lane", min_value=1, value=1, step=1, key="pricing_min_quotes")
+        shown = lanes[lanes["Quotes"] >= min_quotes].reset_index(drop=True)
+        st.caption(f"{len(shown):,} of {len(lanes):,} lane × segment rows. Select a row for its monthly bands.")
+        number = st.column_config.NumberColumn(format=fmt)
+        event = st.dataframe(
+            shown, width='stretch', hide_index=True, on_select="rerun", selection_mode="single-row",
+            key="pricing_lanes", column_config={col: number for col in ["Mean", *QUANTILES]},
+        )
+        exports.export_menu(shown, f"lane_pricing_{level.lower().replace(' ', '_')}", key="export_pricing_lanes")
+
+        selected = event.selection.rows
+        if selected and selected[0] < len(shown):
+            lane = shown.iloc[selected[0]]["Lane"]
+            cube = compute_cube(scope, df, df_raw, dataset_key, level, rate)
+            outliers = result["outliers"]
+            st.markdown(f"**{lane}**")
+            st.plotly_chart(
+                _bands_figure(cube[cube["Lane"] == lane], rate, outliers[outliers["Lane"] == lane], rate),
+                width='stretch',
+            )
+
+        st.subheader("Outlier Quotes")
+        outliers = result["outliers"]
+        if outliers.empty:
+            st.success("No outlier quotes.")
+            return
+        st.dataframe(outliers, width='stretch', hide_index=True,
+                     column_config={col: number for col in [rate, "Lane P50", "Low Fence", "High Fence"]})
+        exports.export_menu(outliers, "outlier_quotes", key="export_pricing_outliers")
+
+
+def render(df: pd.DataFrame):
+    st.header("💶 Pricing")
+
+    if "Quote" not in df.columns or not any(col in df.columns for col in RATE_COLUMNS):
+        st.warning("No 'Quote' and 'Full KM' data available for pricing analysis.")
+        return
+
+    pricing(df)
@@ -0,0 +1,128 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Seconds without user interaction before the next page is warmed
+QUIET_SECONDS = 0.5
+# A script run that never reported back (e.g. st.stop) stops blocking after this
+BUSY_TIMEOUT_SECONDS = 30
+# Warm-up jobs allowed to compute at once, across all sessions
+MAX_CONCURRENT_JOBS = 2
+
+
+@dataclass
+class WarmupRun:
+    """Background precomputation of every page for one filtered view.
+
+    ``done`` counts finished jobs out of ``total``; ``failed`` lists the
+    pages whose precompute raised (they are simply computed on demand).
+    """
+
+    view_key: str
+    total: int
+    done: int = 0
+    failed: list = field(default_factory=list)
+    busy: bool = False
+    last_activity: float = field(default_factory=time.monotonic)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.total
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+@st.cache_resource(show_spinner=False)
+def _job_slots() -> threading.BoundedSemaphore:
+    """Process-wide limit on concurrently running warm-up jobs."""
+    return threading.BoundedSemaphore(MAX_CONCURRENT_JOBS)
+
+
+def _wait_until_quiet(run: WarmupRun) -> bool:
+    """Block while the user is interacting; False once the run is cancelled."""
+    while not run.cancelled.is_set():
+        idle = time.monotonic() - run.last_activity
+        if run.busy and idle < BUSY_TIMEOUT_SECONDS:
+            run.cancelled.wait(QUIET_SECONDS)
+        elif idle < QUIET_SECONDS:
+            run.cancelled.wait(QUIET_SECONDS - idle)
+        else:
+            return True
+    return False
+
+
+def _work(run: WarmupRun, jobs: list):
+    for name, job in jobs:
+        if not _wait_until_quiet(run):
+            return
+        with _job_slots():
+            if run.cancelled.is_set():
+                return
+            try:
+                job()
+            except Exception:
+                run.failed.append(name)
+        run.done += 1
+
+
+def touch():
+    """Mark the start of a script run: warm-up yields until the run has rendered."""
+    run = st.session_state.get("warmup")
+    if run is not None:
+        run.busy = True
+        run.last_activity = time.monotonic()
+
+
+def schedule(view_key: str, jobs: list) -> WarmupRun:
+    """Warm ``jobs`` (``(name, callable)`` pairs) in the background for ``view_key``.
+
+    Call after the current page has rendered. A run for the same view is
+    left to continue; a run for a previous view is cancelled and replaced.
+    """
+    run = st.session_state.get("warmup")
+    if run is not None and run.view_key == view_key and not run.cancelled.is_set():
+        run.busy = False
+        run.last_activity = time.monotonic()
+        return run
+    if run is not None:
+        run.cancel()
+
+    run = WarmupRun(view_key=view_key, total=len(jobs))
+    st.session_state.warmup = run
+    thread = threading.Thread(target=_work, args=(run, jobs), name="warmup", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return run
+
+
+def cancel():
+    """Stop the session's warm-up run, if any."""
+    run = st.session_state.get("warmup")
+    if run is not None:
+        run.cancel()
+
+
+@st.fragment(run_every=1)
+def _progress(run: WarmupRun):
+    """Progress bar polled every second while the run is going."""
+    if run.finished or run.cancelled.is_set():
+        # One full rerun replaces the timed fragment with the static caption
+        # (or nothing), so an idle session stops polling the server
+        st.rerun()
+    st.progress(run.done / max(run.total, 1), text=f"Precomputing pages… {run.done}/{run.total}")
+
+
+def render_progress():
+    """Show the warm-up progress of the current session (call inside the sidebar)."""
+    run = st.session_state.get("warmup")
+    if run is None or run.cancelled.is_set():
+        return
+    if run.finished:
+        st.caption("⚡ All pages precomputed")
+    else:
+        _progress(run)
@@ -0,0 +1,123 @@
+"""Watched data directory: new or changed workbooks are parsed ahead of time."""
+import os
+import threading
+import time
+
+import streamlit as st
+
+import fingerprints
+import loading
+
+# Workbook extensions listed in the picker
+EXTENSIONS = (".xlsx", ".xls")
+# Seconds between directory scans
+POLL_SECONDS = 5.0
+# A file modified more recently than this may still be being written
+SETTLE_SECONDS = 2.0
+# Most recently modified workbooks parsed ahead of time (the result cache
+# holds only a few datasets, so older files are parsed on demand)
+PRELOAD_LATEST = 2
+
+
+def _workbooks(directory: str) -> dict:
+    """Name -> stat of the workbooks in ``directory`` (Excel lock files skipped)."""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.lower().endswith(EXTENSIONS) and not name.startswith("~$") and entry.is_file():
+                files[name] = entry.stat()
+    return files
+
+
+class Watcher:
+    """Polls a directory in a background thread and pre-parses new drops.
+
+    Every ``POLL_SECONDS`` the workbooks are listed; files whose (size,
+    mtime, inode) changed since the last scan, and that have settled, are
+    fingerprinted. The ``PRELOAD_LATEST`` newest ones not parsed yet are
+    parsed one at a time through ``loading`` (sharing its load slots and
+    single-flight registry with user loads), so the first user to open a
+    new export gets it from the result cache.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # name -> (stat, fingerprint or None until settled)
+        self.files = {}
+        # Fingerprints pre-parsed once already (not again after a failure
+        # or after the result cache dropped them)
+        self.preloaded = set()
+        self._update(_workbooks(directory))
+        self.thread = threading.Thread(target=self._run, name=f"watch {directory}", daemon=True)
+        self.thread.start()
+
+    def _update(self, current: dict) -> list:
+        """Record the scan ``current``; returns the names of new or changed files."""
+        with self.lock:
+            changed = [
+                name for name, stat in current.items()
+                if name not in self.files or fingerprints.stat_signature(self.files[name][0]) != fingerprints.stat_signature(stat)
+            ]
+            self.files = {
+                name: (stat, None if name in changed else self.files[name][1]) for name, stat in current.items()
+            }
+        return changed
+
+    def poll(self):
+        """Scan once: fingerprint settled files and pre-parse the newest unparsed ones."""
+        self._update(_workbooks(self.directory))
+        now = time.time()
+        with self.lock:
+            pending = [name for name, (stat, key) in self.files.items() if key is None and stat.st_mtime < now - SETTLE_SECONDS]
+        for name in pending:
+            key = fingerprints.of_path(os.path.join(self.directory, name))
+            with self.lock:
+                if name in self.files:
+                    self.files[name] = (self.files[name][0], key)
+
+        with self.lock:
+            newest = sorted(
+                ((stat.st_mtime, name, key) for name, (stat, key) in self.files.items() if key is not None),
+                reverse=True,
+            )[:PRELOAD_LATEST]
+        for _, name, key in newest:
+            if key in self.preloaded:
+                continue
+            self.preloaded.add(key)
+            try:
+                load = loading.preload(os.path.join(self.directory, name), name, key)
+            except loading.LoadQueueFull:
+                # Users come first: retry on a later poll
+                self.preloaded.discard(key)
+                return
+            if load is not None:
+                load.done.wait()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                # A file removed or locked mid-scan: try again on the next poll
+                pass
+            time.sleep(POLL_SECONDS)
+
+    def names(self) -> list:
+        """Workbook names of the latest scan, sorted."""
+        with self.lock:
+            return sorted(self.files)
+
+    def label(self, name: str) -> str:
+        """Picker label of ``name``: marked ✅ once parsed and ⏳ while parsing."""
+        with self.lock:
+            key = self.files[name][1] if name in self.files else None
+        state = loading.status(key) if key is not None else None
+        return {"ready": f"✅ {name}", "loading": f"⏳ {name}"}.get(state, name)
+
+
+@st.cache_resource(show_spinner=False)
+def get_watcher(directory: str) -> Watcher:
+    """The process-wide watcher of ``directory``, started on first use."""
+    return Watcher(directory)